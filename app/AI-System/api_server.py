@@ -7,16 +7,17 @@ Provides REST API endpoints for all AI-System modules
 import os
 import sys
 import json
+import math
+import time
 import asyncio
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from datetime import datetime
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
 from pydantic import BaseModel
-import uvicorn
 
 # Load environment variables
 from dotenv import load_dotenv
@@ -25,8 +26,24 @@ load_dotenv()
 # Add AI-System modules to path
 sys.path.append(str(Path(__file__).parent))
 
-# Import storage manager
-from utils.storage_manager import storage_manager
+# Heavy modules (storage catalog, Gemini SDK, NumPy, httpx) load lazily, after the port is bound
+from utils.storage_manager import StorageManager, DEFAULT_STORAGE_PATH, get_storage_manager, storage_manager_ready
+from utils.catalog import encode_cursor
+from utils.media_response import media_response
+from utils.model_pool import GeminiModelPool, DEFAULT_GEMINI_MODEL
+from utils.provider_runner import ProviderRunner, ProviderTimeout
+from utils.text_streaming import gemini_text_stream, mock_text_stream, sse_text_events, sse_event
+from utils.ollama_client import OllamaClient
+from utils.response_cache import ResponseCache, cache_key
+from utils.single_flight import SingleFlight
+from utils.job_queue import JobQueue, JobStore, JOB_STATES, TERMINAL_STATES, limits_from_env
+from utils import generation_jobs
+from utils.generation_jobs import JOB_TYPE_LIMITS, run_video_job, run_audio_job
+from utils import metrics
+from utils.admission import AdmissionControl, AdmissionRejected, LANES, estimate_tokens
+from utils.conversation_history import HistoryManager, HISTORY_TOKEN_COUNTER, load_token_counter
+from utils.sessions import Session, SessionStore
+from utils.provider_registry import ProviderRegistry, TextProvider, NoProviderAvailable
 
 # Pydantic Models
 class ImageGenerationRequest(BaseModel):
@@ -40,12 +57,17 @@ class VideoGenerationRequest(BaseModel):
     duration: Optional[int] = 30
     style: Optional[str] = "cinematic"
     resolution: Optional[str] = "1080p"
+    priority: Optional[int] = 0
 
 class AudioGenerationRequest(BaseModel):
     prompt: str
     type: Optional[str] = "music"
     duration: Optional[int] = 60
     style: Optional[str] = "electronic"
+    # speech / podcast use TTS; podcast needs speakers [{"name": ..., "voice": ...}]
+    voice: Optional[str] = None
+    speakers: Optional[list[Dict[str, str]]] = None
+    priority: Optional[int] = 0
 
 class TextConversationItem(BaseModel):
     role: str
@@ -57,10 +79,26 @@ class TextGenerationRequest(BaseModel):
     maxTokens: Optional[int] = 500
     temperature: Optional[float] = 0.7
     systemPrompt: Optional[str] = None
+    # None: cache only deterministic (temperature 0) requests; True/False forces it on/off
+    cache: Optional[bool] = None
+    # Server-side session (POST /api/sessions): send only the new prompt, no contents
+    sessionId: Optional[str] = None
+
+class SessionCreateRequest(BaseModel):
+    systemPrompt: Optional[str] = None
+    # Optional history to start from
+    contents: Optional[list[TextConversationItem]] = None
 
 class EmbeddingRequest(BaseModel):
     text: str
 
+class EmbeddingBatchRequest(BaseModel):
+    texts: list[str]
+    dimensions: int = 768
+    # float (JSON lists), base64 (packed buffer) or binary (application/octet-stream)
+    encoding: Optional[str] = "float"
+    dtype: Optional[str] = "float32"
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Divaparadises AI System API",
@@ -77,46 +115,212 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Gemini for text generation
+# Per-route latency histograms, status counts and in-flight gauge for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Initialize Gemini for text generation (on first use or during warm-up)
 gemini_client = None
+gemini_initialized = False
+gemini_init_lock = asyncio.Lock()
+
+# Warm GenerativeModel instances shared by every request
+model_pool = GeminiModelPool()
+
+def get_model_pool() -> GeminiModelPool:
+    """Dependency giving endpoints the shared Gemini model pool"""
+    return model_pool
+
+# Provider calls run off the event loop, with per-provider limits and timeouts
+provider_runner = ProviderRunner()
+
+def get_provider_runner() -> ProviderRunner:
+    """Dependency giving endpoints the shared provider runner"""
+    return provider_runner
+
+# Keep-alive connection pool to Ollama (falls back to mock while its circuit breaker is open)
+ollama_client = OllamaClient()
+
+# Cached text generations (memory LRU per worker, disk tier shared by workers)
+response_cache = ResponseCache()
+
+# Identical concurrent requests share one upstream call
+text_flights = SingleFlight()
+image_flights = SingleFlight()
+
+# Server-side conversation history (clients send only the new turn)
+session_store = SessionStore()
+
+# Long conversations are trimmed to a token budget before reaching a provider
+history_manager = HistoryManager()
+
+# RPM/TPM token buckets and a bounded wait queue in front of each text provider
+admission = AdmissionControl()
+
+def request_lane(x_priority: Optional[str] = Header(None)) -> str:
+    """Dependency reading the admission lane from X-Priority (interactive unless the caller says batch)"""
+    lane = (x_priority or "interactive").lower()
+    if lane not in LANES:
+        raise HTTPException(status_code=400, detail=f"X-Priority must be one of {tuple(LANES)}")
+    return lane
+
+def shed_response(error: AdmissionRejected) -> JSONResponse:
+    """Fast 503 for a request the provider has no capacity for"""
+    return JSONResponse(
+        status_code=503,
+        content={"success": False, "error": str(error)},
+        headers={"Retry-After": str(math.ceil(error.retry_after))}
+    )
+
+async def get_storage() -> StorageManager:
+    """Dependency giving endpoints the storage manager
+
+    Normally already built by the startup warm-up; a request arriving before
+    that builds it in a thread instead of on the event loop.
+    """
+    if storage_manager_ready():
+        return get_storage_manager()
+    return await asyncio.to_thread(get_storage_manager)
+
+# Video/audio generation runs as persisted background jobs; the queue (and
+# jobs.db) is built by the startup hook, not at import
+job_queue: Optional[JobQueue] = None
+
+def build_job_queue() -> JobQueue:
+    """Open the job store and register the handlers (blocking: creates jobs.db)"""
+    queue = JobQueue(JobStore(DEFAULT_STORAGE_PATH / "jobs.db"))
+    job_limits = limits_from_env(JOB_TYPE_LIMITS)
+    queue.register("video", run_video_job, limit=job_limits["video"])
+    queue.register("audio", run_audio_job, limit=job_limits["audio"])
+    return queue
+
+# Long-running tasks started at startup (kept referenced, cancelled on shutdown)
+background_tasks = set()
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize AI modules on startup"""
+    """Start background services
+
+    Uvicorn binds the port only after this returns, so slow initialization
+    (Gemini SDK import, Ollama probe, catalog open and warm-up) runs in the
+    background instead.
+    """
+    print(f"📡 Text providers configured: {', '.join(text_providers.names)} ({text_providers.strategy})")
+    if not session_store.enabled:
+        print("⚠️  Conversation sessions disabled: they are per process and API_WORKERS > 1")
+
+    # Resume queued generation jobs (including ones left over from a restart)
+    global job_queue
+    if job_queue is None:
+        job_queue = await asyncio.to_thread(build_job_queue)
+    job_queue.start()
+
+    background_tasks.add(asyncio.create_task(warm_up()))
+
+    # Periodically fix drift in the storage usage counters
+    background_tasks.add(asyncio.create_task(reconcile_storage_usage()))
+
+def init_gemini():
+    """Configure the Gemini SDK (blocking: importing google.generativeai is slow)"""
     global gemini_client
-    
-    provider = os.getenv("AI_PROVIDER", "gemini").lower()
-    print(f"📡 AI Provider configured: {provider}")
+    try:
+        import google.generativeai as genai
+        api_key = os.getenv("GEMINI_API_KEY")
+        if api_key:
+            genai.configure(api_key=api_key)
+            # Use gemini-2.5-flash-lite as suggested by user
+            gemini_client = model_pool.get(DEFAULT_GEMINI_MODEL)
+            print(f"✅ Gemini client ({DEFAULT_GEMINI_MODEL}) initialized successfully")
+        else:
+            print("⚠️  No Gemini API key found")
+    except Exception as e:
+        print(f"⚠️  Gemini initialization failed: {e}")
 
-    if provider == "gemini":
-        try:
-            # Initialize Gemini client
-            import google.generativeai as genai
-            api_key = os.getenv("GEMINI_API_KEY")
-            if api_key:
-                genai.configure(api_key=api_key)
-                # Use gemini-2.5-flash-lite as suggested by user
-                gemini_client = genai.GenerativeModel('gemini-2.5-flash-lite')
-                print("✅ Gemini client (2.5-flash-lite) initialized successfully")
+async def ensure_gemini():
+    """Initialize Gemini once, off the event loop; requests during warm-up wait for it"""
+    global gemini_initialized
+    if gemini_initialized:
+        return
+    async with gemini_init_lock:
+        if not gemini_initialized:
+            await asyncio.to_thread(init_gemini)
+            gemini_initialized = True
+
+async def warm_up():
+    """Deferred startup work, running while the server already accepts requests"""
+    started = time.perf_counter()
+    try:
+        for provider in text_providers.unknown():
+            print(f"⚠️  Unknown provider: {provider}. Skipping it (mock answers if no provider is healthy).")
+        if "gemini" in text_providers.names:
+            await ensure_gemini()
+            if HISTORY_TOKEN_COUNTER == "gemini" and gemini_client:
+                history_manager.counter = await asyncio.to_thread(load_token_counter, DEFAULT_GEMINI_MODEL)
+        if "ollama" in text_providers.names:
+            print(f"🦙 Ollama provider selected. Model: {ollama_client.model}")
+            # Probe once here instead of discovering an unreachable server per request
+            probe = await ollama_client.probe()
+            if not probe["healthy"]:
+                print(f"⚠️  Ollama not reachable at {ollama_client.base_url}, using mock until it recovers: {probe['error']}")
+            elif not probe["model_available"]:
+                print(f"⚠️  Ollama model {ollama_client.model} is not pulled (ollama pull {ollama_client.model})")
             else:
-                print("⚠️  No Gemini API key found")
+                print(f"✅ Ollama reachable at {ollama_client.base_url}")
+
+        # Open the catalog (runs pending migrations) and pull its hot pages into cache
+        storage = await get_storage()
+        # Follow catalog changes made by any worker process
+        storage.changes.start()
+        counts = await asyncio.to_thread(storage.warm_catalog)
+        print(f"🔥 Warm-up finished in {time.perf_counter() - started:.2f}s (catalog: {counts})")
+    except Exception as e:
+        print(f"⚠️  Warm-up failed: {e}")
+
+async def reconcile_storage_usage():
+    """Background loop rescanning the storage tree
+
+    Every worker runs this loop; a worker skips its turn when another one
+    reconciled within the interval.
+    """
+    interval = int(os.getenv("STORAGE_RECONCILE_INTERVAL", "3600"))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            storage = await get_storage()
+            last = storage.catalog.get_meta("usage_reconciled_at")
+            if last and (datetime.now() - datetime.fromisoformat(last)).total_seconds() < interval:
+                continue
+            drift = await asyncio.to_thread(storage.reconcile_usage)
+            if drift:
+                print(f"📏 Storage usage drift corrected: {drift}")
+            await asyncio.to_thread(storage.trim_change_log)
         except Exception as e:
-            print(f"⚠️  Gemini initialization failed: {e}")
-    elif provider == "ollama":
-        print(f"🦙 Ollama provider selected. Model: {os.getenv('OLLAMA_MODEL', 'llama3')}")
-        # Ollama doesn't need a specific client initialization here, we'll use requests/httpx
-    else:
-        print(f"⚠️  Unknown provider: {provider}. Falling back to mock mode.")
+            print(f"⚠️  Storage usage reconcile failed: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled connections and worker threads"""
+    for task in background_tasks:
+        task.cancel()
+    if job_queue is not None:
+        await job_queue.stop()
+    if storage_manager_ready():
+        await get_storage_manager().aclose()
+    await ollama_client.aclose()
+    provider_runner.shutdown()
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+# Prometheus scrape endpoint (each worker process reports its own numbers)
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.registry.render(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
 # Image Generation
 @app.post("/api/generate-image")
-async def generate_image(request: ImageGenerationRequest):
+async def generate_image(request: ImageGenerationRequest, storage: StorageManager = Depends(get_storage)):
     """Generate image using AI-System image generation module"""
     try:
         # Mock response for now - in real implementation, this would call actual AI service
@@ -124,8 +328,10 @@ async def generate_image(request: ImageGenerationRequest):
         seed = hashlib.md5(request.prompt.encode()).hexdigest()[:8]
         mock_url = f"https://picsum.photos/seed/{seed}/800/800"
         
-        # Save the generated image to local storage
-        save_result = storage_manager.save_image_from_url(
+        # Save the generated image to local storage; identical requests in
+        # flight at the same time share one download and one stored image
+        flight_key = cache_key(prompt=request.prompt, style=request.style, size=request.size, quality=request.quality)
+        save_result = await image_flights.do(flight_key, lambda: storage.asave_image_from_url(
             url=mock_url,
             prompt=request.prompt,
             metadata={
@@ -135,7 +341,7 @@ async def generate_image(request: ImageGenerationRequest):
                 "generation_type": "ai_generated",
                 "model": "mock_generator"
             }
-        )
+        ))
         
         if save_result["success"]:
             return {
@@ -173,131 +379,363 @@ async def generate_image(request: ImageGenerationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 # Video Generation
+def job_accepted(job: Dict[str, Any]) -> JSONResponse:
+    """202 response pointing the client at a queued job"""
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "job_id": job["id"],
+        "type": job["type"],
+        "status": job["status"],
+        "status_url": f"/api/jobs/{job['id']}",
+        "events_url": f"/api/jobs/{job['id']}/events"
+    })
+
 @app.post("/api/generate-video")
 async def generate_video(request: VideoGenerationRequest):
-    """Generate video using AI-System video generation module"""
+    """Queue a video generation job (poll /api/jobs/{id} or follow its events)"""
     try:
-        # Mock response
-        return {
-            "success": True,
-            "url": "https://www.w3schools.com/html/mov_bbb.mp4",
-            "metadata": {
-                "mock": True, 
-                "duration": request.duration,
-                "style": request.style,
-                "resolution": request.resolution
-            },
-            "prompt": request.prompt
-        }
+        job = await asyncio.to_thread(job_queue.submit, "video", {
+            "prompt": request.prompt,
+            "duration": request.duration,
+            "style": request.style,
+            "resolution": request.resolution
+        }, request.priority)
+        return job_accepted(job)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Audio Generation
 @app.post("/api/generate-audio")
 async def generate_audio(request: AudioGenerationRequest):
-    """Generate audio using AI-System audio generation module"""
+    """Queue an audio generation job (poll /api/jobs/{id} or follow its events)"""
     try:
-        # Mock response
-        return {
-            "success": True,
-            "url": "https://www.soundhelix.com/examples/mp3/SoundHelix-Song-1.mp3",
-            "metadata": {
-                "mock": True, 
-                "type": request.type,
-                "duration": request.duration,
-                "style": request.style
-            },
-            "prompt": request.prompt
-        }
+        job = await asyncio.to_thread(job_queue.submit, "audio", {
+            "prompt": request.prompt,
+            "type": request.type,
+            "duration": request.duration,
+            "style": request.style,
+            "voice": request.voice,
+            "speakers": request.speakers
+        }, request.priority)
+        return job_accepted(job)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Generation Jobs
+@app.get("/api/jobs")
+async def list_jobs(status: Optional[str] = None, type: Optional[str] = None, limit: int = 50):
+    """List generation jobs, newest first"""
+    if status and status not in JOB_STATES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {JOB_STATES}")
+    jobs = await asyncio.to_thread(job_queue.store.list, status, type, min(limit, 200))
+    return {"success": True, "jobs": jobs, "count": len(jobs)}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status (and result once finished) of a generation job"""
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"success": True, "job": job}
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events with the job on every status change, ending when it finishes"""
+    if not await asyncio.to_thread(job_queue.store.get, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        async for job in job_queue.watch(job_id):
+            yield sse_event(job["status"], job)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in TERMINAL_STATES:
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    job = await asyncio.to_thread(job_queue.store.cancel, job_id)
+    return {"success": True, "job": job}
+
 # Text Generation
+DEFAULT_SYSTEM_PROMPT = "You are a creative AI assistant for Divaparadises music platform."
+
+def build_gemini_contents(request: TextGenerationRequest) -> list:
+    """Conversation history plus prompt in Gemini's content format"""
+    gemini_contents = []
+    if request.contents:
+        for item in request.contents:
+            gemini_contents.append({
+                "role": "user" if item.role == "user" else "model",
+                "parts": [item.content]
+            })
+    if request.prompt:
+        gemini_contents.append({"role": "user", "parts": [request.prompt]})
+    return gemini_contents
+
+def build_ollama_messages(request: TextGenerationRequest, system_instruction: str) -> list:
+    """Conversation history plus prompt in Ollama's chat format"""
+    ollama_messages = [{"role": "system", "content": system_instruction}]
+    if request.contents:
+        for item in request.contents:
+            ollama_messages.append({"role": item.role, "content": item.content})
+    if request.prompt:
+        ollama_messages.append({"role": "user", "content": request.prompt})
+    return ollama_messages
+
+def mock_reply(request: TextGenerationRequest, provider: str) -> str:
+    prompt_text = request.prompt or (request.contents[-1].content if request.contents else "Hello")
+    return f"Diva (Mock): ฉันได้รับข้อความว่า '{prompt_text}' แล้วค่ะ แต่ตอนนี้ AI Provider ({provider}) ไม่พร้อมทำงานค่ะ"
+
+def text_request_tokens(request: TextGenerationRequest, system_instruction: str) -> int:
+    """Tokens a text request is expected to use (input estimate plus the output limit)"""
+    history = "".join(item.content for item in request.contents or [])
+    return estimate_tokens(system_instruction + history + (request.prompt or "")) + (request.maxTokens or 0)
+
+async def fit_history(request: TextGenerationRequest, system_instruction: str) -> Tuple[TextGenerationRequest, Dict[str, Any]]:
+    """The request with its history trimmed to the token budget, and what was trimmed"""
+    if not request.contents:
+        return request, {}
+    contents, trimmed = await history_manager.afit(
+        system_instruction, [item.model_dump() for item in request.contents], request.prompt
+    )
+    if not trimmed:
+        return request, {}
+    return request.model_copy(update={"contents": [TextConversationItem(**item) for item in contents]}), trimmed
+
+def require_sessions():
+    """Sessions live in one worker's memory, so they are refused with API_WORKERS > 1"""
+    if not session_store.enabled:
+        raise HTTPException(status_code=501, detail="Sessions need API_WORKERS=1; send contents instead")
+
+async def open_session_turn(request: TextGenerationRequest) -> Tuple[Session, TextGenerationRequest]:
+    """The request's session, and the request with the session's history and system prompt filled in"""
+    require_sessions()
+    if request.contents:
+        raise HTTPException(status_code=400, detail="With sessionId send only the new prompt, not contents")
+    if not request.prompt:
+        raise HTTPException(status_code=400, detail="prompt is required with sessionId")
+    session = await session_store.aget(request.sessionId)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    # model_construct: stored messages were validated when they were added
+    return session, request.model_copy(update={
+        "contents": [TextConversationItem.model_construct(**item) for item in session.messages],
+        "systemPrompt": request.systemPrompt or session.system_prompt
+    })
+
+async def record_session_turn(session: Optional[Session], request: TextGenerationRequest, result: Any) -> Any:
+    """Append a successful turn (prompt and reply) to its session"""
+    if session is None or not isinstance(result, dict) or not result.get("success"):
+        return result
+    await session_store.aappend(session, {"role": "user", "content": request.prompt}, {"role": "assistant", "content": result["text"]})
+    return {**result, "sessionId": session.id}
+
+async def settle_stream(events, provider: str, estimated: int, input_tokens: int):
+    """Pass stream events through, settling the admitted token estimate when the stream ends
+
+    Uses the provider's reported usage; a stream that ends early (error or
+    client disconnect) is charged its input plus the text sent so far.
+    """
+    actual = 0
+    chars = 0
+    try:
+        async for event in events:
+            if event["type"] == "delta":
+                chars += len(event["text"])
+            elif event["type"] == "usage":
+                actual = event.get("tokens") or 0
+            yield event
+    finally:
+        # Same four-characters-per-token estimate as estimate_tokens
+        admission.settle(provider, estimated, actual or input_tokens + chars // 4)
+
+async def record_session_stream(events, session: Session, prompt: str):
+    """Pass stream events through, appending the turn once the stream completes"""
+    parts = []
+    async for event in events:
+        if event["type"] == "delta":
+            parts.append(event["text"])
+        yield event
+    await session_store.aappend(session, {"role": "user", "content": prompt}, {"role": "assistant", "content": "".join(parts)})
+
+def use_response_cache(request: TextGenerationRequest) -> bool:
+    """Deterministic requests (temperature 0) are cached unless the client opts out;
+    sampled ones (including temperature None, the provider's default) only when it opts in"""
+    if not response_cache.enabled or request.cache is False:
+        return False
+    return request.cache is True or request.temperature == 0
+
+def text_cache_key(request: TextGenerationRequest, providers: str, system_instruction: str) -> str:
+    return cache_key(
+        providers=providers,
+        systemPrompt=system_instruction,
+        contents=[{"role": item.role, "content": item.content} for item in request.contents or []],
+        prompt=request.prompt,
+        maxTokens=request.maxTokens,
+        # None (provider default) must not share entries with an explicit 0
+        temperature=None if request.temperature is None else float(request.temperature)
+    )
+
+def prompt_of(request: TextGenerationRequest, default: str = "") -> str:
+    return request.prompt or (request.contents[-1].content if request.contents else default)
+
+# Text providers
+async def gemini_generate(request: TextGenerationRequest, system_instruction: str,
+                          pool: GeminiModelPool, runner: ProviderRunner) -> Dict[str, Any]:
+    gemini_contents = build_gemini_contents(request)
+
+    import google.generativeai as genai
+    model = pool.get(DEFAULT_GEMINI_MODEL, system_instruction=system_instruction)
+    generation_config = genai.types.GenerationConfig(max_output_tokens=request.maxTokens, temperature=request.temperature)
+    if hasattr(model, "generate_content_async"):
+        response = await runner.call(
+            "gemini", lambda: model.generate_content_async(gemini_contents, generation_config=generation_config)
+        )
+    else:
+        response = await runner.run(
+            "gemini", model.generate_content, gemini_contents, generation_config=generation_config
+        )
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "success": True,
+        "text": response.text,
+        "usage": {"tokens": getattr(usage, "total_token_count", 0) or len(response.text.split()), "model": f"{DEFAULT_GEMINI_MODEL}-server"},
+        "prompt": prompt_of(request)
+    }
+
+def gemini_stream(request: TextGenerationRequest, system_instruction: str, pool: GeminiModelPool, runner: ProviderRunner):
+    import google.generativeai as genai
+    model = pool.get(DEFAULT_GEMINI_MODEL, system_instruction=system_instruction)
+    generation_config = genai.types.GenerationConfig(max_output_tokens=request.maxTokens, temperature=request.temperature)
+    contents = build_gemini_contents(request)
+    events = runner.stream("gemini", lambda: gemini_text_stream(model, contents, generation_config, runner))
+    return events, f"{DEFAULT_GEMINI_MODEL}-server"
+
+def ollama_payload(request: TextGenerationRequest, system_instruction: str) -> Dict[str, Any]:
+    return {
+        "model": ollama_client.model,
+        "messages": build_ollama_messages(request, system_instruction),
+        "options": {
+            "num_predict": request.maxTokens,
+            "temperature": request.temperature
+        }
+    }
+
+async def ollama_generate(request: TextGenerationRequest, system_instruction: str,
+                          pool: GeminiModelPool, runner: ProviderRunner) -> Dict[str, Any]:
+    try:
+        data = await runner.call("ollama", lambda: ollama_client.chat(ollama_payload(request, system_instruction)))
+    except ProviderTimeout:
+        # The runner cancels the call on timeout, which the client itself does not count
+        ollama_client.breaker.record_failure()
+        raise
+    return {
+        "success": True,
+        "text": data["message"]["content"],
+        "usage": {"tokens": data.get("prompt_eval_count", 0) + data.get("eval_count", 0), "model": f"ollama-{ollama_client.model}"},
+        "prompt": prompt_of(request)
+    }
+
+async def record_ollama_timeouts(events):
+    """Count a stream's ProviderTimeout (the runner cancelled it) as an Ollama breaker failure"""
+    try:
+        async for event in events:
+            yield event
+    except ProviderTimeout:
+        ollama_client.breaker.record_failure()
+        raise
+
+def ollama_stream(request: TextGenerationRequest, system_instruction: str, pool: GeminiModelPool, runner: ProviderRunner):
+    payload = ollama_payload(request, system_instruction)
+    events = runner.stream("ollama", lambda: ollama_client.stream_chat(payload))
+    return record_ollama_timeouts(events), f"ollama-{ollama_client.model}"
+
+def mock_text_result(request: TextGenerationRequest) -> Dict[str, Any]:
+    return {
+        "success": True,
+        "text": mock_reply(request, ",".join(text_providers.names)),
+        "usage": {"tokens": 20, "model": "mock"},
+        "prompt": prompt_of(request, "Hello")
+    }
+
+# Provider chain and routing strategy, resolved once from TEXT_PROVIDERS / AI_PROVIDER and TEXT_ROUTING
+text_providers = ProviderRegistry()
+text_providers.register(TextProvider(
+    "gemini", lambda: DEFAULT_GEMINI_MODEL if gemini_client else None,
+    gemini_generate, gemini_stream, prepare=ensure_gemini
+))
+text_providers.register(TextProvider(
+    "ollama", lambda: ollama_client.model if ollama_client.available() else None,
+    ollama_generate, ollama_stream
+))
+
 @app.post("/api/generate-text")
-async def generate_text(request: TextGenerationRequest):
-    """Generate text using Gemini or Ollama with support for conversation history"""
+async def generate_text(request: TextGenerationRequest, pool: GeminiModelPool = Depends(get_model_pool),
+                        runner: ProviderRunner = Depends(get_provider_runner), lane: str = Depends(request_lane)):
+    """Generate text with the configured provider chain, with support for conversation history
+
+    Providers are tried by TEXT_ROUTING (fallback, hedge or weighted); the mock
+    answers only when none is healthy. Repeated deterministic requests are
+    answered from the response cache (see `cache` on the request body). Long
+    histories are trimmed to HISTORY_TOKEN_BUDGET (reported under `history`).
+    Provider calls go through admission control: when every provider is over
+    capacity the request is shed with 503 and Retry-After. With `sessionId`
+    the history comes from the server-side session.
+    """
+    session = None
+    if request.sessionId:
+        session, request = await open_session_turn(request)
     try:
-        provider = os.getenv("AI_PROVIDER", "gemini").lower()
-        
-        # Prepare contents for AI API
-        messages = []
-        
+        await text_providers.prepare()
+
         # System prompt handling
-        system_instruction = request.systemPrompt or "You are a creative AI assistant for Divaparadises music platform."
-        
-        # Gemini logic
-        if provider == "gemini" and gemini_client:
-            gemini_contents = []
-            if request.contents:
-                for item in request.contents:
-                    gemini_contents.append({
-                        "role": "user" if item.role == "user" else "model",
-                        "parts": [item.content]
-                    })
-            if request.prompt:
-                gemini_contents.append({"role": "user", "parts": [request.prompt]})
-
-            import google.generativeai as genai
-            model = genai.GenerativeModel(model_name='gemini-2.5-flash-lite', system_instruction=system_instruction)
-            response = model.generate_content(
-                gemini_contents,
-                generation_config=genai.types.GenerationConfig(max_output_tokens=request.maxTokens, temperature=request.temperature)
-            )
-            return {
-                "success": True,
-                "text": response.text,
-                "usage": {"tokens": len(response.text.split()), "model": "gemini-2.5-flash-lite-server"},
-                "prompt": request.prompt or (request.contents[-1].content if request.contents else "")
-            }
+        system_instruction = request.systemPrompt or DEFAULT_SYSTEM_PROMPT
+        providers = text_providers.identity()
 
-        # Ollama logic
-        elif provider == "ollama":
-            import requests
-            ollama_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-            ollama_model = os.getenv("OLLAMA_MODEL", "llama3")
-            
-            # Format history for Ollama
-            ollama_messages = [{"role": "system", "content": system_instruction}]
-            if request.contents:
-                for item in request.contents:
-                    ollama_messages.append({"role": item.role, "content": item.content})
-            if request.prompt:
-                ollama_messages.append({"role": "user", "content": request.prompt})
-            
-            response = requests.post(
-                f"{ollama_url}/api/chat",
-                json={
-                    "model": ollama_model,
-                    "messages": ollama_messages,
-                    "stream": False,
-                    "options": {
-                        "num_predict": request.maxTokens,
-                        "temperature": request.temperature
-                    }
-                },
-                timeout=60 # Ollama can be slow on local hardware
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "success": True,
-                    "text": data["message"]["content"],
-                    "usage": {"tokens": data.get("prompt_eval_count", 0) + data.get("eval_count", 0), "model": f"ollama-{ollama_model}"},
-                    "prompt": request.prompt or (request.contents[-1].content if request.contents else "")
-                }
-            else:
-                raise Exception(f"Ollama API Error: {response.status_code} - {response.text}")
+        if not providers:
+            return await record_session_turn(session, request, mock_text_result(request))
 
-        # Fallback to Mock
+        key = text_cache_key(request, providers, system_instruction)
+        cacheable = use_response_cache(request)
+        if cacheable:
+            cached = await response_cache.aget(key)
+            if cached is not None:
+                return await record_session_turn(session, request, {**cached, "cached": True})
         else:
-            prompt_text = request.prompt or (request.contents[-1].content if request.contents else "Hello")
-            return {
-                "success": True,
-                "text": f"Diva (Mock): ฉันได้รับข้อความว่า '{prompt_text}' แล้วค่ะ แต่ตอนนี้ AI Provider ({provider}) ไม่พร้อมทำงานค่ะ",
-                "usage": {"tokens": 20, "model": "mock"},
-                "prompt": prompt_text
-            }
+            response_cache.bypass()
+
+        async def generate():
+            fitted, trimmed = await fit_history(request, system_instruction)
+            estimated = text_request_tokens(fitted, system_instruction)
+
+            async def attempt(provider: TextProvider) -> Dict[str, Any]:
+                await admission.admit(provider.name, estimated, lane)
+                result = await provider.generate(fitted, system_instruction, pool, runner)
+                admission.settle(provider.name, estimated, result["usage"]["tokens"])
+                return result
+
+            try:
+                result = await text_providers.generate(attempt)
+            except NoProviderAvailable:
+                return mock_text_result(fitted)
+            if trimmed:
+                result = {**result, "history": trimmed}
+            if cacheable:
+                await response_cache.aset(key, result)
+            return result
+
+        return await record_session_turn(session, request, await text_flights.do(key, generate))
+    except AdmissionRejected as e:
+        return shed_response(e)
     except Exception as e:
         print(f"❌ Text Generation Error: {e}")
         return {
@@ -306,6 +744,86 @@ async def generate_text(request: TextGenerationRequest):
             "prompt": request.prompt
         }
 
+@app.post("/api/generate-text/stream")
+async def generate_text_stream(request: TextGenerationRequest, pool: GeminiModelPool = Depends(get_model_pool),
+                               runner: ProviderRunner = Depends(get_provider_runner), lane: str = Depends(request_lane)):
+    """Stream generated text as Server-Sent Events
+
+    Frames: `start`, one `delta` per token chunk, then `usage` and `done`
+    (or `error`). Disconnecting cancels the upstream generation. The stream
+    goes to the first provider (in routing order) that admits it; shed
+    requests get a plain 503 before the stream opens. A session turn is
+    recorded only when the stream completes.
+    """
+    session = None
+    if request.sessionId:
+        session, request = await open_session_turn(request)
+    system_instruction = request.systemPrompt or DEFAULT_SYSTEM_PROMPT
+    await text_providers.prepare()
+
+    events = None
+    rejected = None
+    candidates = text_providers.candidates()
+    if candidates:
+        request, _ = await fit_history(request, system_instruction)
+    estimated = text_request_tokens(request, system_instruction)
+    for provider in candidates:
+        try:
+            await admission.admit(provider.name, estimated, lane)
+        except AdmissionRejected as e:
+            rejected = e
+            continue
+        events, model_name = provider.stream(request, system_instruction, pool, runner)
+        events = settle_stream(events, provider.name, estimated, estimated - (request.maxTokens or 0))
+        break
+    if events is None:
+        if rejected:
+            return shed_response(rejected)
+        events = mock_text_stream(mock_reply(request, ",".join(text_providers.names)))
+        model_name = "mock"
+    if session is not None:
+        events = record_session_stream(events, session, request.prompt)
+
+    return StreamingResponse(
+        sse_text_events(events, model_name),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Conversation sessions
+@app.post("/api/sessions", status_code=201)
+async def create_session(request: SessionCreateRequest):
+    """Start a server-side conversation; pass the returned sessionId to generate-text"""
+    require_sessions()
+    session = await session_store.acreate(
+        request.systemPrompt, [{"role": item.role, "content": item.content} for item in request.contents or []]
+    )
+    return {"success": True, "sessionId": session.id, "ttl": session_store.ttl}
+
+@app.get("/api/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Get a session's history"""
+    require_sessions()
+    session = await session_store.aget(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {
+        "success": True,
+        "sessionId": session.id,
+        "systemPrompt": session.system_prompt,
+        "contents": session.messages,
+        "created": session.created,
+        "updated": session.updated
+    }
+
+@app.delete("/api/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """End a session"""
+    require_sessions()
+    if not await asyncio.to_thread(session_store.delete, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"success": True}
+
 # Document Analysis
 @app.post("/api/analyze-document")
 async def analyze_document(
@@ -334,22 +852,86 @@ async def analyze_document(
 @app.post("/api/embeddings")
 async def create_embedding(request: EmbeddingRequest):
     """Create embeddings using AI-System embedding module"""
+    from utils import embeddings  # NumPy loads on first use
     try:
-        # Mock embedding (random vector)
-        import random
-        random.seed(hash(request.text))  # Consistent for same text
-        mock_embedding = [random.random() for _ in range(768)]
-        
+        # Mock embedding (deterministic unit vector)
+        mock_embedding = embeddings.mock_embeddings([request.text])[0].tolist()
+
         return {
             "success": True,
             "embedding": mock_embedding,
-            "dimensions": 768,
+            "dimensions": embeddings.EMBEDDING_DIMENSIONS,
             "text": request.text,
             "mock": True
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def accepts(accept: Optional[str], media_type: str) -> bool:
+    """Whether an Accept header lists `media_type` explicitly (with q > 0)"""
+    for item in (accept or "").split(","):
+        kind, *params = [part.strip() for part in item.split(";")]
+        if kind.lower() != media_type:
+            continue
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+@app.post("/api/embeddings/batch")
+async def create_embeddings_batch(request: EmbeddingBatchRequest, accept: Optional[str] = Header(None),
+                                  runner: ProviderRunner = Depends(get_provider_runner)):
+    """Embed many texts in one call
+
+    `encoding=base64` returns one packed little-endian buffer (float32 or
+    float16) instead of JSON numbers; `encoding=binary` or
+    `Accept: application/octet-stream` returns the raw buffer with the shape
+    in the X-Embedding-Shape header.
+    """
+    from utils import embeddings
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="texts must not be empty")
+    if len(request.texts) > embeddings.EMBEDDING_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {embeddings.EMBEDDING_MAX_BATCH} texts per batch")
+    if not 1 <= request.dimensions <= embeddings.EMBEDDING_MAX_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"dimensions must be between 1 and {embeddings.EMBEDDING_MAX_DIMENSIONS}")
+    encoding = "binary" if accepts(accept, "application/octet-stream") else request.encoding
+    if encoding not in embeddings.ENCODINGS or request.dtype not in embeddings.DTYPES:
+        raise HTTPException(status_code=400, detail=f"encoding must be one of {embeddings.ENCODINGS}, dtype one of {tuple(embeddings.DTYPES)}")
+
+    try:
+        client = embeddings.get_embedding_client()
+        if client:
+            matrix = await runner.run("gemini", embeddings.real_embeddings, client, request.texts, request.dimensions)
+        else:
+            matrix = embeddings.mock_embeddings(request.texts, request.dimensions)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+    if encoding == "binary":
+        return Response(
+            content=embeddings.embeddings_bytes(matrix, request.dtype),
+            media_type="application/octet-stream",
+            headers={
+                "X-Embedding-Shape": f"{matrix.shape[0]},{matrix.shape[1]}",
+                "X-Embedding-Dtype": request.dtype,
+                "X-Embedding-Mock": str(client is None).lower()
+            }
+        )
+    # JSONResponse directly: skips FastAPI's per-element jsonable_encoder pass
+    return JSONResponse({
+        "success": True,
+        **embeddings.encode_embeddings(matrix, encoding, request.dtype),
+        "count": matrix.shape[0],
+        "dimensions": matrix.shape[1],
+        "mock": client is None
+    })
+
 # Workflow endpoints
 @app.post("/api/workflows/nano-banana")
 async def run_nano_banana_workflow(request: dict):
@@ -403,6 +985,7 @@ async def run_podcast_studio_workflow(request: dict):
 @app.get("/api/system/info")
 async def get_system_info():
     """Get AI-System information and capabilities"""
+    from utils import embeddings
     return {
         "name": "Divaparadises AI System",
         "version": "1.0.0",
@@ -418,47 +1001,72 @@ async def get_system_info():
         ],
         "modules": {
             "gemini_client": gemini_client is not None,
-            "storage_manager": True,
+            "storage_manager": storage_manager_ready(),
             "image_generator": False,  # Mock mode
-            "video_generator": False,  # Mock mode
-            "audio_generator": False,  # Mock mode
+            "video_generator": generation_jobs.VIDEO_PROVIDER == "veo",
+            "audio_generator": generation_jobs.AUDIO_PROVIDER == "gemini",
             "doc_processor": False,    # Mock mode
-            "embedding_client": False  # Mock mode
+            "embedding_client": embeddings.EMBEDDING_PROVIDER == "gemini"
         },
+        "gemini_model_pool": model_pool.stats(),
+        "providers": provider_runner.stats(),
+        "text_routing": text_providers.stats(),
+        "ollama": ollama_client.stats(),
+        "response_cache": response_cache.stats(),
+        "single_flight": {"text": text_flights.stats(), "images": image_flights.stats()},
+        "admission": admission.stats(),
+        "history": history_manager.stats(),
+        "sessions": session_store.stats(),
+        "jobs": job_queue.stats() if job_queue is not None else None,
         "status": "operational",
         "mode": "development"
     }
 
 # Storage Management Endpoints
 @app.get("/api/storage/stats")
-async def get_storage_stats():
-    """Get storage statistics"""
+async def get_storage_stats(reconcile: bool = False, storage: StorageManager = Depends(get_storage)):
+    """Get storage statistics (reconcile=true rescans the storage tree first)"""
     try:
-        stats = storage_manager.get_storage_stats()
+        if reconcile:
+            await asyncio.to_thread(storage.reconcile_usage)
+        stats = storage.get_storage_stats()
         return {"success": True, "stats": stats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/storage/images")
-async def list_stored_images(limit: int = 50, offset: int = 0):
-    """List stored images with pagination"""
+async def list_stored_images(limit: int = 50, offset: int = 0, cursor: Optional[str] = None,
+                             storage: StorageManager = Depends(get_storage)):
+    """List stored images, newest first
+
+    Pass the returned `next_cursor` back as `cursor` to fetch the next page;
+    `offset` is still accepted for older clients.
+    """
     try:
-        images = storage_manager.list_images(limit=limit, offset=offset)
+        if cursor or offset == 0:
+            images, next_cursor = storage.list_images_page(limit=limit, cursor=cursor)
+        else:
+            images = storage.list_images(limit=limit, offset=offset)
+            next_cursor = encode_cursor(images[-1]) if len(images) == limit else None
         return {
             "success": True,
             "images": images,
             "count": len(images),
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "cursor": cursor,
+            "next_cursor": next_cursor
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/storage/images/search")
-async def search_stored_images(q: str, limit: int = 20):
+async def search_stored_images(q: str, limit: int = 20, storage: StorageManager = Depends(get_storage)):
     """Search stored images by prompt"""
     try:
-        images = storage_manager.search_images(query=q, limit=limit)
+        images = storage.search_images(query=q, limit=limit)
         return {
             "success": True,
             "images": images,
@@ -469,10 +1077,10 @@ async def search_stored_images(q: str, limit: int = 20):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/storage/images/{image_id}")
-async def get_stored_image(image_id: str):
+async def get_stored_image(image_id: str, storage: StorageManager = Depends(get_storage)):
     """Get stored image by ID"""
     try:
-        image_data = storage_manager.get_image_by_id(image_id)
+        image_data = storage.get_image_by_id(image_id)
         if image_data:
             return {"success": True, "image": image_data}
         else:
@@ -483,10 +1091,11 @@ async def get_stored_image(image_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/storage/images/{image_id}")
-async def delete_stored_image(image_id: str):
+async def delete_stored_image(image_id: str, storage: StorageManager = Depends(get_storage)):
     """Delete stored image"""
     try:
-        success = storage_manager.delete_image(image_id)
+        # Blob unlink and catalog transactions block
+        success = await asyncio.to_thread(storage.delete_image, image_id)
         if success:
             return {"success": True, "message": "Image deleted successfully"}
         else:
@@ -497,35 +1106,109 @@ async def delete_stored_image(image_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/storage/cleanup")
-async def cleanup_old_files(days: int = 30):
-    """Clean up files older than specified days"""
+async def cleanup_old_files(days: int = 30, storage: StorageManager = Depends(get_storage)):
+    """Clean up files older than specified days (all content types)"""
     try:
-        deleted_count = storage_manager.cleanup_old_files(days=days)
+        result = await asyncio.to_thread(storage.cleanup_old_files, days=days)
         return {
             "success": True,
             "message": f"Cleaned up files older than {days} days",
-            "deleted_count": deleted_count
+            "deleted_count": result["deleted"],
+            "result": result
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Static file serving for stored images
-from fastapi.staticfiles import StaticFiles
+@app.get("/api/storage/cleanup")
+async def get_cleanup_progress(storage: StorageManager = Depends(get_storage)):
+    """Progress of the current (or last) cleanup run"""
+    return {"success": True, "progress": storage.get_cleanup_progress()}
 
-# Mount static files
-storage_path = Path(__file__).parent / "storage"
-if storage_path.exists():
-    app.mount("/storage", StaticFiles(directory=str(storage_path)), name="storage")
+@app.get("/api/storage/changes")
+async def get_storage_changes(since: int = 0, limit: int = 500, storage: StorageManager = Depends(get_storage)):
+    """Catalog changes after a sequence number (poll with the last `seq` seen)"""
+    changes = storage.changes_since(since, limit=min(limit, 1000))
+    return {
+        "success": True,
+        "changes": changes,
+        "last_seq": changes[-1]["seq"] if changes else since
+    }
+
+@app.get("/api/storage/events")
+async def storage_events(since: Optional[int] = None, last_event_id: Optional[str] = Header(None),
+                         storage: StorageManager = Depends(get_storage)):
+    """Server-sent events for catalog changes made by any worker
+
+    Reconnecting clients resume from the Last-Event-ID header (or `since`).
+    """
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    async def event_stream():
+        yield ": connected\n\n"
+        async for change in storage.changes.subscribe(since=since):
+            yield f"id: {change['seq']}\nevent: {change['action']}\ndata: {json.dumps(change)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Stored media: served by explicit routes (no directory mount, so the
+# catalog database and other internals under storage/ are never exposed)
+@app.api_route("/storage/images/thumbnails/{size}/{name}", methods=["GET", "HEAD"])
+async def get_thumbnail(request: Request, size: int, name: str, storage: StorageManager = Depends(get_storage)):
+    """Serve an image thumbnail, generating missing sizes on first request"""
+    thumbnail = await storage.get_thumbnail(size, name)
+    if not thumbnail:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    return media_response(
+        request, thumbnail["path"], storage.base_path, sha256=thumbnail["sha256"],
+        variant=thumbnail["variant"], immutable=thumbnail["immutable"]
+    )
+
+@app.api_route("/storage/images/thumbnails/{name}", methods=["GET", "HEAD"])
+async def get_legacy_thumbnail(request: Request, name: str, storage: StorageManager = Depends(get_storage)):
+    """Serve a thumbnail saved before multi-size derivatives"""
+    thumbnail_path = storage.resolve_legacy_thumbnail(name)
+    if not thumbnail_path:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    return media_response(request, thumbnail_path, storage.base_path)
+
+@app.api_route("/storage/{kind}/{name}", methods=["GET", "HEAD"])
+async def get_stored_media(request: Request, kind: str, name: str, storage: StorageManager = Depends(get_storage)):
+    """Serve stored media by content-addressed name or legacy file name
+
+    Supports Range requests (seeking in the video/audio player), and
+    ETag / If-None-Match revalidation; content-addressed names are cached
+    as immutable.
+    """
+    media = storage.resolve_media(kind, name)
+    if not media:
+        raise HTTPException(status_code=404, detail="File not found")
+    return media_response(
+        request, media["path"], storage.base_path, sha256=media["sha256"],
+        immutable=media["immutable"], media_type=media["content_type"]
+    )
 
 if __name__ == "__main__":
     print("🚀 Starting Divaparadises AI System API Server...")
     print("📍 API Documentation: http://localhost:8000/docs")
     print("🔗 Health Check: http://localhost:8000/health")
     
+    # API_WORKERS > 1 runs several processes sharing the storage catalog;
+    # auto-reload only works with a single worker
+    workers = int(os.getenv("API_WORKERS", "1"))
+    if workers > 1:
+        print(f"👷 Starting {workers} worker processes")
+    
+    import uvicorn
     uvicorn.run(
         "api_server:app",
         host="127.0.0.1",
         port=8000,
-        reload=True,
+        reload=workers == 1,
+        workers=workers,
         log_level="info"
     )
\ No newline at end of file
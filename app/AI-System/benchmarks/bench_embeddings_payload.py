@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Embeddings Payload Benchmark
+Compares response size and serialization time of the /api/embeddings/batch
+encodings: JSON float lists, base64 float32/float16 and raw binary
+
+Usage:
+    python benchmarks/bench_embeddings_payload.py
+    python benchmarks/bench_embeddings_payload.py --texts 256 --dimensions 1536
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.embeddings import mock_embeddings, encode_embeddings, embeddings_bytes
+
+
+def measure(serialize, rounds: int):
+    timings = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        body = serialize()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return len(body), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding response encoding benchmark")
+    parser.add_argument("--texts", type=int, default=64)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    matrix = mock_embeddings([f"text {i}" for i in range(args.texts)], args.dimensions)
+
+    strategies = (
+        ("json float", lambda: json.dumps(encode_embeddings(matrix, "float")).encode()),
+        ("base64 f32", lambda: json.dumps(encode_embeddings(matrix, "base64", "float32")).encode()),
+        ("base64 f16", lambda: json.dumps(encode_embeddings(matrix, "base64", "float16")).encode()),
+        ("binary f32", lambda: embeddings_bytes(matrix, "float32")),
+        ("binary f16", lambda: embeddings_bytes(matrix, "float16")),
+    )
+
+    print(f"📊 {args.texts} texts x {args.dimensions} dimensions, {args.rounds} rounds")
+    print(f"{'encoding':<14}{'bytes':>12}{'vs json':>10}{'p50 ms':>10}")
+    baseline = None
+    for name, serialize in strategies:
+        size, p50 = measure(serialize, args.rounds)
+        baseline = baseline or size
+        print(f"{name:<14}{size:>12,}{size / baseline:>10.2f}{p50:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Gemini Model Pool Benchmark
+Measures the per-request cost of getting a configured GenerativeModel:
+building a new one every call (old /api/generate-text) versus the shared
+model pool. No API calls are made, only model construction is timed
+
+Usage:
+    python benchmarks/bench_model_pool.py
+    python benchmarks/bench_model_pool.py --requests 20000 --prompts 8
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.model_pool import GeminiModelPool, DEFAULT_GEMINI_MODEL
+
+
+def measure(get_model, system_prompts, requests: int):
+    rng = random.Random(0)
+    timings = []
+    for _ in range(requests):
+        system_instruction = rng.choice(system_prompts)
+        t0 = time.perf_counter()
+        get_model(system_instruction)
+        timings.append((time.perf_counter() - t0) * 1_000_000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1], statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GenerativeModel construction overhead benchmark")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--prompts", type=int, default=4, help="Distinct system prompts in the mix")
+    args = parser.parse_args()
+
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        print("❌ google-generativeai is not installed (pip install -r requirements.txt)")
+        sys.exit(1)
+
+    system_prompts = [
+        f"You are a creative AI assistant for Divaparadises music platform. Persona #{i}."
+        for i in range(args.prompts)
+    ]
+
+    def per_request(system_instruction):
+        return genai.GenerativeModel(model_name=DEFAULT_GEMINI_MODEL, system_instruction=system_instruction)
+
+    pool = GeminiModelPool()
+
+    def pooled(system_instruction):
+        return pool.get(DEFAULT_GEMINI_MODEL, system_instruction=system_instruction)
+
+    print(f"📊 {args.requests:,} requests over {args.prompts} system prompts ({DEFAULT_GEMINI_MODEL})")
+    print(f"{'strategy':<16}{'p50 µs':>10}{'p95 µs':>10}{'mean µs':>10}")
+    for name, get_model in (("per-request", per_request), ("pooled", pooled)):
+        p50, p95, mean = measure(get_model, system_prompts, args.requests)
+        print(f"{name:<16}{p50:>10.1f}{p95:>10.1f}{mean:>10.1f}")
+    print(f"pool: {pool.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Prompt Search Benchmark
+Measures /api/storage/images/search query latency against catalogs of
+10k / 100k / 1M synthetic mixed Thai/English prompts
+
+Usage:
+    python benchmarks/bench_prompt_search.py
+    python benchmarks/bench_prompt_search.py --sizes 10000 100000 --queries 200
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.catalog import SQLiteCatalog
+
+ENGLISH_WORDS = [
+    "cyberpunk", "diva", "neon", "portrait", "singer", "stage", "concert", "galaxy",
+    "princess", "robot", "gamer", "elegant", "studio", "album", "cover", "jazz",
+    "acoustic", "electronic", "sunset", "city", "rain", "hologram", "anime", "cinematic",
+]
+THAI_WORDS = [
+    "นักร้อง", "เวที", "แสงไฟ", "ดนตรี", "ภาพวาด", "เจ้าหญิง", "หุ่นยนต์", "กลางคืน",
+    "ทะเล", "ดวงดาว", "ความรัก", "เมือง",
+]
+QUERIES = [
+    "cyberpunk", "neon diva", "cyb", "portrait singer", "นักร้อง", "เวที แสง",
+    "jazz นักร้อง", "hologram princess stage", "el", "ดนตรี",
+    # Expands to ~1000 scene<N> terms, past the prompt index's MAX_PREFIX_EXPANSION
+    "sc",
+]
+# Distinct "scene<N>" tags give the vocabulary a wide prefix
+SCENE_TAGS = 1000
+
+
+def make_prompt(rng: random.Random) -> str:
+    words = rng.sample(ENGLISH_WORDS, rng.randint(4, 9))
+    words += rng.sample(THAI_WORDS, rng.randint(0, 3))
+    words.append(f"scene{rng.randrange(SCENE_TAGS)}")
+    rng.shuffle(words)
+    return " ".join(words)
+
+
+def populate(catalog: SQLiteCatalog, size: int, rng: random.Random, batch: int = 5000):
+    start = datetime(2025, 1, 1)
+    for offset in range(0, size, batch):
+        records = []
+        for i in range(offset, min(offset + batch, size)):
+            records.append({
+                "id": f"img-{i:08d}",
+                "filename": f"image_{i:08d}.jpg",
+                "prompt": make_prompt(rng),
+                "created_at": (start + timedelta(seconds=i)).isoformat(),
+                "content_type": "image/jpeg",
+            })
+        catalog.add_many("images", records)
+
+
+def run(size: int, queries: int, limit: int):
+    rng = random.Random(size)
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = SQLiteCatalog(Path(tmp) / "catalog.db")
+
+        t0 = time.perf_counter()
+        populate(catalog, size, rng)
+        build_time = time.perf_counter() - t0
+
+        print(f"\n📊 {size:,} prompts (indexed in {build_time:.1f}s)")
+        print(f"{'query':<28}{'p50 ms':>10}{'p95 ms':>10}{'hits':>8}")
+        for query in QUERIES:
+            timings = []
+            hits = 0
+            for _ in range(queries):
+                t0 = time.perf_counter()
+                hits = len(catalog.search("images", query, limit=limit))
+                timings.append((time.perf_counter() - t0) * 1000)
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{query:<28}{statistics.median(timings):>10.2f}{p95:>10.2f}{hits:>8}")
+        catalog.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt search latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=50, help="Repetitions per query")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run(size, args.queries, args.limit)
+
+
+if __name__ == "__main__":
+    main()
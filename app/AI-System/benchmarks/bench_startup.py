@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Cold-start cost of the API server: an import-time profile of `import
+api_server` (parsed from `python -X importtime`, median over several fresh
+interpreters) and the time from process spawn until /health answers
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --top 20 --no-serve
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).parent.parent
+
+# Modules that should only load on first use, not at import time
+LAZY_MODULES = ("google.generativeai", "numpy", "httpx", "PIL", "aiofiles")
+
+
+def import_profile():
+    """One fresh `import api_server`: ({module: (self_us, cumulative_us, depth)}, loaded lazy modules)"""
+    probe = f"import sys, api_server; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=SERVER_DIR, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    loaded = [m for m in result.stdout.strip().split(",") if m]
+    return modules, loaded
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_health(timeout: float = 60.0) -> float:
+    """Seconds from spawning uvicorn until GET /health succeeds"""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=SERVER_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("Server did not answer /health")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API server cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Top-level imports to list")
+    parser.add_argument("--no-serve", action="store_true", help="Skip the time-to-/health measurement")
+    args = parser.parse_args()
+
+    cumulative = defaultdict(list)
+    depths = {}
+    loaded = set()
+    for _ in range(args.runs):
+        modules, lazy_loaded = import_profile()
+        loaded.update(lazy_loaded)
+        for name, (_, cumulative_us, depth) in modules.items():
+            cumulative[name].append(cumulative_us)
+            depths[name] = depth
+
+    total = statistics.median(cumulative["api_server"]) / 1000
+    print(f"📊 import api_server: {total:.1f} ms (median of {args.runs} fresh interpreters)")
+
+    # Direct imports of api_server (depth 1), by median cumulative time
+    direct = sorted(
+        ((statistics.median(times) / 1000, name) for name, times in cumulative.items() if depths[name] == 1),
+        reverse=True
+    )
+    print(f"{'module':<40}{'cumulative ms':>15}{'share':>8}")
+    for ms, name in direct[:args.top]:
+        print(f"{name:<40}{ms:>15.1f}{ms / total:>8.0%}")
+    print(f"lazy modules loaded at import: {sorted(loaded) or 'none'}")
+
+    if not args.no_serve:
+        timings = [time_to_health() for _ in range(args.runs)]
+        print(f"⏱️  spawn -> /health: p50 {statistics.median(timings) * 1000:.0f} ms, "
+              f"max {max(timings) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import the server modules the way api_server does (utils.*)
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+
+from utils.admission import AdmissionController, AdmissionLimits, AdmissionRejected, TokenBucket
+
+
+def test_oversized_amount_waits_for_a_full_bucket():
+    bucket = TokenBucket(600)
+    assert bucket.wait_time(5000, bucket.updated) == 0.0
+    bucket.take(5000, bucket.updated)
+    assert bucket.tokens == 0
+    assert bucket.wait_time(5000, bucket.updated) == pytest.approx(60.0)
+
+
+def test_oversized_estimate_is_admitted_with_a_full_bucket():
+    async def scenario():
+        controller = AdmissionController("test", AdmissionLimits(rpm=0, tpm=600, max_queue=4))
+        assert await controller.admit(5000) < 1.0
+        with pytest.raises(AdmissionRejected) as info:
+            await controller.admit(5000)
+        assert info.value.retry_after == pytest.approx(60.0, abs=1.0)
+
+    asyncio.run(scenario())
@@ -0,0 +1,122 @@
+import pytest
+
+from utils.catalog import SQLiteCatalog, decode_cursor, encode_cursor
+from utils.storage_manager import StorageManager
+
+
+def test_cursor_round_trip():
+    record = {"id": "ก-id/with+chars", "created_at": "2025-01-02T03:04:05.123456"}
+    cursor = encode_cursor(record)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (record["created_at"], record["id"])
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64 !", "WzEsMl0", "eyJhIjogMX0"])
+def test_malformed_cursor_is_rejected(cursor):
+    # "WzEsMl0" is [1,2] and "eyJhIjogMX0" is {"a": 1}: valid base64, wrong shape
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_keyset_pages_cover_every_record_once_across_equal_timestamps(tmp_path):
+    catalog = SQLiteCatalog(tmp_path / "catalog.db")
+    # Several records share a created_at, so the id breaks ties
+    records = [
+        {"id": f"img-{i:03d}", "filename": f"img-{i:03d}.png", "prompt": "p", "created_at": f"2025-01-01T00:00:{i // 3:02d}"}
+        for i in range(25)
+    ]
+    catalog.add_many("images", records)
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = catalog.list_page("images", limit=4, cursor=cursor)
+        seen.extend(record["id"] for record in page)
+        if not cursor:
+            break
+    expected = [r["id"] for r in sorted(records, key=lambda r: (r["created_at"], r["id"]), reverse=True)]
+    assert seen == expected
+    assert catalog.list_page("images", limit=25)[1] is None
+    catalog.close()
+
+
+def test_blob_refcount_acquire_and_release(tmp_path):
+    catalog = SQLiteCatalog(tmp_path / "catalog.db")
+    sha = "ab" * 32
+
+    assert catalog.acquire_blob(sha, "images", "/blobs/a.png", 10, "image/png") == ("/blobs/a.png", True)
+    # A second reference reuses the stored path, whatever path it asked for
+    assert catalog.acquire_blob(sha, "images", "/blobs/other.png", 10, "image/png") == ("/blobs/a.png", False)
+    assert catalog.get_blob(sha)["refcount"] == 2
+    assert catalog.get_usage()["by_type"]["images"] == {"files": 1, "bytes": 10}
+
+    # Only the last release hands back the path to delete
+    assert catalog.release_blob(sha) is None
+    assert catalog.get_blob(sha)["refcount"] == 1
+    assert catalog.release_blob(sha) == "/blobs/a.png"
+    assert catalog.get_blob(sha) is None
+    assert catalog.get_usage()["by_type"].get("images", {"bytes": 0})["bytes"] == 0
+    assert catalog.release_blob(sha) is None
+    catalog.close()
+
+
+def test_failed_catalog_insert_rolls_back_the_blob_reference(tmp_path, monkeypatch):
+    storage = StorageManager(str(tmp_path))
+    monkeypatch.setattr(storage.thumbnails, "enqueue", lambda *args: None)
+    saved = storage.save_image_from_data(b"\x89PNG same bytes", "first")
+    sha = saved["metadata"]["sha256"]
+
+    def broken_add(kind, record):
+        raise RuntimeError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(storage.catalog, "add", broken_add)
+        assert storage.save_image_from_data(b"\x89PNG same bytes", "dup")["success"] is False
+        assert storage.save_image_from_data(b"\x89PNG new bytes", "new")["success"] is False
+
+    assert storage.catalog.get_blob(sha)["refcount"] == 1
+    assert storage.catalog.count("images") == 1
+    # Neither the new blob row nor its file survived
+    assert [p.name for p in (tmp_path / "images").rglob("*.png")] == [f"{sha}.png"]
+
+
+def test_reconcile_buckets_by_catalog_day_and_skips_untracked_files(tmp_path, monkeypatch):
+    import os
+
+    storage = StorageManager(str(tmp_path))
+    monkeypatch.setattr(storage.thumbnails, "enqueue", lambda *args: None)
+    saved = storage.save_image_from_data(b"\x89PNG reconcile", "usage")
+    path = storage._current_path(saved["metadata"])
+    # An old mtime must not move the bytes to another day
+    os.utime(path, (0, 0))
+    (tmp_path / "images" / ".gitkeep").write_text("")
+    (tmp_path / "videos" / "stray.mp4").write_bytes(b"x" * 100)
+
+    assert storage.reconcile_usage() == {}
+    day = storage.catalog.get_blob(saved["metadata"]["sha256"])["created_at"][:10]
+    assert storage.catalog.get_usage()["by_day"] == [
+        {"day": day, "kind": "images", "files": 1, "bytes": path.stat().st_size}
+    ]
+
+
+def test_deleting_a_migrated_image_removes_its_legacy_thumbnail(tmp_path):
+    import json
+
+    legacy_image = tmp_path / "images" / "image_old.png"
+    legacy_thumb = tmp_path / "images" / "thumbnails" / "thumb_image_old.png"
+    legacy_thumb.parent.mkdir(parents=True)
+    legacy_image.write_bytes(b"\x89PNG legacy")
+    legacy_thumb.write_bytes(b"thumb")
+    (tmp_path / "metadata.json").write_text(json.dumps({"images": {"old-1": {
+        "id": "old-1", "filename": legacy_image.name, "prompt": "legacy",
+        "file_path": str(legacy_image), "thumbnail_path": str(legacy_thumb),
+        "created_at": "2025-01-02T03:04:05",
+    }}, "videos": {}, "audio": {}}))
+
+    storage = StorageManager(str(tmp_path))
+    migrated = storage.catalog.get("images", "old-1")
+    assert migrated["sha256"] and not legacy_image.exists()
+    assert storage.resolve_legacy_thumbnail(legacy_thumb.name) == legacy_thumb
+
+    assert storage.delete_image("old-1")
+    assert not legacy_thumb.exists()
+    assert storage.catalog.get_blob(migrated["sha256"]) is None
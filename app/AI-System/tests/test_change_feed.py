@@ -0,0 +1,71 @@
+import asyncio
+
+from utils import change_feed
+from utils.change_feed import ChangeFeed
+
+
+class StubCatalog:
+    def __init__(self):
+        self.changes = []
+
+    def last_change(self) -> int:
+        return self.changes[-1]["seq"] if self.changes else 0
+
+    def changes_since(self, seq: int, limit: int = 500):
+        return [change for change in self.changes if change["seq"] > seq][:limit]
+
+
+def batch(start: int, count: int):
+    return [{"seq": seq, "op": "add"} for seq in range(start, start + count)]
+
+
+def test_stalled_subscriber_gets_sentinel_and_others_keep_receiving(monkeypatch):
+    monkeypatch.setattr(change_feed, "SUBSCRIBER_QUEUE_SIZE", 5)
+
+    async def scenario():
+        feed = ChangeFeed(StubCatalog())
+        slow = feed.subscribe()
+        fast = feed.subscribe()
+        first_slow = asyncio.ensure_future(slow.__anext__())
+        first_fast = asyncio.ensure_future(fast.__anext__())
+        await asyncio.sleep(0)
+        assert len(feed._subscribers) == 2
+
+        feed._publish(batch(1, 1))
+        assert (await first_slow)["seq"] == 1
+        assert (await first_fast)["seq"] == 1
+
+        # The slow reader stops reading; its queue fills exactly to the limit
+        feed._publish(batch(2, 5))
+        fast_seen = [(await fast.__anext__())["seq"] for _ in range(5)]
+        # ...and overflows on the next batch
+        feed._publish(batch(7, 3))
+        assert len(feed._subscribers) == 1
+
+        # The slow stream ends (sentinel delivered) instead of hanging
+        slow_seen = [change["seq"] async for change in slow]
+        assert slow_seen == [2, 3, 4, 5, 6]
+
+        # The other subscriber still gets the whole batch
+        fast_seen += [(await fast.__anext__())["seq"] for _ in range(3)]
+        assert fast_seen == list(range(2, 10))
+        await fast.aclose()
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+
+
+def test_drop_makes_room_for_the_sentinel(monkeypatch):
+    monkeypatch.setattr(change_feed, "SUBSCRIBER_QUEUE_SIZE", 2)
+
+    async def scenario():
+        feed = ChangeFeed(StubCatalog())
+        queue = asyncio.Queue(maxsize=3)
+        for change in batch(1, 3):
+            queue.put_nowait(change)
+        feed._subscribers.add(queue)
+        feed._publish(batch(4, 1))
+        assert queue not in feed._subscribers
+        items = [queue.get_nowait() for _ in range(queue.qsize())]
+        assert items[-1] is None
+
+    asyncio.run(scenario())
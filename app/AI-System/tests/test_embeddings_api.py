@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api_server
+from api_server import accepts
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from utils import embeddings
+    monkeypatch.setattr(embeddings, "get_embedding_client", lambda: None)
+    return TestClient(api_server.app)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("application/octet-stream", True),
+    ("application/octet-stream, */*;q=0.1", True),
+    ("application/json;q=0.9, Application/Octet-Stream;q=0.5", True),
+    ("application/octet-stream;q=0", False),
+    ("application/json, */*", False),
+    (None, False),
+])
+def test_accepts_parses_media_types(header, expected):
+    assert accepts(header, "application/octet-stream") is expected
+
+
+def test_null_dimensions_is_a_validation_error(client):
+    response = client.post("/api/embeddings/batch", json={"texts": ["a"], "dimensions": None})
+    assert response.status_code == 422
+
+
+def test_binary_response_for_a_listed_octet_stream(client):
+    response = client.post("/api/embeddings/batch", json={"texts": ["a", "b"], "dimensions": 4},
+                           headers={"Accept": "application/octet-stream, */*;q=0.1"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert response.headers["x-embedding-shape"] == "2,4"
+    assert len(response.content) == 2 * 4 * 4
@@ -0,0 +1,35 @@
+from utils import generation_jobs
+from utils.storage_manager import StorageManager
+
+
+class StubAudioClient:
+    def generate_speech(self, text, voice_name="Kore", output_path="output.wav"):
+        with open(output_path, "wb") as f:
+            f.write(b"RIFF" + text.encode("utf-8"))
+        return output_path
+
+
+def test_audio_job_output_goes_through_blob_store_and_catalog(tmp_path, monkeypatch):
+    storage = StorageManager(str(tmp_path))
+    monkeypatch.setattr(generation_jobs, "get_storage_manager", lambda: storage)
+    monkeypatch.setattr(generation_jobs, "get_audio_client", lambda: StubAudioClient())
+
+    payload = {"prompt": "hello there", "type": "speech"}
+    first = generation_jobs.run_audio_job(payload, {"id": "job-1"})
+    second = generation_jobs.run_audio_job(payload, {"id": "job-2"})
+
+    record = storage.catalog.get("audio", first["id"])
+    assert record["job_id"] == "job-1"
+    assert record["prompt"] == "hello there"
+    assert len(record["sha256"]) == 64
+    assert first["url"] == f"/storage/audio/{record['filename']}"
+    # Date-partitioned, content-addressed, resolvable through the media route
+    media = storage.resolve_media("audio", record["filename"])
+    assert media["path"].relative_to(tmp_path / "audio").parts[:3] == tuple(record["created_at"][:10].split("-"))
+    assert media["content_type"] == "audio/wav"
+
+    # Same bytes: one blob, two catalog records, usage counted once
+    assert storage.catalog.count("audio") == 2
+    assert storage.catalog.get("audio", second["id"])["deduplicated"] is True
+    assert storage.catalog.get_usage()["by_type"]["audio"]["bytes"] == media["path"].stat().st_size
+    assert not list((tmp_path / "tmp").iterdir())
@@ -0,0 +1,34 @@
+import time
+
+from utils.job_queue import JobStore
+
+
+def test_cancelled_running_job_keeps_its_slot_until_it_returns(tmp_path):
+    store = JobStore(tmp_path / "jobs.db")
+    first = store.submit("video", {"n": 1})
+    second = store.submit("video", {"n": 2})
+
+    assert store.claim("w1", {"video": 1})["id"] == first["id"]
+    assert store.cancel(first["id"])["status"] == "cancelled"
+    # The handler thread is still running: the type is still at its limit
+    assert store.claim("w1", {"video": 1}) is None
+    assert store.heartbeat(first["id"], "w1")
+
+    # Its result is discarded, and only now does the slot free up
+    assert not store.finish(first["id"], "w1", "succeeded", {"url": "x"})
+    job = store.get(first["id"])
+    assert job["status"] == "cancelled" and job["result"] is None and job["worker"] is None
+    assert store.claim("w1", {"video": 1})["id"] == second["id"]
+
+
+def test_cancelled_job_of_a_lost_worker_frees_its_slot_with_the_lease(tmp_path):
+    store = JobStore(tmp_path / "jobs.db")
+    first = store.submit("video", {"n": 1})
+    second = store.submit("video", {"n": 2})
+
+    store.claim("w1", {"video": 1}, lease=0.05)
+    store.cancel(first["id"])
+    assert store.claim("w2", {"video": 1}) is None
+    time.sleep(0.06)
+    assert store.claim("w2", {"video": 1})["id"] == second["id"]
+    assert store.get(first["id"])["status"] == "cancelled"
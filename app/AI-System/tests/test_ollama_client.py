@@ -0,0 +1,127 @@
+import asyncio
+
+import httpx
+import pytest
+
+from utils.ollama_client import CircuitBreaker, OllamaClient, OllamaUnavailable
+from utils.provider_registry import ProviderRegistry, TextProvider
+from utils.text_streaming import OllamaAPIError
+
+
+def make_client(handler, threshold: int = 2) -> OllamaClient:
+    client = OllamaClient(retries=0, breaker=CircuitBreaker(failure_threshold=threshold, reset_timeout=60))
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client._client_loop = asyncio.get_running_loop()
+    return client
+
+
+async def drain(client: OllamaClient):
+    return [event async for event in client.stream_chat({"model": "llama3"})]
+
+
+def read_timeout(request):
+    raise httpx.ReadTimeout("no answer", request=request)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+@pytest.mark.parametrize("handler, error", [
+    (read_timeout, OllamaUnavailable),
+    (lambda request: httpx.Response(500, text="boom"), OllamaAPIError),
+    (lambda request: httpx.Response(503, text="busy"), OllamaAPIError),
+])
+def test_chat_failures_trip_the_breaker(handler, error):
+    async def scenario():
+        client = make_client(handler)
+        for _ in range(2):
+            with pytest.raises(error):
+                await client.chat({"model": "llama3"})
+        assert client.breaker.state == "open"
+        with pytest.raises(OllamaUnavailable):
+            await client.chat({"model": "llama3"})
+
+    asyncio.run(scenario())
+
+
+def test_chat_client_errors_do_not_count():
+    async def scenario():
+        client = make_client(lambda request: httpx.Response(404, text="model not found"))
+        for _ in range(3):
+            with pytest.raises(OllamaAPIError):
+                await client.chat({"model": "llama3"})
+        assert client.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+async def hang(request):
+    await asyncio.sleep(10)
+
+
+def test_cancelled_calls_leave_the_breaker_closed():
+    async def scenario():
+        client = make_client(hang, threshold=1)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.chat({"model": "llama3"}), 0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(drain(client), 0.05)
+        assert client.breaker.state == "closed" and client.breaker.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_hedge_loser_leaves_the_breaker_closed():
+    async def scenario():
+        client = make_client(hang, threshold=1)
+        registry = ProviderRegistry(["ollama", "fast"], "hedge", {})
+        slow = registry.register(TextProvider("ollama", lambda: client.model, client.chat, None))
+        slow.hedge_delay = lambda: 0.01
+
+        async def answer(payload):
+            return {"message": {"content": "fast"}}
+
+        registry.register(TextProvider("fast", lambda: "fast", answer, None))
+        result = await registry.generate(lambda provider: provider.generate({"model": "llama3"}))
+        assert result["message"]["content"] == "fast"
+        await asyncio.sleep(0.01)  # let the cancelled Ollama call unwind
+        assert client.breaker.state == "closed" and client.breaker.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_stream_errors_are_typed_and_recorded():
+    async def scenario():
+        client = make_client(lambda request: httpx.Response(500, text="boom"), threshold=1)
+        with pytest.raises(OllamaAPIError) as info:
+            await drain(client)
+        assert info.value.status_code == 500
+        assert client.breaker.state == "open"
+
+        client = make_client(read_timeout, threshold=1)
+        with pytest.raises(OllamaUnavailable):
+            await drain(client)
+        assert client.breaker.state == "open"
+
+    asyncio.run(scenario())
+
+
+def test_stream_success_closes_the_breaker():
+    body = b'{"message": {"content": "hi"}}\n{"done": true, "prompt_eval_count": 1, "eval_count": 2}\n'
+
+    async def scenario():
+        client = make_client(lambda request: httpx.Response(200, content=body))
+        client.breaker.record_failure()
+        events = await drain(client)
+        assert events[0] == {"type": "delta", "text": "hi"}
+        assert events[-1]["tokens"] == 3
+        assert client.breaker.failures == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from utils import prompt_index
+from utils.catalog import SQLiteCatalog
+
+
+def test_wide_prefix_merge_returns_newest_matches_in_order(tmp_path):
+    catalog = SQLiteCatalog(tmp_path / "catalog.db")
+    start = datetime(2025, 1, 1)
+    records = [
+        {
+            "id": f"img-{i:04d}",
+            "filename": f"image_{i:04d}.jpg",
+            # Every third item has no scene tag; tags repeat so terms share postings
+            "prompt": f"neon scene{i % 200}" if i % 3 else "neon portrait",
+            "created_at": (start + timedelta(seconds=i)).isoformat(),
+        }
+        for i in range(1000)
+    ]
+    catalog.add_many("images", records)
+
+    conn = catalog._connect()
+    group = prompt_index.QueryGroup("sc", prefix=True)
+    catalog.prompt_index._expand(conn, "images", group)
+    assert len(group.terms) > prompt_index.MAX_PREFIX_EXPANSION
+
+    expected = [r["id"] for r in sorted(records, key=lambda r: r["created_at"], reverse=True) if "scene" in r["prompt"]]
+    assert [r["id"] for r in catalog.search("images", "sc", limit=50)] == expected[:50]
+    assert [r["id"] for r in catalog.search("images", "neon sc", limit=300)] == expected[:300]
+    catalog.close()
+
+
+def test_delete_drops_only_the_terms_left_unused(tmp_path):
+    catalog = SQLiteCatalog(tmp_path / "catalog.db")
+    catalog.add_many("images", [
+        {"id": "a", "filename": "a.jpg", "prompt": "neon city", "created_at": "2025-01-01T00:00:00"},
+        {"id": "b", "filename": "b.jpg", "prompt": "neon forest", "created_at": "2025-01-01T00:00:01"},
+    ])
+    catalog.delete("images", "a")
+
+    conn = catalog._connect()
+    terms = dict(conn.execute("SELECT term, df FROM prompt_terms WHERE kind = 'images'").fetchall())
+    assert terms == {"neon": 1, "forest": 1}
+    assert [r["id"] for r in catalog.search("images", "neon")] == ["b"]
+    catalog.close()
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import httpx
+
+from utils.ollama_client import CircuitBreaker, OllamaClient
+from utils.provider_registry import ProviderRegistry, TextProvider
+
+
+def ollama_registry(client: OllamaClient) -> ProviderRegistry:
+    async def generate(payload):
+        return await client.chat(payload)
+
+    registry = ProviderRegistry(["ollama"], "fallback", {})
+    registry.register(TextProvider(
+        "ollama", lambda: client.model if client.available() else None, generate, None
+    ))
+    return registry
+
+
+def use_transport(client: OllamaClient, handler):
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client._client_loop = asyncio.get_running_loop()
+
+
+def test_breaker_recovers_through_registry():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"message": {"content": "hi"}})
+
+    async def scenario():
+        client = OllamaClient(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+        use_transport(client, handler)
+        registry = ollama_registry(client)
+
+        # A failed startup probe opens the breaker
+        client.breaker.open()
+        assert registry.candidates() == []
+        assert registry.identity() == ""
+
+        time.sleep(0.06)
+        assert client.breaker.state == "half_open"
+        # Routing, cache keys and stats must not use up the half-open trial
+        for _ in range(3):
+            assert registry.identity() == "ollama/llama3"
+            registry.stats()
+        assert [p.name for p in registry.candidates()] == ["ollama"]
+
+        result = await registry.generate(lambda provider: provider.generate({"model": client.model}))
+        assert result["message"]["content"] == "hi"
+        assert client.breaker.state == "closed"
+        assert calls == ["/api/chat"]
+
+    asyncio.run(scenario())
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.open()
+    assert not breaker.is_available()
+    time.sleep(0.06)
+    assert breaker.is_available() and breaker.is_available()
+    assert breaker.allow()
+    assert not breaker.is_available()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
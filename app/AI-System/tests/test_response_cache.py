@@ -0,0 +1,27 @@
+import threading
+
+from utils.response_cache import ResponseCache
+
+
+def test_counters_stay_exact_under_concurrent_use(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path), max_entries=8, enabled=True)
+    for n in range(16):
+        cache.set(f"{n:02d}" * 32, {"text": str(n)})
+    assert cache.stats()["evicted"] == 8
+
+    def worker():
+        for n in range(200):
+            cache.get(f"{n % 16:02d}" * 32)
+            cache.get("ff" * 32)
+            cache.bypass()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats["memory_hits"] + stats["disk_hits"] == 8 * 200
+    assert stats["misses"] == 8 * 200
+    assert stats["bypassed"] == 8 * 200
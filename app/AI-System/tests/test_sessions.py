@@ -0,0 +1,44 @@
+from utils.sessions import SessionStore
+
+
+def turn(n: int):
+    return {"role": "user", "content": f"q{n}"}, {"role": "assistant", "content": f"a{n}"}
+
+
+def test_turn_survives_spill_during_request(tmp_path):
+    store = SessionStore(max_sessions=1, spill=True, spill_dir=str(tmp_path))
+    session = store.create("be brief")
+    # Another session pushes this one to disk while its turn is running
+    store.create()
+
+    live = store.append(session, *turn(1))
+    assert live is not session
+    assert store.get(session.id).messages == list(turn(1))
+
+
+def test_turn_survives_eviction_without_spill():
+    store = SessionStore(max_sessions=1)
+    session = store.create()
+    store.create()
+
+    assert store.append(session, *turn(1)) is session
+    assert store.get(session.id).messages == list(turn(1))
+
+
+def test_turn_does_not_revive_deleted_session():
+    store = SessionStore()
+    session = store.create()
+    store.delete(session.id)
+
+    assert store.append(session, *turn(1)) is None
+    assert store.get(session.id) is None
+
+
+def test_messages_are_capped_from_the_oldest_turn():
+    store = SessionStore(max_messages=5)
+    session = store.create()
+    for n in range(4):
+        store.append(session, *turn(n))
+
+    # 8 messages over a cap of 5: the cut lands on a reply, so the history starts at the next user turn
+    assert [m["content"] for m in store.get(session.id).messages] == ["q2", "a2", "q3", "a3"]
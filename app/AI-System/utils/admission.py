@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Admission Control
+Token-bucket RPM/TPM limits in front of each AI provider, with a bounded
+wait queue. Requests that could not be admitted within their lane's
+deadline are shed straight away (503 + Retry-After) instead of piling up
+behind the provider; interactive callers are always served before batch ones
+
+Configured per provider with <PROVIDER>_RPM, <PROVIDER>_TPM (0 = unlimited),
+<PROVIDER>_MAX_QUEUE, and ADMISSION_MAX_WAIT / ADMISSION_BATCH_MAX_WAIT.
+Limits are for the whole server and are split between API_WORKERS processes.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from typing import Any, Dict, List, Optional
+
+from .metrics import registry
+
+API_WORKERS = max(1, int(os.getenv("API_WORKERS", "1")))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "10"))
+ADMISSION_BATCH_MAX_WAIT = float(os.getenv("ADMISSION_BATCH_MAX_WAIT", "120"))
+
+# Lane -> priority (lower is served first)
+LANES = {"interactive": 0, "batch": 1}
+
+ADMISSION_DECISIONS = registry.counter(
+    "admission_decisions_total", "Provider admission decisions", ("provider", "lane", "decision")
+)
+ADMISSION_QUEUE_DEPTH = registry.gauge("admission_queue_depth", "Requests waiting for provider admission", ("provider",))
+ADMISSION_WAIT = registry.histogram(
+    "admission_wait_seconds", "Time admitted requests waited for a provider", ("provider", "lane"),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class AdmissionRejected(Exception):
+    """A request was shed; retry_after is the suggested wait in seconds"""
+
+    def __init__(self, provider: str, reason: str, retry_after: float):
+        super().__init__(f"{provider} is over capacity ({reason}), retry in {retry_after:.0f}s")
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute`; holds at most `burst` (one minute's worth by default)"""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (a single oversized request needs a full bucket)"""
+        if not self.enabled:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (min(amount, self.capacity) - self.tokens) / self.rate)
+
+    def take(self, amount: float, now: float):
+        if self.enabled:
+            self._refill(now)
+            self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        """Give back (or, negative, charge) tokens after the real cost is known"""
+        if self.enabled:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdmissionLimits:
+    """Rate limits and queue bound of one provider"""
+
+    def __init__(self, rpm: float, tpm: float, max_queue: int,
+                 max_wait: Optional[Dict[str, float]] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_queue = max_queue
+        self.max_wait = max_wait or {"interactive": ADMISSION_MAX_WAIT, "batch": ADMISSION_BATCH_MAX_WAIT}
+
+
+def admission_limits_from_env(provider: str, rpm: float, tpm: float, max_queue: int) -> AdmissionLimits:
+    """Limits for a provider, overridable with <PROVIDER>_RPM / <PROVIDER>_TPM / <PROVIDER>_MAX_QUEUE"""
+    prefix = provider.upper()
+    return AdmissionLimits(
+        float(os.getenv(f"{prefix}_RPM", str(rpm))) / API_WORKERS,
+        float(os.getenv(f"{prefix}_TPM", str(tpm))) / API_WORKERS,
+        max(1, int(os.getenv(f"{prefix}_MAX_QUEUE", str(max_queue))) // API_WORKERS)
+    )
+
+
+DEFAULT_ADMISSION_LIMITS = {
+    "gemini": admission_limits_from_env("gemini", 300, 1_000_000, 64),
+    # One GPU box: keep the queue short rather than letting latency grow
+    "ollama": admission_limits_from_env("ollama", 30, 0, 8),
+}
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "event")
+
+    def __init__(self, priority: int, seq: int, tokens: int):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.event = asyncio.Event()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """RPM/TPM buckets and a priority wait queue for one provider"""
+
+    def __init__(self, provider: str, limits: AdmissionLimits):
+        self.provider = provider
+        self.limits = limits
+        self.requests = TokenBucket(limits.rpm)
+        self.tokens = TokenBucket(limits.tpm)
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._depth = ADMISSION_QUEUE_DEPTH.labels(provider)
+
+    def _ready_in(self, requests: int, tokens: int, now: float) -> float:
+        return max(self.requests.wait_time(requests, now), self.tokens.wait_time(tokens, now))
+
+    def _projected_wait(self, priority: int, tokens: int, now: float) -> float:
+        """Time until a new request would reach the front and find enough budget"""
+        ahead = [w for w in self._queue if w.priority <= priority]
+        return self._ready_in(len(ahead) + 1, sum(w.tokens for w in ahead) + tokens, now)
+
+    def _reject(self, lane: str, reason: str, retry_after: float) -> AdmissionRejected:
+        ADMISSION_DECISIONS.labels(self.provider, lane, "rejected").inc()
+        return AdmissionRejected(self.provider, reason, max(1.0, retry_after))
+
+    def _remove(self, waiter: _Waiter):
+        if waiter in self._queue:
+            self._queue.remove(waiter)
+            heapq.heapify(self._queue)
+        self._depth.set(len(self._queue))
+        if self._queue:
+            self._queue[0].event.set()
+
+    async def admit(self, tokens: int, lane: str = "interactive") -> float:
+        """Wait for budget for one request of about `tokens` tokens, returns seconds waited
+
+        Raises AdmissionRejected when the queue is full or the request would
+        not be admitted within its lane's maximum wait.
+        """
+        priority = LANES[lane]
+        max_wait = self.limits.max_wait[lane]
+        started = time.monotonic()
+
+        if len(self._queue) >= self.limits.max_queue:
+            raise self._reject(lane, "queue full", self._projected_wait(priority, tokens, started))
+        projected = self._projected_wait(priority, tokens, started)
+        if projected > max_wait:
+            raise self._reject(lane, "rate limit", projected)
+
+        deadline = started + max_wait
+        waiter = _Waiter(priority, next(self._seq), tokens)
+        heapq.heappush(self._queue, waiter)
+        self._depth.set(len(self._queue))
+        try:
+            while True:
+                now = time.monotonic()
+                if self._queue[0] is waiter:
+                    wait = self._ready_in(1, tokens, now)
+                    if wait <= 0:
+                        self.requests.take(1, now)
+                        self.tokens.take(tokens, now)
+                        waited = now - started
+                        ADMISSION_DECISIONS.labels(self.provider, lane, "admitted").inc()
+                        ADMISSION_WAIT.labels(self.provider, lane).observe(waited)
+                        return waited
+                    if now + wait > deadline:
+                        raise self._reject(lane, "deadline", wait)
+                    sleep_for = wait
+                else:
+                    sleep_for = deadline - now
+                    if sleep_for <= 0:
+                        raise self._reject(lane, "deadline", self._projected_wait(priority, tokens, now))
+
+                # Woken early when this waiter becomes the head of the queue
+                waiter.event.clear()
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), sleep_for)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._remove(waiter)
+
+    def settle(self, estimated: int, actual: int):
+        """Correct the TPM bucket once the real token count of an admitted request is known"""
+        if actual:
+            self.tokens.refund(estimated - actual)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self.requests.wait_time(0, now)
+        self.tokens.wait_time(0, now)
+        return {
+            "rpm": self.limits.rpm,
+            "tpm": self.limits.tpm,
+            "requests_available": round(self.requests.tokens, 1) if self.requests.enabled else None,
+            "tokens_available": round(self.tokens.tokens) if self.tokens.enabled else None,
+            "queued": {lane: sum(1 for w in self._queue if w.priority == p) for lane, p in LANES.items()},
+            "max_queue": self.limits.max_queue
+        }
+
+
+class AdmissionControl:
+    """One AdmissionController per provider, created on first use"""
+
+    def __init__(self, limits: Optional[Dict[str, AdmissionLimits]] = None):
+        self.limits = dict(DEFAULT_ADMISSION_LIMITS if limits is None else limits)
+        self._controllers: Dict[str, AdmissionController] = {}
+
+    def controller(self, provider: str) -> AdmissionController:
+        if provider not in self._controllers:
+            limits = self.limits.get(provider) or admission_limits_from_env(provider, 0, 0, 32)
+            self._controllers[provider] = AdmissionController(provider, limits)
+        return self._controllers[provider]
+
+    async def admit(self, provider: str, tokens: int, lane: str = "interactive") -> float:
+        return await self.controller(provider).admit(tokens, lane)
+
+    def settle(self, provider: str, estimated: int, actual: int):
+        self.controller(provider).settle(estimated, actual)
+
+    def stats(self) -> Dict[str, Any]:
+        return {provider: controller.stats() for provider, controller in self._controllers.items()}
@@ -0,0 +1,724 @@
+#!/usr/bin/env python3
+"""
+Media Catalog Backends
+Indexed metadata storage for AI-generated content (replaces metadata.json)
+"""
+
+import base64
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Tuple
+
+from .prompt_index import PromptIndex
+
+# Content kinds tracked by the catalog (same keys as the legacy metadata.json)
+CONTENT_KINDS = ("images", "videos", "audio")
+
+
+def encode_cursor(record: Dict[str, Any]) -> str:
+    """Opaque keyset cursor pointing just after a record"""
+    raw = json.dumps([record["created_at"], record["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a keyset cursor, raises ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(item_id, str):
+        raise ValueError("Invalid cursor")
+    return created_at, item_id
+
+
+def legacy_thumbnail(record: Dict[str, Any]) -> Optional[str]:
+    """A record's own thumbnail from before multi-size derivatives (thumbnails/thumb_<name>)
+
+    Derivatives live one level deeper (thumbnails/<size>/) and may be shared
+    by duplicate uploads, so they are never returned here.
+    """
+    path = record.get("thumbnail_path")
+    if path and Path(path).parent.name == "thumbnails":
+        return path
+    return None
+
+
+class CatalogBackend(ABC):
+    """Interface every catalog backend implements"""
+
+    @abstractmethod
+    def add(self, kind: str, record: Dict[str, Any]) -> None:
+        """Insert a record (must contain id, created_at and prompt)"""
+
+    @abstractmethod
+    def add_many(self, kind: str, records: Iterable[Dict[str, Any]]) -> int:
+        """Insert many records in a single write, returns number inserted"""
+
+    @abstractmethod
+    def get(self, kind: str, item_id: str) -> Optional[Dict[str, Any]]:
+        """Get a record by ID"""
+
+    @abstractmethod
+    def delete(self, kind: str, item_id: str) -> Optional[Dict[str, Any]]:
+        """Delete a record by ID, returns the deleted record"""
+
+    @abstractmethod
+    def list(self, kind: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """List records, newest first"""
+
+    @abstractmethod
+    def list_page(self, kind: str, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Keyset page of records newest first, returns (records, next_cursor)"""
+
+    @abstractmethod
+    def search(self, kind: str, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Search records by prompt, newest first"""
+
+    @abstractmethod
+    def count(self, kind: str) -> int:
+        """Number of records of a kind"""
+
+    @abstractmethod
+    def find_by_stem(self, kind: str, stem: str) -> Optional[Dict[str, Any]]:
+        """Get a record by its filename without extension"""
+
+    @abstractmethod
+    def set_derivative(self, item_id: str, size: int, fmt: str, status: str, path: str, file_size: int = 0) -> None:
+        """Record the state of a derived file (thumbnail) of an item"""
+
+    @abstractmethod
+    def get_derivatives(self, item_id: str) -> List[Dict[str, Any]]:
+        """Derived files of an item"""
+
+    @abstractmethod
+    def delete_derivatives(self, item_id: str) -> List[str]:
+        """Forget the derived files of an item, returns their paths"""
+
+    @abstractmethod
+    def transaction(self):
+        """Context manager grouping calls into one atomic write"""
+
+    @abstractmethod
+    def acquire_blob(self, sha256: str, kind: str, path: str, size: int, content_type: Optional[str]) -> Tuple[str, bool]:
+        """Take a reference on a content-addressed blob, creating its row if new
+
+        Returns (stored path, created).
+        """
+
+    @abstractmethod
+    def release_blob(self, sha256: str) -> Optional[str]:
+        """Drop a reference on a blob, returns its path once nothing references it"""
+
+    @abstractmethod
+    def move_blob(self, sha256: str, path: str, created_at: str) -> None:
+        """Record that a blob file moved (to another date partition)"""
+
+    @abstractmethod
+    def count_blobs_under(self, prefix: str) -> int:
+        """Number of blobs whose path starts with a directory prefix"""
+
+    @abstractmethod
+    def expire_before(self, cutoff: str, batch_size: int = 1000, on_progress=None) -> Dict[str, Any]:
+        """Delete every record created before an ISO timestamp in one transaction
+
+        Files that must go are queued in the pending-cleanup list rather than
+        deleted, so the filesystem side can be resumed after a crash.
+        """
+
+    @abstractmethod
+    def pending_cleanup(self, limit: int = 1000) -> List[str]:
+        """Paths still queued for deletion by an expiry run"""
+
+    @abstractmethod
+    def complete_cleanup(self, paths: Iterable[str]) -> None:
+        """Remove handled paths from the pending-cleanup list"""
+
+    @abstractmethod
+    def get_blob(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Get a blob row by hash"""
+
+    @abstractmethod
+    def add_alias(self, kind: str, name: str, sha256: str) -> None:
+        """Keep a legacy file name resolving to a blob"""
+
+    @abstractmethod
+    def resolve_alias(self, kind: str, name: str) -> Optional[str]:
+        """Blob hash behind a legacy file name"""
+
+    @abstractmethod
+    def get_usage(self, days: int = 30) -> Dict[str, Any]:
+        """Disk usage counters per content type, plus per day for recent days"""
+
+    @abstractmethod
+    def replace_usage(self, rows: Iterable[Tuple[str, str, int, int]]) -> None:
+        """Overwrite the usage counters with (kind, day, files, bytes) rows from a full scan"""
+
+    @abstractmethod
+    def stored_files(self, batch_size: int = 1000) -> Iterator[Tuple[str, str, str]]:
+        """(usage kind, path, timestamp) of every file the usage counters track, keyed as they bump them"""
+
+    @abstractmethod
+    def changes_since(self, seq: int, limit: int = 500) -> List[Dict[str, Any]]:
+        """Catalog changes (added/updated/deleted items) after a sequence number, oldest first"""
+
+    @abstractmethod
+    def last_change(self) -> int:
+        """Sequence number of the newest catalog change (0 if none)"""
+
+    @abstractmethod
+    def trim_changes(self, keep: int) -> int:
+        """Forget all but the newest `keep` changes, returns how many were dropped"""
+
+    @abstractmethod
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Read a catalog-level setting"""
+
+    @abstractmethod
+    def set_meta(self, key: str, value: str) -> None:
+        """Write a catalog-level setting"""
+
+    def close(self) -> None:
+        """Release backend resources"""
+
+
+class SQLiteCatalog(CatalogBackend):
+    """Embedded SQLite catalog in WAL mode
+
+    Every write touches only the affected rows, and list/lookup/search walk
+    indexes, so none of them scale with the size of the catalog. The database
+    is shared by every API worker process: writes are serialized by SQLite's
+    write lock, and each one is recorded in the change log in the same
+    transaction so other workers (and clients) can follow along.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS media (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            filename TEXT,
+            prompt TEXT NOT NULL DEFAULT '',
+            content_type TEXT,
+            created_at TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_media_kind_created ON media(kind, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_media_created ON media(created_at);
+        CREATE INDEX IF NOT EXISTS idx_media_prompt ON media(prompt COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS idx_media_content_type ON media(content_type);
+        CREATE INDEX IF NOT EXISTS idx_media_filename ON media(filename);
+        CREATE TABLE IF NOT EXISTS derivatives (
+            item_id TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            format TEXT NOT NULL,
+            status TEXT NOT NULL,
+            path TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            file_size INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (item_id, size, format)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS usage_counters (
+            kind TEXT NOT NULL,
+            day TEXT NOT NULL,
+            files INTEGER NOT NULL DEFAULT 0,
+            bytes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (kind, day)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            content_type TEXT,
+            refcount INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS aliases (
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            PRIMARY KEY (kind, name)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_aliases_sha256 ON aliases(sha256);
+        CREATE INDEX IF NOT EXISTS idx_blobs_path ON blobs(path);
+        CREATE TABLE IF NOT EXISTS cleanup_pending (
+            path TEXT PRIMARY KEY
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            item_id TEXT NOT NULL,
+            action TEXT NOT NULL,
+            changed_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS catalog_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    # Bump to force a prompt index rebuild when tokenization changes
+    PROMPT_INDEX_VERSION = "1"
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self.prompt_index = PromptIndex()
+
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+        conn.executescript(self.prompt_index.SCHEMA)
+        self._add_column(conn, "derivatives", "file_size", "INTEGER NOT NULL DEFAULT 0")
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('created', ?)",
+                (datetime.now().isoformat(),)
+            )
+            if self.get_meta("prompt_index_version") != self.PROMPT_INDEX_VERSION:
+                self.prompt_index.rebuild(conn)
+                self.set_meta("prompt_index_version", self.PROMPT_INDEX_VERSION)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the connection for the current thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _add_column(conn: sqlite3.Connection, table: str, column: str, declaration: str):
+        """Add a column to a table created by an older schema"""
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+    @staticmethod
+    def _bump_usage(conn: sqlite3.Connection, kind: str, created_at: str, files: int, size: int):
+        """Adjust the usage counters of the day a file was written"""
+        conn.execute(
+            "INSERT INTO usage_counters (kind, day, files, bytes) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (kind, day) DO UPDATE SET files = files + excluded.files, bytes = bytes + excluded.bytes",
+            (kind, created_at[:10], files, size)
+        )
+
+    @staticmethod
+    def _log_changes(conn: sqlite3.Connection, changes: Iterable[Tuple[str, str, str]]):
+        """Append (kind, item_id, action) rows to the change log"""
+        now = datetime.now().isoformat()
+        conn.executemany(
+            "INSERT INTO change_log (kind, item_id, action, changed_at) VALUES (?, ?, ?, ?)",
+            [(kind, item_id, action, now) for kind, item_id, action in changes]
+        )
+
+    @contextmanager
+    def transaction(self):
+        """Run statements in one write transaction"""
+        conn = self._connect()
+        if conn.in_transaction:
+            # Nested use joins the outer transaction
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _row_values(kind: str, record: Dict[str, Any]) -> tuple:
+        return (
+            record["id"],
+            kind,
+            record.get("filename"),
+            record.get("prompt") or "",
+            record.get("content_type"),
+            record["created_at"],
+            json.dumps(record, ensure_ascii=False),
+        )
+
+    @staticmethod
+    def _decode(rows) -> List[Dict[str, Any]]:
+        return [json.loads(row[0]) for row in rows]
+
+    def _insert(self, conn: sqlite3.Connection, kind: str, record: Dict[str, Any]) -> None:
+        """Insert or replace a row and keep the prompt index in step"""
+        previous = conn.execute(
+            "SELECT kind, prompt, created_at FROM media WHERE id = ?", (record["id"],)
+        ).fetchone()
+        if previous:
+            self.prompt_index.remove(conn, previous[0], record["id"], previous[1], previous[2])
+        values = self._row_values(kind, record)
+        conn.execute(
+            "INSERT OR REPLACE INTO media (id, kind, filename, prompt, content_type, created_at, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            values
+        )
+        self.prompt_index.add(conn, kind, record["id"], values[3], record["created_at"])
+        self._log_changes(conn, [(kind, record["id"], "updated" if previous else "added")])
+
+    def add(self, kind: str, record: Dict[str, Any]) -> None:
+        with self.transaction() as conn:
+            self._insert(conn, kind, record)
+
+    def add_many(self, kind: str, records: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        with self.transaction() as conn:
+            for record in records:
+                self._insert(conn, kind, record)
+                count += 1
+        return count
+
+    def get(self, kind: str, item_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT data FROM media WHERE id = ? AND kind = ?", (item_id, kind)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, kind: str, item_id: str) -> Optional[Dict[str, Any]]:
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT data, prompt, created_at FROM media WHERE id = ? AND kind = ?", (item_id, kind)
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute("DELETE FROM media WHERE id = ?", (item_id,))
+            self.prompt_index.remove(conn, kind, item_id, row[1], row[2])
+            self._log_changes(conn, [(kind, item_id, "deleted")])
+        return json.loads(row[0])
+
+    def list(self, kind: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT data FROM media WHERE kind = ? ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+            (kind, limit, offset)
+        ).fetchall()
+        return self._decode(rows)
+
+    def list_page(self, kind: str, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        # Seeks into the (kind, created_at, id) index, so any page costs O(limit)
+        if cursor:
+            created_at, item_id = decode_cursor(cursor)
+            rows = self._connect().execute(
+                "SELECT data FROM media WHERE kind = ? AND (created_at, id) < (?, ?) "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                (kind, created_at, item_id, limit + 1)
+            ).fetchall()
+        else:
+            rows = self._connect().execute(
+                "SELECT data FROM media WHERE kind = ? ORDER BY created_at DESC, id DESC LIMIT ?",
+                (kind, limit + 1)
+            ).fetchall()
+        records = self._decode(rows[:limit])
+        next_cursor = encode_cursor(records[-1]) if len(rows) > limit and records else None
+        return records, next_cursor
+
+    def search(self, kind: str, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        conn = self._connect()
+        ids = self.prompt_index.search(conn, kind, query, limit=limit)
+        if ids is None:
+            # A blank query matches everything; punctuation alone matches nothing
+            return self.list(kind, limit=limit) if not query.strip() else []
+        records = []
+        for item_id in ids:
+            row = conn.execute("SELECT data FROM media WHERE id = ?", (item_id,)).fetchone()
+            if row:
+                records.append(json.loads(row[0]))
+        return records
+
+    def count(self, kind: str) -> int:
+        row = self._connect().execute("SELECT COUNT(*) FROM media WHERE kind = ?", (kind,)).fetchone()
+        return row[0]
+
+    def find_by_stem(self, kind: str, stem: str) -> Optional[Dict[str, Any]]:
+        # Range seek on the filename index: "<stem>." up to (not including) "<stem>/"
+        row = self._connect().execute(
+            "SELECT data FROM media WHERE filename >= ? AND filename < ? AND kind = ? LIMIT 1",
+            (stem + ".", stem + "/", kind)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_derivative(self, item_id: str, size: int, fmt: str, status: str, path: str, file_size: int = 0) -> None:
+        now = datetime.now().isoformat()
+        with self.transaction() as conn:
+            previous = conn.execute(
+                "SELECT file_size, updated_at FROM derivatives WHERE item_id = ? AND size = ? AND format = ?",
+                (item_id, size, fmt)
+            ).fetchone()
+            if previous and previous[0]:
+                self._bump_usage(conn, "thumbnails", previous[1], -1, -previous[0])
+            if file_size:
+                self._bump_usage(conn, "thumbnails", now, 1, file_size)
+            conn.execute(
+                "INSERT OR REPLACE INTO derivatives (item_id, size, format, status, path, updated_at, file_size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (item_id, size, fmt, status, path, now, file_size)
+            )
+
+    def get_derivatives(self, item_id: str) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT size, format, status, path, updated_at FROM derivatives WHERE item_id = ? ORDER BY size, format",
+            (item_id,)
+        ).fetchall()
+        return [
+            {"size": row[0], "format": row[1], "status": row[2], "path": row[3], "updated_at": row[4]}
+            for row in rows
+        ]
+
+    def delete_derivatives(self, item_id: str) -> List[str]:
+        with self.transaction() as conn:
+            rows = conn.execute(
+                "SELECT path, file_size, updated_at FROM derivatives WHERE item_id = ?", (item_id,)
+            ).fetchall()
+            for _, file_size, updated_at in rows:
+                if file_size:
+                    self._bump_usage(conn, "thumbnails", updated_at, -1, -file_size)
+            conn.execute("DELETE FROM derivatives WHERE item_id = ?", (item_id,))
+        return [row[0] for row in rows]
+
+    def acquire_blob(self, sha256: str, kind: str, path: str, size: int, content_type: Optional[str]) -> Tuple[str, bool]:
+        with self.transaction() as conn:
+            row = conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if row:
+                conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = ?", (sha256,))
+                return row[0], False
+            created_at = datetime.now().isoformat()
+            conn.execute(
+                "INSERT INTO blobs (sha256, kind, path, size, content_type, refcount, created_at) "
+                "VALUES (?, ?, ?, ?, ?, 1, ?)",
+                (sha256, kind, path, size, content_type, created_at)
+            )
+            self._bump_usage(conn, kind, created_at, 1, size)
+        return path, True
+
+    def release_blob(self, sha256: str) -> Optional[str]:
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT path, refcount, kind, size, created_at FROM blobs WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+            if not row:
+                return None
+            if row[1] > 1:
+                conn.execute("UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = ?", (sha256,))
+                return None
+            conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+            conn.execute("DELETE FROM aliases WHERE sha256 = ?", (sha256,))
+            self._bump_usage(conn, row[2], row[4], -1, -row[3])
+        return row[0]
+
+    def move_blob(self, sha256: str, path: str, created_at: str) -> None:
+        with self.transaction() as conn:
+            row = conn.execute("SELECT kind, size, created_at FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if not row:
+                return
+            conn.execute("UPDATE blobs SET path = ?, created_at = ? WHERE sha256 = ?", (path, created_at, sha256))
+            self._bump_usage(conn, row[0], row[2], -1, -row[1])
+            self._bump_usage(conn, row[0], created_at, 1, row[1])
+
+    def count_blobs_under(self, prefix: str) -> int:
+        # Range seek on the path index
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM blobs WHERE path >= ? AND path < ?", (prefix, prefix + "\U0010ffff")
+        ).fetchone()
+        return row[0]
+
+    def expire_before(self, cutoff: str, batch_size: int = 1000, on_progress=None) -> Dict[str, Any]:
+        deleted = {kind: 0 for kind in CONTENT_KINDS}
+        blobs_released = 0
+        with self.transaction() as conn:
+            while True:
+                rows = conn.execute(
+                    "SELECT id, kind, prompt, created_at, data FROM media WHERE created_at < ? "
+                    "ORDER BY created_at LIMIT ?",
+                    (cutoff, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+
+                pending = []
+                for item_id, kind, prompt, created_at, data in rows:
+                    conn.execute("DELETE FROM media WHERE id = ?", (item_id,))
+                    self.prompt_index.remove(conn, kind, item_id, prompt, created_at)
+                    record = json.loads(data)
+                    if record.get("sha256"):
+                        path = self.release_blob(record["sha256"])
+                        if path:
+                            blobs_released += 1
+                            pending.append(path)
+                            pending.extend(self.delete_derivatives(record["sha256"]))
+                    else:
+                        # Saved before content addressing
+                        if record.get("file_path"):
+                            pending.append(record["file_path"])
+                        pending.extend(self.delete_derivatives(item_id))
+                    # Migrated records keep their pre-derivative thumbnail
+                    legacy = legacy_thumbnail(record)
+                    if legacy:
+                        pending.append(legacy)
+                    deleted[kind] = deleted.get(kind, 0) + 1
+
+                conn.executemany(
+                    "INSERT OR IGNORE INTO cleanup_pending (path) VALUES (?)", [(p,) for p in pending]
+                )
+                self._log_changes(conn, [(row[1], row[0], "deleted") for row in rows])
+                if on_progress:
+                    on_progress(dict(deleted))
+        return {"deleted": deleted, "blobs_released": blobs_released}
+
+    def pending_cleanup(self, limit: int = 1000) -> List[str]:
+        rows = self._connect().execute("SELECT path FROM cleanup_pending LIMIT ?", (limit,)).fetchall()
+        return [row[0] for row in rows]
+
+    def complete_cleanup(self, paths: Iterable[str]) -> None:
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM cleanup_pending WHERE path = ?", [(p,) for p in paths])
+
+    def get_blob(self, sha256: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT sha256, kind, path, size, content_type, refcount, created_at FROM blobs WHERE sha256 = ?",
+            (sha256,)
+        ).fetchone()
+        if not row:
+            return None
+        keys = ("sha256", "kind", "path", "size", "content_type", "refcount", "created_at")
+        return dict(zip(keys, row))
+
+    def add_alias(self, kind: str, name: str, sha256: str) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO aliases (kind, name, sha256) VALUES (?, ?, ?)", (kind, name, sha256)
+            )
+
+    def resolve_alias(self, kind: str, name: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT sha256 FROM aliases WHERE kind = ? AND name = ?", (kind, name)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_usage(self, days: int = 30) -> Dict[str, Any]:
+        conn = self._connect()
+        by_type = {
+            kind: {"files": files, "bytes": size}
+            for kind, files, size in conn.execute(
+                "SELECT kind, SUM(files), SUM(bytes) FROM usage_counters GROUP BY kind"
+            )
+        }
+        by_day = [
+            {"day": day, "kind": kind, "files": files, "bytes": size}
+            for day, kind, files, size in conn.execute(
+                "SELECT day, kind, files, bytes FROM usage_counters "
+                "WHERE day >= date('now', 'localtime', ?) ORDER BY day DESC, kind",
+                (f"-{int(days)} days",)
+            )
+        ]
+        return {"by_type": by_type, "by_day": by_day}
+
+    def stored_files(self, batch_size: int = 1000) -> Iterator[Tuple[str, str, str]]:
+        # Keyset pages, so no read transaction stays open for the whole scan
+        conn = self._connect()
+        last = ""
+        while True:
+            rows = conn.execute(
+                "SELECT sha256, kind, path, created_at FROM blobs WHERE sha256 > ? ORDER BY sha256 LIMIT ?",
+                (last, batch_size)
+            ).fetchall()
+            for _, kind, path, created_at in rows:
+                yield kind, path, created_at
+            if len(rows) < batch_size:
+                break
+            last = rows[-1][0]
+        # Derivatives count once rendered (file_size set), by their updated_at
+        last_key = ("", 0, "")
+        while True:
+            rows = conn.execute(
+                "SELECT item_id, size, format, path, updated_at FROM derivatives "
+                "WHERE (item_id, size, format) > (?, ?, ?) AND file_size > 0 ORDER BY item_id, size, format LIMIT ?",
+                (*last_key, batch_size)
+            ).fetchall()
+            for row in rows:
+                yield "thumbnails", row[3], row[4]
+            if len(rows) < batch_size:
+                break
+            last_key = rows[-1][:3]
+
+    def replace_usage(self, rows: Iterable[Tuple[str, str, int, int]]) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM usage_counters")
+            conn.executemany(
+                "INSERT INTO usage_counters (kind, day, files, bytes) VALUES (?, ?, ?, ?)", list(rows)
+            )
+
+    def changes_since(self, seq: int, limit: int = 500) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT seq, kind, item_id, action, changed_at FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+            (seq, limit)
+        ).fetchall()
+        keys = ("seq", "kind", "id", "action", "changed_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def last_change(self) -> int:
+        row = self._connect().execute("SELECT MAX(seq) FROM change_log").fetchone()
+        return row[0] or 0
+
+    def trim_changes(self, keep: int) -> int:
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", (keep,)
+            )
+        return cursor.rowcount
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._connect().execute("SELECT value FROM catalog_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO catalog_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def migrate_json_metadata(json_path: Path, catalog: CatalogBackend) -> Dict[str, int]:
+    """One-shot import of a legacy metadata.json into a catalog
+
+    The JSON file is renamed to metadata.json.migrated afterwards so the
+    import never runs twice.
+    """
+    json_path = Path(json_path)
+    migrated = {kind: 0 for kind in CONTENT_KINDS}
+    if not json_path.exists():
+        return migrated
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        legacy = json.load(f)
+
+    for kind in CONTENT_KINDS:
+        records = [
+            record for record in legacy.get(kind, {}).values()
+            if record.get("id") and record.get("created_at")
+        ]
+        if records:
+            migrated[kind] = catalog.add_many(kind, records)
+
+    created = legacy.get("stats", {}).get("created")
+    if created:
+        catalog.set_meta("created", created)
+
+    json_path.rename(json_path.with_name(json_path.name + ".migrated"))
+    print(f"📦 Migrated {sum(migrated.values())} records from {json_path.name} to the catalog")
+    return migrated
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Catalog Change Feed
+Fans out catalog changes to subscribers (SSE clients) in every API worker.
+Changes made by any worker process land in the shared catalog's change log;
+each worker polls the newest sequence number and pushes what is new
+"""
+
+import os
+import asyncio
+from typing import Optional, Dict, Any, List, AsyncIterator, Set
+
+from .catalog import CatalogBackend
+
+CHANGE_POLL_INTERVAL = float(os.getenv("STORAGE_CHANGE_POLL_INTERVAL", "0.5"))
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class ChangeFeed:
+    """Polls the catalog change log and broadcasts new entries to subscribers"""
+
+    def __init__(self, catalog: CatalogBackend, poll_interval: float = CHANGE_POLL_INTERVAL):
+        self.catalog = catalog
+        self.poll_interval = poll_interval
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._last_seq = 0
+
+    def start(self):
+        """Start polling on the running event loop"""
+        if self._task is None or self._task.done():
+            self._last_seq = self.catalog.last_change()
+            self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                # Indexed MAX(seq) lookup: cheap enough to run on the loop
+                latest = self.catalog.last_change()
+                if latest <= self._last_seq:
+                    continue
+                if not self._subscribers:
+                    self._last_seq = latest
+                    continue
+                changes = self.catalog.changes_since(self._last_seq)
+                while changes:
+                    self._last_seq = changes[-1]["seq"]
+                    self._publish(changes)
+                    changes = self.catalog.changes_since(self._last_seq)
+            except Exception as e:
+                print(f"⚠️  Change feed poll failed: {e}")
+
+    def _publish(self, changes: List[Dict[str, Any]]):
+        for queue in list(self._subscribers):
+            try:
+                for change in changes:
+                    # The queue's last slot is reserved for the end-of-feed sentinel
+                    if queue.qsize() >= SUBSCRIBER_QUEUE_SIZE:
+                        # A stalled client loses its subscription instead of growing memory
+                        self._drop(queue)
+                        break
+                    queue.put_nowait(change)
+            except Exception as e:
+                # One broken subscriber must not cost the others this batch
+                print(f"⚠️  Dropping change feed subscriber: {e}")
+                self._drop(queue)
+
+    def _drop(self, queue: asyncio.Queue):
+        """Unsubscribe a queue and wake its reader with the end-of-feed sentinel"""
+        self._subscribers.discard(queue)
+        try:
+            queue.put_nowait(None)
+        except asyncio.QueueFull:
+            # Make room: the reader must see the sentinel or its stream never ends
+            queue.get_nowait()
+            queue.put_nowait(None)
+
+    async def subscribe(self, since: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield changes as they happen, replaying those after `since` first"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE + 1)
+        self._subscribers.add(queue)
+        try:
+            last = since if since is not None else self._last_seq
+            if since is not None:
+                backlog = self.catalog.changes_since(since)
+                while backlog:
+                    for change in backlog:
+                        yield change
+                    last = backlog[-1]["seq"]
+                    backlog = self.catalog.changes_since(last)
+
+            while True:
+                change = await queue.get()
+                if change is None:
+                    return
+                if change["seq"] > last:
+                    last = change["seq"]
+                    yield change
+        finally:
+            self._subscribers.discard(queue)
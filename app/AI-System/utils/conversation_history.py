@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Conversation History
+Fits chat history into a token budget before it is sent to a provider. The
+system prompt and the most recent turns are always kept verbatim; older
+turns are dropped, or folded into a short extractive summary, once the
+conversation outgrows HISTORY_TOKEN_BUDGET.
+
+Token counts are cached per message by content hash, so each turn only
+counts the messages that are new. Counting uses a local estimate, or the
+Counting tokens module's TokenCounter (Gemini countTokens) when
+HISTORY_TOKEN_COUNTER=gemini.
+"""
+
+import os
+import sys
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .admission import estimate_tokens
+
+# Input tokens (system prompt + history + prompt) per request, 0 = no limit
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+# Most recent messages that are never trimmed
+HISTORY_KEEP_RECENT = int(os.getenv("HISTORY_KEEP_RECENT", "6"))
+# "summarize" folds trimmed turns into a summary message, "drop" discards them
+HISTORY_TRIM_MODE = os.getenv("HISTORY_TRIM_MODE", "summarize").lower()
+# "estimate" (local) or "gemini" (TokenCounter, one countTokens call per new message)
+HISTORY_TOKEN_COUNTER = os.getenv("HISTORY_TOKEN_COUNTER", "estimate").lower()
+HISTORY_COUNT_CACHE_SIZE = int(os.getenv("HISTORY_COUNT_CACHE_SIZE", "8192"))
+
+# Share of the budget the summary of trimmed turns may use
+SUMMARY_SHARE = 0.15
+# Characters kept from each summarized message
+SUMMARY_SNIPPET_CHARS = 200
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+
+
+def load_token_counter(model: str) -> Optional[Callable[[str], int]]:
+    """count(text) backed by TokenCounter.count_text, None if it cannot be created"""
+    try:
+        sys.path.append(str(Path(__file__).parent.parent / "Counting tokens" / "api"))
+        from token_counter import TokenCounter
+        counter = TokenCounter(api_key=os.getenv("GEMINI_API_KEY"))
+    except Exception as e:
+        print(f"⚠️  TokenCounter unavailable, estimating history tokens: {e}")
+        return None
+    return lambda text: counter.count_text(model, text)
+
+
+class HistoryManager:
+    """Token-budgeted view of a conversation (role/content dicts, oldest first)"""
+
+    def __init__(self, budget: int = HISTORY_TOKEN_BUDGET, keep_recent: int = HISTORY_KEEP_RECENT,
+                 mode: str = HISTORY_TRIM_MODE, counter: Optional[Callable[[str], int]] = None,
+                 cache_size: int = HISTORY_COUNT_CACHE_SIZE):
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.summarize = mode == "summarize"
+        # A remote counter blocks, so fitting then runs off the event loop
+        self.counter = counter
+        self.cache_size = cache_size
+        self._counts: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "trimmed": 0, "count_hits": 0, "count_misses": 0}
+
+    def count(self, text: str) -> int:
+        """Tokens in a message, cached by content hash"""
+        if not text:
+            return 0
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            tokens = self._counts.get(key)
+            if tokens is not None:
+                self._counts.move_to_end(key)
+                self.counters["count_hits"] += 1
+                return tokens
+        tokens = self.counter(text) if self.counter else -1
+        if tokens < 0:
+            tokens = estimate_tokens(text)
+        with self._lock:
+            self.counters["count_misses"] += 1
+            self._counts[key] = tokens
+            while len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def _summary(self, trimmed: List[Dict[str, str]], budget: int) -> str:
+        """Extractive summary (start of each trimmed turn), newest lines kept when over budget"""
+        lines = []
+        used = len(SUMMARY_HEADER)
+        for message in reversed(trimmed):
+            # Same four-characters-per-token estimate as estimate_tokens
+            room = budget * 4 - used - len(message["role"]) - 4
+            if room < 20:
+                break
+            snippet = " ".join(message["content"].split())[:min(SUMMARY_SNIPPET_CHARS, room)]
+            line = f"- {message['role']}: {snippet}"
+            lines.append(line)
+            used += len(line) + 1
+        return "\n".join([SUMMARY_HEADER] + lines[::-1]) if lines else ""
+
+    def fit(self, system: str, contents: List[Dict[str, str]], prompt: Optional[str] = None
+            ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """Contents trimmed to the budget, plus what was done ({} when nothing was trimmed)"""
+        self.counters["requests"] += 1
+        if not self.budget or not contents:
+            return contents, {}
+
+        counts = [self.count(message["content"]) for message in contents]
+        fixed = self.count(system) + self.count(prompt or "")
+        total = fixed + sum(counts)
+        if total <= self.budget:
+            return contents, {}
+
+        # Keep the recent turns, then older ones newest-first while they fit
+        start = max(0, len(contents) - self.keep_recent)
+        summary_budget = int(self.budget * SUMMARY_SHARE) if self.summarize else 0
+        used = fixed + sum(counts[start:]) + summary_budget
+        while start > 0 and used + counts[start - 1] <= self.budget:
+            start -= 1
+            used += counts[start]
+        # Start the kept history on a user turn where possible
+        while start < len(contents) - self.keep_recent and contents[start]["role"] != "user":
+            start += 1
+        if start == 0:
+            return contents, {}
+
+        kept = contents[start:]
+        summary = self._summary(contents[:start], summary_budget) if self.summarize else ""
+        if summary:
+            if kept and kept[0]["role"] == "user":
+                kept = [{"role": "user", "content": f"{summary}\n\n{kept[0]['content']}"}] + kept[1:]
+            else:
+                kept = [{"role": "user", "content": summary}] + kept
+        self.counters["trimmed"] += 1
+        return kept, {
+            "trimmed_messages": start,
+            "summarized": bool(summary),
+            "tokens_before": total,
+            "tokens_after": fixed + sum(counts[start:]) + (estimate_tokens(summary) if summary else 0)
+        }
+
+    async def afit(self, system: str, contents: List[Dict[str, str]], prompt: Optional[str] = None
+                   ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """fit() that moves to a worker thread when a remote counter may be called"""
+        if self.counter and self.budget and contents:
+            return await asyncio.to_thread(self.fit, system, contents, prompt)
+        return self.fit(system, contents, prompt)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "keep_recent": self.keep_recent,
+            "mode": "summarize" if self.summarize else "drop",
+            "counter": "remote" if self.counter else "estimate",
+            "cached_counts": len(self._counts),
+            **self.counters
+        }
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Embeddings
+Batch embedding vectors as NumPy matrices (real ones through
+EmbeddingClient.embed_batch, or mock ones), and compact wire encodings for
+the embeddings endpoints
+"""
+
+import os
+import sys
+import base64
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+EMBEDDING_DIMENSIONS = 768
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "256"))
+EMBEDDING_MAX_DIMENSIONS = 4096
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "mock").lower()
+
+# Bump to change every mock vector (e.g. if the generation scheme changes)
+MOCK_SEED_PERSON = b"mock-embed-v1"
+
+ENCODINGS = ("float", "base64", "binary")
+DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2")}
+
+_embedding_client = None
+_embedding_client_error: Optional[str] = None
+
+
+def get_embedding_client():
+    """The 08_Embeddings EmbeddingClient when EMBEDDING_PROVIDER=gemini, else None
+
+    Loaded on first use; if it cannot be created the mock engine is used.
+    """
+    global _embedding_client, _embedding_client_error
+    if EMBEDDING_PROVIDER != "gemini" or _embedding_client_error:
+        return None
+    if _embedding_client is None:
+        try:
+            sys.path.append(str(Path(__file__).parent.parent / "08_Embeddings" / "api"))
+            from embedding_client import EmbeddingClient
+            _embedding_client = EmbeddingClient()
+        except Exception as e:
+            _embedding_client_error = str(e)
+            print(f"⚠️  Embedding client unavailable, using mock embeddings: {e}")
+            return None
+    return _embedding_client
+
+
+def _text_seed(text: str) -> int:
+    """Stable 128-bit seed for a text (str hash() is salted per process)"""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16, person=MOCK_SEED_PERSON).digest()
+    return int.from_bytes(digest, "little")
+
+
+def mock_embeddings(texts: List[str], dimensions: int = EMBEDDING_DIMENSIONS) -> np.ndarray:
+    """Deterministic unit-length mock vectors, one row per text
+
+    Each row comes from its own Generator seeded by the text's blake2b hash,
+    so a text maps to the same vector in every worker, on every restart and
+    regardless of what else is in the batch. No shared RNG state is touched.
+    """
+    matrix = np.empty((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        np.random.default_rng(_text_seed(text)).standard_normal(dtype=np.float32, out=matrix[row])
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.maximum(norms, np.finfo(np.float32).tiny)
+    return matrix
+
+
+def real_embeddings(client, texts: List[str], dimensions: int) -> np.ndarray:
+    """Vectors from EmbeddingClient.embed_batch (blocking), raises if the call failed"""
+    vectors = client.embed_batch(texts, output_dimensionality=dimensions)
+    if vectors is None:
+        raise RuntimeError("Embedding provider returned no vectors")
+    return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+
+
+def encode_embeddings(matrix: np.ndarray, encoding: str = "float", dtype: str = "float32") -> Dict[str, Any]:
+    """JSON body fields for an embedding matrix
+
+    `float` gives nested lists; `base64` gives one little-endian, row-major
+    buffer of the requested dtype (decode with numpy.frombuffer(...).reshape(shape)).
+    """
+    shape = list(matrix.shape)
+    if encoding == "base64":
+        data = np.ascontiguousarray(matrix, dtype=DTYPES[dtype]).tobytes()
+        return {"encoding": "base64", "dtype": dtype, "shape": shape, "embeddings": base64.b64encode(data).decode("ascii")}
+    return {"encoding": "float", "dtype": "float32", "shape": shape, "embeddings": matrix.tolist()}
+
+
+def embeddings_bytes(matrix: np.ndarray, dtype: str = "float32") -> bytes:
+    """Raw little-endian, row-major buffer for application/octet-stream responses"""
+    return np.ascontiguousarray(matrix, dtype=DTYPES[dtype]).tobytes()
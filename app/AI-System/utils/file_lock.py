@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Cross-Process File Lock
+Serializes maintenance work (migrations, cleanup, reconcile) between API
+worker processes sharing one storage directory
+"""
+
+import os
+import time
+from pathlib import Path
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """Exclusive advisory lock on a file, usable as a context manager
+
+    The OS releases the lock if the holding process dies, so a crashed worker
+    never leaves storage locked.
+    """
+
+    def __init__(self, path: str, blocking: bool = True, poll_interval: float = 0.1):
+        self.path = Path(path)
+        self.blocking = blocking
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            if os.name == "nt":
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self) -> bool:
+        """Take the lock, returns False if non-blocking and already held elsewhere"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        while not self._try_lock(fd):
+            if not self.blocking:
+                os.close(fd)
+                return False
+            time.sleep(self.poll_interval)
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if os.name == "nt":
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
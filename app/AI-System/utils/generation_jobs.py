@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Generation Jobs
+Job handlers for video and audio generation. They run in the job queue's
+worker threads, so the blocking clients (VeoClient polls its operation with
+time.sleep, TTS calls take seconds) never hold an HTTP request open
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+from .storage_manager import get_storage_manager
+
+# "veo" / "gemini" use the real clients; anything else returns mock results
+VIDEO_PROVIDER = os.getenv("VIDEO_PROVIDER", "mock").lower()
+AUDIO_PROVIDER = os.getenv("AUDIO_PROVIDER", "mock").lower()
+
+# Default per-type concurrency caps (JOB_LIMIT_VIDEO / JOB_LIMIT_AUDIO override)
+JOB_TYPE_LIMITS = {"video": 1, "audio": 2}
+
+MOCK_VIDEO_URL = "https://www.w3schools.com/html/mov_bbb.mp4"
+MOCK_AUDIO_URL = "https://www.soundhelix.com/examples/mp3/SoundHelix-Song-1.mp3"
+
+MODULES_ROOT = Path(__file__).parent.parent
+
+_clients: Dict[str, Any] = {}
+
+
+def _load_client(folder: str, module: str, class_name: str):
+    """Instantiate a module's client once, None if it cannot be created"""
+    key = f"{folder}.{class_name}"
+    if key not in _clients:
+        try:
+            sys.path.append(str(MODULES_ROOT / folder / "api"))
+            _clients[key] = getattr(__import__(module), class_name)()
+        except Exception as e:
+            print(f"⚠️  {class_name} unavailable, using mock results: {e}")
+            _clients[key] = None
+    return _clients[key]
+
+
+def get_video_client():
+    return _load_client("02_Video_Generation", "veo_client", "VeoClient") if VIDEO_PROVIDER == "veo" else None
+
+
+def get_audio_client():
+    return _load_client("03_Audio_Generation", "audio_client", "AudioGenerator") if AUDIO_PROVIDER == "gemini" else None
+
+
+def _publish(kind: str, temp_path: Path, prompt: str, extension: str, content_type: str,
+             job: Dict[str, Any], metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Store a finished file in the blob store and catalog, returns the catalog record"""
+    saved = get_storage_manager().save_media_file(
+        kind, temp_path, prompt, extension, content_type, {"job_id": job["id"], **metadata}
+    )
+    return saved["metadata"]
+
+
+def run_video_job(payload: Dict[str, Any], job: Dict[str, Any]) -> Dict[str, Any]:
+    """Handler for "video" jobs, saving into the blob store and catalog"""
+    metadata = {"duration": payload.get("duration"), "style": payload.get("style"), "resolution": payload.get("resolution")}
+    client = get_video_client()
+    if client is None:
+        return {"url": MOCK_VIDEO_URL, "metadata": {"mock": True, **metadata}}
+
+    temp_path = get_storage_manager().new_temp_path()
+    # Veo renders 720p and 1080p
+    resolution = payload.get("resolution") if payload.get("resolution") in ("720p", "1080p") else "720p"
+    if not client.generate_video(payload["prompt"], resolution=resolution, output_path=str(temp_path)):
+        temp_path.unlink(missing_ok=True)
+        raise RuntimeError("Video generation failed")
+    metadata["resolution"] = resolution
+    record = _publish("videos", temp_path, payload["prompt"], "mp4", "video/mp4", job, metadata)
+    return {"url": f"/storage/videos/{record['filename']}", "id": record["id"], "metadata": {"mock": False, **metadata}}
+
+
+def run_audio_job(payload: Dict[str, Any], job: Dict[str, Any]) -> Dict[str, Any]:
+    """Handler for "audio" jobs; speech and podcast use TTS, music stays mocked"""
+    audio_type = payload.get("type")
+    metadata = {"type": audio_type, "duration": payload.get("duration"), "style": payload.get("style")}
+    client = get_audio_client() if audio_type in ("speech", "podcast") else None
+    if client is None:
+        return {"url": MOCK_AUDIO_URL, "metadata": {"mock": True, **metadata}}
+
+    temp_path = get_storage_manager().new_temp_path()
+    if audio_type == "podcast":
+        if not payload.get("speakers"):
+            raise ValueError("Podcast jobs need speakers: [{'name': ..., 'voice': ...}]")
+        output = client.generate_podcast(payload["prompt"], payload["speakers"], output_path=str(temp_path))
+    else:
+        output = client.generate_speech(payload["prompt"], voice_name=payload.get("voice") or "Kore", output_path=str(temp_path))
+    if not output:
+        temp_path.unlink(missing_ok=True)
+        raise RuntimeError("Audio generation failed")
+    record = _publish("audio", temp_path, payload["prompt"], "wav", "audio/wav", job, metadata)
+    return {"url": f"/storage/audio/{record['filename']}", "id": record["id"], "metadata": {"mock": False, **metadata}}
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Job Queue
+Persistent queue for long-running generation work (video, audio). Jobs live
+in a SQLite store shared by every API worker, so they survive restarts;
+each worker runs a bounded thread pool that claims jobs by priority while
+respecting per-type concurrency caps counted across all workers
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+# A running job whose worker stops renewing its lease is handed to another worker
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+JOB_STATES = ("queued", "running", "succeeded", "failed", "cancelled")
+TERMINAL_STATES = ("succeeded", "failed", "cancelled")
+
+# How often the dispatcher deletes finished jobs older than the retention
+PURGE_INTERVAL = 3600
+
+
+def limits_from_env(defaults: Dict[str, int]) -> Dict[str, int]:
+    """Per-type concurrency caps, overridable with JOB_LIMIT_<TYPE>"""
+    return {job_type: int(os.getenv(f"JOB_LIMIT_{job_type.upper()}", str(limit))) for job_type, limit in defaults.items()}
+
+
+class JobStore:
+    """SQLite table of jobs (WAL mode, one connection per thread)"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            type TEXT NOT NULL,
+            status TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            payload TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            lease_until REAL,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            updated_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority DESC, created_at);
+        CREATE INDEX IF NOT EXISTS idx_jobs_type_status ON jobs(type, status);
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connect().executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the connection for the current thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction, taking the write lock up front (BEGIN IMMEDIATE)"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _decode(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        del job["lease_until"]
+        return job
+
+    def submit(self, job_type: str, payload: Dict[str, Any], priority: int = 0) -> Dict[str, Any]:
+        """Queue a job, returns it"""
+        now = datetime.now().isoformat()
+        job_id = uuid.uuid4().hex
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, type, status, priority, payload, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, job_type, priority, json.dumps(payload, ensure_ascii=False), now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row)
+
+    def list(self, status: Optional[str] = None, job_type: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Jobs newest first, optionally filtered"""
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if job_type:
+            clauses.append("type = ?")
+            params.append(job_type)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT * FROM jobs {where} ORDER BY created_at DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def _recover_expired(self, conn: sqlite3.Connection, now: float, max_attempts: int):
+        """Requeue running jobs whose worker died (or fail them after too many attempts)"""
+        stamp = datetime.now().isoformat()
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'Worker lost too many times', worker = NULL, "
+            "finished_at = ?, updated_at = ? WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+            (stamp, stamp, now, max_attempts)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, updated_at = ? "
+            "WHERE status = 'running' AND lease_until < ?",
+            (stamp, now)
+        )
+        # A cancelled job's slot outlives its thread only until the lease runs out
+        conn.execute(
+            "UPDATE jobs SET worker = NULL, lease_until = NULL "
+            "WHERE status = 'cancelled' AND worker IS NOT NULL AND lease_until < ?",
+            (now,)
+        )
+
+    def claim(self, worker: str, limits: Dict[str, int], lease: float = JOB_LEASE_SECONDS,
+              max_attempts: int = JOB_MAX_ATTEMPTS) -> Optional[Dict[str, Any]]:
+        """Atomically take the highest-priority queued job whose type has a free slot
+
+        Cancelled jobs whose handler is still running keep their slot.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            self._recover_expired(conn, now, max_attempts)
+            running = dict(conn.execute(
+                "SELECT type, COUNT(*) FROM jobs WHERE status IN ('running', 'cancelled') "
+                "AND worker IS NOT NULL GROUP BY type"
+            ).fetchall())
+            open_types = [t for t, limit in limits.items() if running.get(t, 0) < limit]
+            if not open_types:
+                return None
+            placeholders = ",".join("?" * len(open_types))
+            row = conn.execute(
+                f"SELECT id FROM jobs WHERE status = 'queued' AND type IN ({placeholders}) "
+                "ORDER BY priority DESC, created_at LIMIT 1",
+                open_types
+            ).fetchone()
+            if row is None:
+                return None
+            stamp = datetime.now().isoformat()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                "started_at = ?, updated_at = ? WHERE id = ?",
+                (worker, now + lease, stamp, stamp, row["id"])
+            )
+        return self.get(row["id"])
+
+    def heartbeat(self, job_id: str, worker: str, lease: float = JOB_LEASE_SECONDS) -> bool:
+        """Extend a running job's lease, False if the job is no longer ours"""
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status IN ('running', 'cancelled')",
+                (time.time() + lease, job_id, worker)
+            )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: str, worker: str, status: str, result: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None) -> bool:
+        """Record a job's outcome (ignored if it was cancelled or handed to another worker meanwhile)
+
+        A cancelled job only gives back its concurrency slot here.
+        """
+        stamp = datetime.now().isoformat()
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, worker = NULL, lease_until = NULL, "
+                "finished_at = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error,
+                 stamp, stamp, job_id, worker)
+            )
+            conn.execute(
+                "UPDATE jobs SET worker = NULL, lease_until = NULL WHERE id = ? AND worker = ? AND status = 'cancelled'",
+                (job_id, worker)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, worker: str) -> int:
+        """Put a stopping worker's running jobs back in the queue (and free its cancelled jobs' slots)"""
+        stamp = datetime.now().isoformat()
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE worker = ? AND status = 'running'",
+                (stamp, worker)
+            )
+            conn.execute(
+                "UPDATE jobs SET worker = NULL, lease_until = NULL WHERE worker = ? AND status = 'cancelled'",
+                (worker,)
+            )
+        return cursor.rowcount
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued or running job, returns it (None if it does not exist)
+
+        A running job's thread cannot be interrupted; it finishes in the
+        background and its result is discarded. Until then the job keeps its
+        worker and lease, so it still counts against its type's limit.
+        """
+        stamp = datetime.now().isoformat()
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, updated_at = ? "
+                "WHERE id = ? AND status IN ('queued', 'running')",
+                (stamp, stamp, job_id)
+            )
+        return self.get(job_id)
+
+    def purge(self, days: int = JOB_RETENTION_DAYS) -> int:
+        """Delete finished jobs older than the retention"""
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        placeholders = ",".join("?" * len(TERMINAL_STATES))
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+                (*TERMINAL_STATES, cutoff)
+            )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """{type: {status: count}}"""
+        counts: Dict[str, Dict[str, int]] = {}
+        for job_type, status, count in self._connect().execute(
+            "SELECT type, status, COUNT(*) FROM jobs GROUP BY type, status"
+        ).fetchall():
+            counts.setdefault(job_type, {})[status] = count
+        return counts
+
+
+class JobQueue:
+    """Claims jobs from the store and runs their (blocking) handlers in a bounded thread pool"""
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL,
+                 lease: float = JOB_LEASE_SECONDS):
+        self.store = store
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.handlers: Dict[str, Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = {}
+        self.limits: Dict[str, int] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping = False
+
+    def register(self, job_type: str, handler: Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]], limit: int = 1):
+        """Handle jobs of a type with `handler(payload, job) -> result`, at most `limit` at once across workers"""
+        self.handlers[job_type] = handler
+        self.limits[job_type] = limit
+
+    def submit(self, job_type: str, payload: Dict[str, Any], priority: int = 0) -> Dict[str, Any]:
+        """Queue a job and wake the dispatcher"""
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        job = self.store.submit(job_type, payload, priority)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    def start(self):
+        """Start dispatching on the running event loop"""
+        if self._dispatcher is None or self._dispatcher.done():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            self._wakeup = asyncio.Event()
+            self._stopping = False
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self):
+        """Stop claiming jobs; jobs still running here go back to the queue for the next start"""
+        if self._dispatcher is not None:
+            # Let the dispatcher finish a claim in progress rather than
+            # cancelling it, or the claimed job would be left running here
+            self._stopping = True
+            self._wakeup.set()
+            await self._dispatcher
+            self._dispatcher = None
+        for task in list(self._running.values()):
+            task.cancel()
+        requeued = await asyncio.to_thread(self.store.release, self.worker_id)
+        if requeued:
+            print(f"⏸️  Requeued {requeued} running job(s)")
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _dispatch(self):
+        last_purge = 0.0
+        while not self._stopping:
+            try:
+                while len(self._running) < self.workers and not self._stopping:
+                    job = await asyncio.to_thread(self.store.claim, self.worker_id, self.limits, self.lease)
+                    if job is None:
+                        break
+                    self._running[job["id"]] = asyncio.create_task(self._execute(job))
+                if time.monotonic() - last_purge > PURGE_INTERVAL:
+                    last_purge = time.monotonic()
+                    await asyncio.to_thread(self.store.purge)
+            except Exception as e:
+                print(f"⚠️  Job dispatch failed: {e}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            await asyncio.to_thread(self.store.heartbeat, job_id, self.worker_id, self.lease)
+
+    async def _execute(self, job: Dict[str, Any]):
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        try:
+            handler = self.handlers[job["type"]]
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self._executor, handler, job["payload"], job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Job {job['id']} ({job['type']}) failed: {e}")
+                await asyncio.to_thread(self.store.finish, job["id"], self.worker_id, "failed", None, str(e))
+            else:
+                await asyncio.to_thread(self.store.finish, job["id"], self.worker_id, "succeeded", result)
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job["id"], None)
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    async def watch(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the job every time it changes, ending once it is finished"""
+        updated_at = None
+        while True:
+            job = await asyncio.to_thread(self.store.get, job_id)
+            if job is None:
+                return
+            if job["updated_at"] != updated_at:
+                updated_at = job["updated_at"]
+                yield job
+            if job["status"] in TERMINAL_STATES:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker": self.worker_id,
+            "workers": self.workers,
+            "running_here": len(self._running),
+            "limits": dict(self.limits),
+            "jobs": self.store.counts()
+        }
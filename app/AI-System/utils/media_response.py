@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Media Responses
+File responses for stored media with HTTP Range support, conditional GET
+(ETag / 304), long-lived caching for content-addressed files and zero-copy
+transfer where the server offers it
+"""
+
+import os
+import mimetypes
+from email.utils import formatdate
+from pathlib import Path
+from typing import Optional, Tuple
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+
+MEDIA_CHUNK_SIZE = 256 * 1024
+
+# Content-addressed URLs never change meaning, so browsers may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+# Behind nginx, set this to an `internal` location aliasing the storage
+# directory to hand the transfer to nginx's sendfile
+X_ACCEL_PREFIX = os.getenv("STORAGE_X_ACCEL_PREFIX", "").rstrip("/")
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into inclusive (start, end)
+
+    Returns None when the header should be ignored (multiple ranges, other
+    units, malformed), raises ValueError when the range is unsatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        elif last:
+            # Suffix range: the final N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires)"""
+    if header.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+class MediaResponse(Response):
+    """Serve a file honouring Range, If-None-Match and If-Range"""
+
+    def __init__(self, request: Request, path: Path, etag: Optional[str] = None,
+                 immutable: bool = False, media_type: Optional[str] = None,
+                 accel_path: Optional[str] = None):
+        self.path = Path(path)
+        stat = os.stat(self.path)
+        self.file_size = stat.st_size
+        self.send_header_only = request.method == "HEAD"
+        self.accel_path = accel_path
+        self.start, self.end = 0, self.file_size - 1
+
+        # Without a content hash fall back to a weak validator from the file stat
+        etag = etag or f'W/"{int(stat.st_mtime_ns):x}-{stat.st_size:x}"'
+        media_type = media_type or mimetypes.guess_type(self.path.name)[0] or "application/octet-stream"
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": formatdate(stat.st_mtime, usegmt=True),
+            "cache-control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        }
+
+        status_code = 200
+        if_none_match = request.headers.get("if-none-match")
+        range_header = request.headers.get("range")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            status_code = 304
+            self.send_header_only = True
+        elif range_header and self._if_range_allows(request.headers.get("if-range"), etag):
+            try:
+                byte_range = parse_range(range_header, self.file_size)
+            except ValueError:
+                byte_range = None
+                status_code = 416
+                self.send_header_only = True
+                headers["content-range"] = f"bytes */{self.file_size}"
+            if byte_range:
+                status_code = 206
+                self.start, self.end = byte_range
+                headers["content-range"] = f"bytes {self.start}-{self.end}/{self.file_size}"
+
+        if status_code in (200, 206):
+            headers["content-length"] = str(self.end - self.start + 1)
+            if accel_path:
+                # nginx applies the Range itself and sends the file
+                headers["x-accel-redirect"] = accel_path
+                headers.pop("content-length")
+                headers.pop("content-range", None)
+                status_code = 200
+                self.send_header_only = True
+
+        super().__init__(
+            status_code=status_code, headers=headers,
+            media_type=None if status_code in (304, 416) else media_type
+        )
+
+    @staticmethod
+    def _if_range_allows(if_range: Optional[str], etag: str) -> bool:
+        """A Range applies unless If-Range names another (or a weak) validator"""
+        if not if_range:
+            return True
+        return not etag.startswith("W/") and if_range.strip() == etag
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        count = self.end - self.start + 1
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            # The server sends straight from the page cache (sendfile)
+            with open(self.path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f.fileno(),
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False
+                })
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await f.read(min(MEDIA_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0 or count == 0:
+                # Empty file, or it shrank underneath us: end the response cleanly
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def media_response(request: Request, path: Path, storage_root: Path, sha256: Optional[str] = None,
+                   variant: str = "", immutable: bool = False,
+                   media_type: Optional[str] = None) -> MediaResponse:
+    """Build the response for a stored file
+
+    A catalog content hash gives a strong ETag (plus `variant` for derived
+    files such as thumbnails); `immutable` is for URLs naming that hash.
+    """
+    etag = f'"{sha256}{"-" + variant if variant else ""}"' if sha256 else None
+    accel_path = None
+    if X_ACCEL_PREFIX:
+        relative = Path(path).resolve().relative_to(Path(storage_root).resolve())
+        accel_path = f"{X_ACCEL_PREFIX}/{relative.as_posix()}"
+    return MediaResponse(request, path, etag=etag, immutable=immutable and bool(sha256),
+                         media_type=media_type, accel_path=accel_path)
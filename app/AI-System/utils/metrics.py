@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Metrics
+Minimal Prometheus instrumentation: counters, gauges and histograms with
+fixed label sets, a request-latency ASGI middleware and the text exposition
+format for /metrics
+
+Hot-path cost is kept low: each label combination is resolved once to a
+child holding plain numbers (later lookups hit a tuple-keyed dict), updates
+take no locks (the GIL keeps them consistent enough for monitoring) and
+label strings are rendered once when the child is created. Every API worker
+process keeps its own numbers.
+"""
+
+import time
+import asyncio
+import functools
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; spans fast cached responses to minute-long generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Family of children, one per label-value tuple"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        if not self.labelnames:
+            self._unlabelled = self.labels()
+
+    def _new_child(self, labels: str):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Child for these label values (positional, in labelnames order), created once"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values))
+            child = self._children.setdefault(values, self._new_child(labels))
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for child in list(self._children.values()):
+            lines.extend(child.render(self.name))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("labels", "value")
+
+    def __init__(self, labels: str):
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def render(self, name: str) -> List[str]:
+        return [f"{name}{{{self.labels}}} {_format_value(self.value)}" if self.labels else f"{name} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self, labels: str) -> _CounterChild:
+        return _CounterChild(labels)
+
+    def inc(self, amount: float = 1):
+        self._unlabelled.inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self, labels: str) -> _GaugeChild:
+        return _GaugeChild(labels)
+
+    def inc(self, amount: float = 1):
+        self._unlabelled.inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._unlabelled.dec(amount)
+
+    def set(self, value: float):
+        self._unlabelled.set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("labels", "upper_bounds", "counts", "sum")
+
+    def __init__(self, labels: str, upper_bounds: Tuple[float, ...]):
+        self.labels = labels
+        self.upper_bounds = upper_bounds
+        # Per-bucket (not cumulative) counts; the last slot is +Inf
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> Callable:
+        """Decorator observing the duration of each call (sync or async functions)"""
+        def decorator(fn: Callable) -> Callable:
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_timed(*args, **kwargs):
+                    started = time.perf_counter()
+                    try:
+                        return await fn(*args, **kwargs)
+                    finally:
+                        self.observe(time.perf_counter() - started)
+                return async_timed
+
+            @functools.wraps(fn)
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - started)
+            return timed
+        return decorator
+
+    def render(self, name: str) -> List[str]:
+        prefix = f"{self.labels}," if self.labels else ""
+        lines = []
+        cumulative = 0
+        counts = list(self.counts)
+        for bound, count in zip(self.upper_bounds + (float("inf"),), counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{_format_value(bound)}"}} {cumulative}')
+        labels = f"{{{self.labels}}}" if self.labels else ""
+        lines.append(f"{name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self, labels: str) -> _HistogramChild:
+        return _HistogramChild(labels, self.buckets)
+
+    def observe(self, value: float):
+        self._unlabelled.observe(value)
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Process-wide registry and the instruments shared by the utils modules
+registry = Registry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests being served")
+
+PROVIDER_CALL_DURATION = registry.histogram(
+    "provider_call_duration_seconds", "Upstream AI provider call latency (whole stream for streams)", ("provider", "outcome")
+)
+PROVIDER_IN_FLIGHT = registry.gauge("provider_calls_in_flight", "Upstream AI provider calls holding a slot", ("provider",))
+
+STORAGE_OPERATION_DURATION = registry.histogram(
+    "storage_operation_duration_seconds", "Storage operation latency", ("operation",)
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status counts and in-flight requests per route template
+
+    Routes are labelled by their template (/api/jobs/{job_id}), never the raw
+    path, so label cardinality stays fixed; unmatched paths share one label.
+    """
+
+    def __init__(self, app, duration: Histogram = HTTP_REQUEST_DURATION, requests: Counter = HTTP_REQUESTS,
+                 in_flight: Gauge = HTTP_IN_FLIGHT):
+        self.app = app
+        self.duration = duration
+        self.requests = requests
+        self.in_flight = in_flight
+        self._route_paths: Optional[Dict[Any, str]] = None
+
+    def _route_label(self, scope) -> str:
+        if self._route_paths is None:
+            self._route_paths = {
+                getattr(route, "endpoint", None): route.path
+                for route in scope["app"].routes if hasattr(route, "path")
+            }
+        return self._route_paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_flight.dec()
+            route = self._route_label(scope)
+            method = scope["method"]
+            self.duration.labels(method, route).observe(elapsed)
+            self.requests.labels(method, route, str(status)).inc()
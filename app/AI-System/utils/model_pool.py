@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Gemini Model Pool
+Keeps configured GenerativeModel instances warm between requests instead of
+building (and validating) a new one per call
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional, Any, Callable, Dict, Hashable, Tuple
+
+DEFAULT_GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash-lite")
+MODEL_POOL_SIZE = int(os.getenv("GEMINI_MODEL_POOL_SIZE", "32"))
+
+
+def _tools_key(tools: Any) -> Optional[Hashable]:
+    """Hashable identity of a tools declaration"""
+    if tools is None:
+        return None
+    try:
+        return json.dumps(tools, sort_keys=True, default=repr)
+    except (TypeError, ValueError):
+        return repr(tools)
+
+
+def _create_gemini_model(model_name: str, system_instruction: Optional[str], tools: Any):
+    import google.generativeai as genai
+    return genai.GenerativeModel(model_name=model_name, system_instruction=system_instruction, tools=tools)
+
+
+class GeminiModelPool:
+    """LRU pool of GenerativeModel instances keyed by (model, system_instruction, tools)
+
+    A GenerativeModel only holds configuration and a client handle, so one
+    instance is shared by every request with the same configuration.
+    """
+
+    def __init__(self, max_size: int = MODEL_POOL_SIZE,
+                 factory: Callable[[str, Optional[str], Any], Any] = _create_gemini_model):
+        self.max_size = max_size
+        self.factory = factory
+        self._models: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_name: str = DEFAULT_GEMINI_MODEL, system_instruction: Optional[str] = None,
+            tools: Any = None):
+        """Shared model for a configuration, created on first use"""
+        key = (model_name, system_instruction, _tools_key(tools))
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return model
+            self.misses += 1
+
+        # Build outside the lock; a concurrent miss for the same key just loses the race
+        model = self.factory(model_name, system_instruction, tools)
+        with self._lock:
+            existing = self._models.get(key)
+            if existing is not None:
+                self._models.move_to_end(key)
+                return existing
+            self._models[key] = model
+            while len(self._models) > self.max_size:
+                self._models.popitem(last=False)
+                self.evictions += 1
+        return model
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._models),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Ollama Client
+Long-lived async connection pool to the Ollama server, with retries
+(exponential backoff, full jitter) and a circuit breaker so an unreachable
+server is noticed once instead of timing out every request
+"""
+
+import os
+import time
+import random
+import asyncio
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional
+
+from .text_streaming import OllamaAPIError, ollama_text_stream
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "10"))
+OLLAMA_RETRIES = int(os.getenv("OLLAMA_RETRIES", "2"))
+OLLAMA_REQUEST_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "60"))
+OLLAMA_BREAKER_THRESHOLD = int(os.getenv("OLLAMA_BREAKER_THRESHOLD", "5"))
+OLLAMA_BREAKER_RESET = float(os.getenv("OLLAMA_BREAKER_RESET", "30"))
+
+RETRY_BASE_DELAY = 0.25
+RETRY_MAX_DELAY = 4.0
+RETRYABLE_STATUS = {502, 503, 504}
+
+if TYPE_CHECKING:
+    # httpx is imported when the first connection is made, not at startup
+    import httpx
+
+
+class OllamaUnavailable(Exception):
+    """Ollama could not be reached (or the circuit breaker is open)"""
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open trial after a cool-down"""
+
+    def __init__(self, failure_threshold: int = OLLAMA_BREAKER_THRESHOLD, reset_timeout: float = OLLAMA_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def is_available(self) -> bool:
+        """Whether allow() would let a request through now, without taking the half-open trial"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open":
+            # A trial that never reported back (e.g. cancelled) expires after a cool-down
+            return self._trial_at is None or time.monotonic() - self._trial_at >= self.reset_timeout
+        return False
+
+    def allow(self) -> bool:
+        """Let a request go upstream now (taking the one trial when half-open); call only right before the request"""
+        if not self.is_available():
+            return False
+        if self.state != "closed":
+            self._trial_at = time.monotonic()
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_at = None
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            # A failed trial re-opens for another cool-down
+            self.opened_at = time.monotonic()
+
+    def open(self):
+        self.failures = max(self.failures, self.failure_threshold)
+        self.opened_at = time.monotonic()
+        self._trial_at = None
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+class OllamaClient:
+    """Pooled keep-alive client for one Ollama server"""
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, model: str = OLLAMA_MODEL,
+                 max_connections: int = OLLAMA_MAX_CONNECTIONS, retries: int = OLLAMA_RETRIES,
+                 timeout: float = OLLAMA_REQUEST_TIMEOUT, breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.max_connections = max_connections
+        self.retries = retries
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.last_probe: Optional[Dict[str, Any]] = None
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._client_loop = None
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        """Connection pool bound to the running event loop"""
+        import httpx
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=5),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            )
+            self._client_loop = loop
+        return self._client
+
+    def available(self) -> bool:
+        """Whether requests should go to Ollama (False while the breaker is open); read-only, for routing"""
+        return self.breaker.is_available()
+
+    def _allow(self):
+        if not self.breaker.allow():
+            raise OllamaUnavailable(f"Ollama circuit breaker is {self.breaker.state}")
+
+    async def chat(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Non-streaming /api/chat call with retries
+
+        Connection errors, timeouts and 5xx answers count as breaker failures;
+        only connection errors and 502/503/504 are retried. Cancellation (a
+        client gone, a lost hedge race) is not a failure: the caller records
+        its own timeouts (ProviderTimeout) with record_failure().
+        """
+        import httpx
+        self._allow()
+        client = self._get_client()
+        for attempt in range(self.retries + 1):
+            try:
+                response = await client.post(f"{self.base_url}/api/chat", json={**payload, "stream": False})
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadError, httpx.RemoteProtocolError) as e:
+                error = OllamaUnavailable(f"Ollama unreachable at {self.base_url}: {e}")
+            except httpx.TimeoutException as e:
+                # Retrying a hung server only multiplies the wait
+                error = OllamaUnavailable(f"Ollama timed out at {self.base_url}: {e!r}")
+                break
+            else:
+                if response.status_code == 200:
+                    self.breaker.record_success()
+                    return response.json()
+                error = OllamaAPIError(f"Ollama API Error: {response.status_code} - {response.text}", response.status_code)
+                if not error.server_fault:
+                    # The server answered; the request itself is wrong (e.g. unknown model)
+                    self.breaker.record_success()
+                    raise error
+                if response.status_code not in RETRYABLE_STATUS:
+                    break
+
+            if attempt < self.retries:
+                await asyncio.sleep(_backoff(attempt))
+        self.breaker.record_failure()
+        raise error
+
+    async def stream_chat(self, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming /api/chat call; retried only until the first chunk arrives
+
+        Failures are recorded like in chat(); a consumer closing the stream
+        early or cancelling it (client gone, lost hedge race) is not a failure.
+        """
+        import httpx
+        self._allow()
+        client = self._get_client()
+        for attempt in range(self.retries + 1):
+            started = False
+            try:
+                async for event in ollama_text_stream(client, self.base_url, payload):
+                    if not started:
+                        started = True
+                        self.breaker.record_success()
+                    yield event
+                return
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                if started or attempt == self.retries:
+                    self.breaker.record_failure()
+                    raise OllamaUnavailable(f"Ollama unreachable at {self.base_url}: {e}")
+            except (httpx.TimeoutException, httpx.ReadError, httpx.RemoteProtocolError) as e:
+                self.breaker.record_failure()
+                raise OllamaUnavailable(f"Ollama stream failed at {self.base_url}: {e!r}")
+            except OllamaAPIError as e:
+                if e.server_fault:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                raise
+            await asyncio.sleep(_backoff(attempt))
+
+    async def probe(self) -> Dict[str, Any]:
+        """Check the server and model once (at startup); opens the breaker if unreachable"""
+        try:
+            response = await self._get_client().get(f"{self.base_url}/api/tags", timeout=5)
+            response.raise_for_status()
+            models = [m.get("name", "") for m in response.json().get("models", [])]
+            has_model = any(name == self.model or name.split(":")[0] == self.model for name in models)
+            self.breaker.record_success()
+            self.last_probe = {"healthy": True, "model_available": has_model, "models": models}
+        except Exception as e:
+            self.breaker.open()
+            self.last_probe = {"healthy": False, "error": str(e)}
+        self.last_probe["checked_at"] = time.time()
+        return self.last_probe
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "model": self.model,
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "last_probe": self.last_probe
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Prompt Search Index
+Inverted index (term -> posting list ordered by recency) stored next to the
+media catalog, so prompt search never scans or sorts the whole gallery
+"""
+
+import heapq
+import re
+import sqlite3
+from typing import Optional, List, Tuple, Iterator, Set
+
+# Thai has no spaces between words, so Thai runs are indexed as character
+# bigrams; everything else is indexed as lower-cased words
+THAI_RANGE = "\u0e00-\u0e7f"
+TOKEN_PATTERN = re.compile(rf"([{THAI_RANGE}]+)|([^\W_{THAI_RANGE}]+)")
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+MAX_TERM_LENGTH = 64
+POSTING_PAGE_SIZE = 64
+# Prefixes matching more vocabulary terms than this still merge one cursor
+# per term, but each cursor starts with a smaller first page so the rows
+# read up front stay around POSTING_PAGE_SIZE * MAX_PREFIX_EXPANSION
+MAX_PREFIX_EXPANSION = 64
+MIN_FIRST_PAGE = 2
+
+
+def _thai_terms(run: str) -> List[str]:
+    """Character bigrams of a Thai run (the run itself if shorter)"""
+    if len(run) < 2:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text: str) -> Set[str]:
+    """Index terms for a prompt"""
+    terms = set()
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        thai, word = match.groups()
+        if thai:
+            terms.update(_thai_terms(thai))
+        else:
+            terms.add(word[:MAX_TERM_LENGTH])
+    return terms
+
+
+class QueryGroup:
+    """One AND-ed constraint of a search query"""
+
+    def __init__(self, term: str, prefix: bool, verify: Optional[str] = None):
+        self.term = term
+        self.prefix = prefix
+        # Thai runs are matched through bigrams; the candidate prompt must
+        # still contain the run itself
+        self.verify = verify
+        self.terms: List[str] = []
+        self.df = 0
+
+
+def parse_query(query: str) -> List[QueryGroup]:
+    """Split a search query into AND-ed groups
+
+    Plain words match as prefixes (type-ahead, like the old substring
+    search); words in double quotes must match a whole indexed word.
+    """
+    groups = []
+    for match in QUERY_PATTERN.finditer(query.lower()):
+        quoted, plain = match.groups()
+        exact = quoted is not None
+        for token in TOKEN_PATTERN.finditer(quoted if exact else plain):
+            thai, word = token.groups()
+            if thai:
+                if len(thai) == 1:
+                    groups.append(QueryGroup(thai, prefix=True))
+                else:
+                    for bigram in dict.fromkeys(_thai_terms(thai)):
+                        groups.append(QueryGroup(bigram, prefix=False, verify=thai))
+            else:
+                groups.append(QueryGroup(word[:MAX_TERM_LENGTH], prefix=not exact))
+    return groups
+
+
+class PromptIndex:
+    """Inverted prompt index kept inside the catalog database
+
+    All methods take the catalog connection so index updates commit in the
+    same transaction as the catalog row they describe.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS prompt_postings (
+            term TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            id TEXT NOT NULL,
+            PRIMARY KEY (term, kind, created_at, id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_postings_item ON prompt_postings(kind, id, term);
+        CREATE TABLE IF NOT EXISTS prompt_terms (
+            kind TEXT NOT NULL,
+            term TEXT NOT NULL,
+            df INTEGER NOT NULL,
+            PRIMARY KEY (kind, term)
+        ) WITHOUT ROWID;
+    """
+
+    def add(self, conn: sqlite3.Connection, kind: str, item_id: str, prompt: str, created_at: str):
+        """Index a prompt"""
+        terms = tokenize(prompt or "")
+        conn.executemany(
+            "INSERT OR IGNORE INTO prompt_postings (term, kind, created_at, id) VALUES (?, ?, ?, ?)",
+            [(term, kind, created_at, item_id) for term in terms]
+        )
+        conn.executemany(
+            "INSERT INTO prompt_terms (kind, term, df) VALUES (?, ?, 1) "
+            "ON CONFLICT (kind, term) DO UPDATE SET df = df + 1",
+            [(kind, term) for term in terms]
+        )
+
+    def remove(self, conn: sqlite3.Connection, kind: str, item_id: str, prompt: str, created_at: str):
+        """Drop a prompt from the index"""
+        terms = tokenize(prompt or "")
+        conn.executemany(
+            "DELETE FROM prompt_postings WHERE term = ? AND kind = ? AND created_at = ? AND id = ?",
+            [(term, kind, created_at, item_id) for term in terms]
+        )
+        conn.executemany(
+            "UPDATE prompt_terms SET df = df - 1 WHERE kind = ? AND term = ?",
+            [(kind, term) for term in terms]
+        )
+        # Only the terms just decremented can have dropped to zero (a primary key lookup each)
+        conn.executemany(
+            "DELETE FROM prompt_terms WHERE kind = ? AND term = ? AND df <= 0",
+            [(kind, term) for term in terms]
+        )
+
+    def rebuild(self, conn: sqlite3.Connection):
+        """Re-index every prompt in the catalog"""
+        conn.execute("DELETE FROM prompt_postings")
+        conn.execute("DELETE FROM prompt_terms")
+        for kind, item_id, prompt, created_at in conn.execute(
+            "SELECT kind, id, prompt, created_at FROM media"
+        ).fetchall():
+            self.add(conn, kind, item_id, prompt, created_at)
+
+    def search(self, conn: sqlite3.Connection, kind: str, query: str, limit: int = 20) -> Optional[List[str]]:
+        """IDs of the newest `limit` items matching every query term
+
+        Returns None when the query has no searchable terms.
+        """
+        groups = parse_query(query)
+        if not groups:
+            return None
+
+        for group in groups:
+            self._expand(conn, kind, group)
+            if not group.terms:
+                return []
+
+        # Drive the scan with the rarest group, probe the others
+        groups.sort(key=lambda g: g.df)
+        driver, others = groups[0], groups[1:]
+        verify = [g.verify for g in groups if g.verify]
+
+        results = []
+        for created_at, item_id in self._postings(conn, kind, driver):
+            if not all(self._contains(conn, kind, g, item_id) for g in others):
+                continue
+            if verify and not self._verify(conn, item_id, verify):
+                continue
+            results.append(item_id)
+            if len(results) >= limit:
+                break
+        return results
+
+    def _expand(self, conn: sqlite3.Connection, kind: str, group: QueryGroup):
+        """Resolve a group to vocabulary terms and total document frequency"""
+        if group.prefix:
+            rows = conn.execute(
+                "SELECT term, df FROM prompt_terms WHERE kind = ? AND term >= ? AND term < ?",
+                (kind, group.term, group.term + "\U0010ffff")
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT term, df FROM prompt_terms WHERE kind = ? AND term = ?", (kind, group.term)
+            ).fetchall()
+        group.terms = [row[0] for row in rows]
+        group.df = sum(row[1] for row in rows)
+
+    def _term_postings(self, conn: sqlite3.Connection, kind: str, term: str,
+                       first_page: int = POSTING_PAGE_SIZE) -> Iterator[Tuple[str, str]]:
+        """Postings of one term, newest first, fetched page by page (pages grow up to POSTING_PAGE_SIZE)"""
+        page = first_page
+        rows = conn.execute(
+            "SELECT created_at, id FROM prompt_postings WHERE term = ? AND kind = ? "
+            "ORDER BY created_at DESC, id DESC LIMIT ?",
+            (term, kind, page)
+        ).fetchall()
+        while rows:
+            yield from rows
+            if len(rows) < page:
+                return
+            last = rows[-1]
+            page = min(page * 2, POSTING_PAGE_SIZE)
+            rows = conn.execute(
+                "SELECT created_at, id FROM prompt_postings WHERE term = ? AND kind = ? "
+                "AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?",
+                (term, kind, last[0], last[1], page)
+            ).fetchall()
+
+    def _postings(self, conn: sqlite3.Connection, kind: str, group: QueryGroup) -> Iterator[Tuple[str, str]]:
+        """Postings of a group (union of its terms), newest first, without duplicates"""
+        if len(group.terms) == 1:
+            yield from self._term_postings(conn, kind, group.terms[0])
+            return
+
+        # k-way merge of per-term index scans; wide prefixes start each scan small
+        first_page = POSTING_PAGE_SIZE
+        if len(group.terms) > MAX_PREFIX_EXPANSION:
+            first_page = max(MIN_FIRST_PAGE, POSTING_PAGE_SIZE * MAX_PREFIX_EXPANSION // len(group.terms))
+        stream = heapq.merge(
+            *(self._term_postings(conn, kind, term, first_page) for term in group.terms), reverse=True
+        )
+
+        last = None
+        for posting in stream:
+            if posting != last:
+                yield posting
+            last = posting
+
+    def _contains(self, conn: sqlite3.Connection, kind: str, group: QueryGroup, item_id: str) -> bool:
+        """Whether an item has a term of a group (seek on the per-item index)"""
+        if group.prefix:
+            row = conn.execute(
+                "SELECT 1 FROM prompt_postings WHERE kind = ? AND id = ? AND term >= ? AND term < ? LIMIT 1",
+                (kind, item_id, group.term, group.term + "\U0010ffff")
+            ).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT 1 FROM prompt_postings WHERE kind = ? AND id = ? AND term = ? LIMIT 1",
+                (kind, item_id, group.term)
+            ).fetchone()
+        return row is not None
+
+    def _verify(self, conn: sqlite3.Connection, item_id: str, runs: List[str]) -> bool:
+        """Check bigram matches against the actual prompt text"""
+        row = conn.execute("SELECT prompt FROM media WHERE id = ?", (item_id,)).fetchone()
+        if not row:
+            return False
+        prompt = row[0].lower()
+        return all(run in prompt for run in runs)
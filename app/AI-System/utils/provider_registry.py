@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Provider Registry
+Text providers behind one interface, with the provider chain resolved once
+at startup (TEXT_PROVIDERS, defaulting to AI_PROVIDER) and a routing
+strategy (TEXT_ROUTING):
+
+- fallback: try providers in order, moving on when one fails or is unhealthy
+- hedge: if the first provider has not answered within its recent p95
+  latency, fire the next one as well; the first success wins and the loser
+  is cancelled
+- weighted: pick the first provider at random by TEXT_PROVIDER_WEIGHTS,
+  then fall back through the rest in order
+"""
+
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .metrics import registry
+
+TEXT_PROVIDERS = [
+    name.strip().lower()
+    for name in os.getenv("TEXT_PROVIDERS", os.getenv("AI_PROVIDER", "gemini")).split(",") if name.strip()
+]
+TEXT_ROUTING = os.getenv("TEXT_ROUTING", "fallback").lower()
+# "gemini:3,ollama:1"; providers not listed weigh 1
+TEXT_PROVIDER_WEIGHTS = os.getenv("TEXT_PROVIDER_WEIGHTS", "")
+# Hedge delay until a provider has HEDGE_MIN_SAMPLES latencies to take a p95 from
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "2.0"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+# Recent successful calls kept per provider for its p95
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "200"))
+
+STRATEGIES = ("fallback", "hedge", "weighted")
+
+PROVIDER_ATTEMPTS = registry.counter(
+    "text_provider_attempts_total", "Text provider attempts by routing outcome", ("provider", "result")
+)
+PROVIDER_HEDGES = registry.counter("text_provider_hedges_total", "Hedged requests fired, by the provider that was slow", ("provider",))
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """{"gemini": 3.0, ...} from "gemini:3,ollama:1" """
+    weights = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition(":")
+        if name.strip():
+            weights[name.strip().lower()] = float(weight or 1)
+    return weights
+
+
+class NoProviderAvailable(Exception):
+    """No configured text provider is healthy right now"""
+
+
+class TextProvider:
+    """One text backend: its health/model check and how to generate and stream with it
+
+    `model()` returns the model serving requests, or None while the provider
+    is unavailable. It is called for routing and stats, so it must be
+    read-only (never take a circuit breaker's half-open trial). `generate` and
+    `stream` take whatever arguments the caller passes through the registry;
+    `prepare` is awaited before use (lazy SDK initialization).
+    """
+
+    def __init__(self, name: str, model: Callable[[], Optional[str]],
+                 generate: Callable[..., Awaitable[Dict[str, Any]]],
+                 stream: Callable[..., Tuple[AsyncIterator[Dict[str, Any]], str]],
+                 prepare: Optional[Callable[[], Awaitable[Any]]] = None):
+        self.name = name
+        self.model = model
+        self.generate = generate
+        self.stream = stream
+        self.prepare = prepare
+        self.weight = 1.0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._p95: Optional[float] = None
+
+    def available(self) -> bool:
+        return self.model() is not None
+
+    def observe(self, seconds: float):
+        self.latencies.append(seconds)
+        self._p95 = None
+
+    def p95(self) -> Optional[float]:
+        """p95 of recent successful calls, None until there are HEDGE_MIN_SAMPLES"""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        if self._p95 is None:
+            ordered = sorted(self.latencies)
+            self._p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return self._p95
+
+    def hedge_delay(self) -> float:
+        p95 = self.p95()
+        return HEDGE_DELAY if p95 is None else p95
+
+
+class ProviderRegistry:
+    """Registered text providers, the configured chain and its routing strategy"""
+
+    def __init__(self, names: Optional[List[str]] = None, strategy: str = TEXT_ROUTING,
+                 weights: Optional[Dict[str, float]] = None):
+        self.names = list(TEXT_PROVIDERS if names is None else names)
+        if strategy not in STRATEGIES:
+            print(f"⚠️  Unknown TEXT_ROUTING {strategy!r}, using fallback")
+            strategy = "fallback"
+        self.strategy = strategy
+        self.weights = parse_weights(TEXT_PROVIDER_WEIGHTS) if weights is None else weights
+        self.providers: Dict[str, TextProvider] = {}
+        self.counters = {"requests": 0, "fallbacks": 0, "hedged": 0, "hedge_wins": 0, "unavailable": 0}
+
+    def register(self, provider: TextProvider) -> TextProvider:
+        provider.weight = self.weights.get(provider.name, 1.0)
+        self.providers[provider.name] = provider
+        return provider
+
+    @property
+    def chain(self) -> List[TextProvider]:
+        """Configured providers in order (unknown names are skipped)"""
+        return [self.providers[name] for name in self.names if name in self.providers]
+
+    def unknown(self) -> List[str]:
+        return [name for name in self.names if name not in self.providers]
+
+    async def prepare(self):
+        for provider in self.chain:
+            if provider.prepare:
+                await provider.prepare()
+
+    def _healthy(self) -> List[Tuple[TextProvider, str]]:
+        """(provider, model) of the healthy providers in order, each checked once"""
+        healthy = []
+        for provider in self.chain:
+            model = provider.model()
+            if model is not None:
+                healthy.append((provider, model))
+        return healthy
+
+    def available(self) -> List[TextProvider]:
+        return [provider for provider, _ in self._healthy()]
+
+    def identity(self) -> str:
+        """Healthy providers and their models, e.g. for cache keys"""
+        return ",".join(f"{provider.name}/{model}" for provider, model in self._healthy())
+
+    def candidates(self) -> List[TextProvider]:
+        """Healthy providers in the order this request should try them"""
+        available = self.available()
+        if self.strategy == "weighted" and len(available) > 1:
+            first = random.choices(available, weights=[provider.weight for provider in available])[0]
+            available.remove(first)
+            available.insert(0, first)
+        return available
+
+    async def _attempt(self, provider: TextProvider, attempt: Callable[[TextProvider], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        try:
+            result = await attempt(provider)
+        except asyncio.CancelledError:
+            PROVIDER_ATTEMPTS.labels(provider.name, "cancelled").inc()
+            raise
+        except Exception:
+            PROVIDER_ATTEMPTS.labels(provider.name, "error").inc()
+            raise
+        provider.observe(time.perf_counter() - started)
+        PROVIDER_ATTEMPTS.labels(provider.name, "ok").inc()
+        return result
+
+    async def generate(self, attempt: Callable[[TextProvider], Awaitable[Any]]) -> Any:
+        """Run `attempt(provider)` by the routing strategy; raises the last error if every provider failed"""
+        self.counters["requests"] += 1
+        candidates = self.candidates()
+        if not candidates:
+            self.counters["unavailable"] += 1
+            raise NoProviderAvailable(f"No healthy text provider among {self.names}")
+        if self.strategy == "hedge" and len(candidates) > 1:
+            return await self._hedged(candidates, attempt)
+        return await self._fallback(candidates, attempt)
+
+    async def _fallback(self, candidates: List[TextProvider], attempt) -> Any:
+        error: Optional[Exception] = None
+        for provider in candidates:
+            if error is not None:
+                self.counters["fallbacks"] += 1
+            try:
+                return await self._attempt(provider, attempt)
+            except Exception as e:
+                print(f"⚠️  {provider.name} failed ({e}), trying the next provider")
+                error = e
+        raise error
+
+    async def _hedged(self, candidates: List[TextProvider], attempt) -> Any:
+        primary, backups = candidates[0], candidates[1:]
+        running = {asyncio.ensure_future(self._attempt(primary, attempt)): primary}
+        hedged = False
+        error: Optional[Exception] = None
+        try:
+            while running:
+                # Only the first hedge is timed; later backups start when everything running failed
+                timeout = primary.hedge_delay() if backups and not hedged else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self.counters["hedged"] += 1
+                    PROVIDER_HEDGES.labels(primary.name).inc()
+                    backup = backups.pop(0)
+                    running[asyncio.ensure_future(self._attempt(backup, attempt))] = backup
+                    continue
+                for task in done:
+                    provider = running.pop(task)
+                    if task.exception() is None:
+                        if provider is not primary:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+                    print(f"⚠️  {provider.name} failed ({error})")
+                if not running and backups:
+                    hedged = True
+                    self.counters["fallbacks"] += 1
+                    backup = backups.pop(0)
+                    running[asyncio.ensure_future(self._attempt(backup, attempt))] = backup
+            raise error
+        finally:
+            for task in running:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        models = {provider.name: provider.model() for provider in self.chain}
+        return {
+            "chain": self.names,
+            "strategy": self.strategy,
+            "providers": {
+                provider.name: {
+                    "available": models[provider.name] is not None,
+                    "model": models[provider.name],
+                    "weight": provider.weight,
+                    "p95": round(provider.p95(), 3) if provider.p95() is not None else None,
+                    "samples": len(provider.latencies)
+                }
+                for provider in self.chain
+            },
+            **self.counters
+        }
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Async Provider Runner
+Keeps LLM provider calls off the event loop: native async SDK methods are
+awaited directly, blocking ones run in a bounded thread pool. Every provider
+gets its own concurrency limit and timeout
+"""
+
+import os
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import anyio
+
+from .metrics import PROVIDER_CALL_DURATION, PROVIDER_IN_FLIGHT
+
+PROVIDER_THREAD_POOL_SIZE = int(os.getenv("PROVIDER_THREAD_POOL_SIZE", "16"))
+
+
+class ProviderTimeout(Exception):
+    """A provider call did not finish within its timeout"""
+
+
+class ProviderLimits:
+    """Concurrency limit and timeout of one provider"""
+
+    def __init__(self, max_concurrency: int, timeout: float):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+
+
+def limits_from_env(provider: str, max_concurrency: int, timeout: float) -> ProviderLimits:
+    """Limits for a provider, overridable with <PROVIDER>_MAX_CONCURRENCY / <PROVIDER>_TIMEOUT"""
+    prefix = provider.upper()
+    return ProviderLimits(
+        int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(max_concurrency))),
+        float(os.getenv(f"{prefix}_TIMEOUT", str(timeout)))
+    )
+
+
+DEFAULT_LIMITS = {
+    "gemini": limits_from_env("gemini", 8, 60),
+    # Local hardware usually runs one or two generations at a time
+    "ollama": limits_from_env("ollama", 2, 60),
+}
+
+
+class ProviderRunner:
+    """Runs provider calls with per-provider concurrency limits and timeouts"""
+
+    def __init__(self, limits: Optional[Dict[str, ProviderLimits]] = None,
+                 max_threads: int = PROVIDER_THREAD_POOL_SIZE):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.max_threads = max_threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop = None
+        self._in_flight: Dict[str, int] = {}
+
+    def _limits(self, provider: str) -> ProviderLimits:
+        if provider not in self.limits:
+            self.limits[provider] = limits_from_env(provider, 4, 60)
+        return self.limits[provider]
+
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        """Per-provider semaphore bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphores = {}
+            self._loop = loop
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(self._limits(provider).max_concurrency)
+        return self._semaphores[provider]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="provider")
+        return self._executor
+
+    async def call(self, provider: str, make_call: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """Await a native async provider call under the provider's limits
+
+        `make_call` builds the awaitable once a slot is free; time spent
+        waiting for a slot counts towards the timeout.
+        """
+        timeout = timeout or self._limits(provider).timeout
+        in_flight = PROVIDER_IN_FLIGHT.labels(provider)
+        started = None
+
+        async def _limited():
+            nonlocal started
+            async with self._semaphore(provider):
+                # Upstream time is measured from here, without the wait for a slot
+                started = time.perf_counter()
+                self._in_flight[provider] = self._in_flight.get(provider, 0) + 1
+                in_flight.inc()
+                try:
+                    return await make_call()
+                finally:
+                    self._in_flight[provider] -= 1
+                    in_flight.dec()
+
+        outcome = "error"
+        try:
+            result = await asyncio.wait_for(_limited(), timeout)
+            outcome = "ok"
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise ProviderTimeout(f"{provider} did not respond within {timeout:g}s")
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            if started is not None:
+                PROVIDER_CALL_DURATION.labels(provider, outcome).observe(time.perf_counter() - started)
+
+    async def run(self, provider: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking provider call in the thread pool under the provider's limits
+
+        Arguments are passed through to `fn` and the provider's configured
+        timeout applies. On timeout the caller gets ProviderTimeout straight
+        away; the thread finishes in the background (threads cannot be
+        interrupted), which the bounded pool keeps from piling up.
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args, **kwargs)
+        return await self.call(provider, lambda: loop.run_in_executor(self._get_executor(), call))
+
+    async def offload(self, fn: Callable[..., Any], *args) -> Any:
+        """Run a blocking step in the provider thread pool without taking a slot
+
+        For callers that already hold one (e.g. pulling a sync stream).
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(fn, *args))
+
+    @asynccontextmanager
+    async def slot(self, provider: str):
+        """Hold one of the provider's concurrency slots (for long-lived streams)"""
+        timeout = self._limits(provider).timeout
+        semaphore = self._semaphore(provider)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise ProviderTimeout(f"{provider} had no free slot within {timeout:g}s")
+        in_flight = PROVIDER_IN_FLIGHT.labels(provider)
+        self._in_flight[provider] = self._in_flight.get(provider, 0) + 1
+        in_flight.inc()
+        try:
+            yield
+        finally:
+            self._in_flight[provider] -= 1
+            in_flight.dec()
+            semaphore.release()
+
+    async def stream(self, provider: str, make_stream: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Iterate a provider stream while holding a slot
+
+        The provider's timeout applies to the wait for each item rather than
+        to the whole stream. Closing this iterator (client gone) closes the
+        upstream stream too.
+        """
+        timeout = self._limits(provider).timeout
+        async with self.slot(provider):
+            started = time.perf_counter()
+            outcome = "cancelled"
+            iterator = make_stream().__aiter__()
+            try:
+                while True:
+                    try:
+                        # fail_after keeps the stream in this task (HTTP streams
+                        # must be closed by the task that opened them)
+                        with anyio.fail_after(timeout):
+                            item = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        outcome = "ok"
+                        return
+                    except TimeoutError:
+                        outcome = "timeout"
+                        raise ProviderTimeout(f"{provider} sent nothing for {timeout:g}s")
+                    except Exception:
+                        outcome = "error"
+                        raise
+                    yield item
+            finally:
+                PROVIDER_CALL_DURATION.labels(provider, outcome).observe(time.perf_counter() - started)
+                aclose = getattr(iterator, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            provider: {
+                "max_concurrency": limits.max_concurrency,
+                "timeout": limits.timeout,
+                "in_flight": self._in_flight.get(provider, 0)
+            }
+            for provider, limits in self.limits.items()
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Response Cache
+Two-tier cache for generated text: an in-memory LRU in each worker in front
+of an on-disk tier with TTL shared by all workers. Keys are canonical hashes
+of everything that determines the output
+"""
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import asyncio
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(24 * 3600)))
+RESPONSE_CACHE_DIR = os.getenv(
+    "RESPONSE_CACHE_DIR", str(Path(__file__).parent.parent / "storage" / "cache" / "responses")
+)
+
+# Expired disk entries are swept every this many writes
+PURGE_EVERY = 500
+
+
+def cache_key(**fields: Any) -> str:
+    """Canonical hash of request fields (key order and whitespace do not matter)"""
+    canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU over an on-disk TTL cache of JSON responses"""
+
+    def __init__(self, cache_dir: str = RESPONSE_CACHE_DIR, max_entries: int = RESPONSE_CACHE_SIZE,
+                 ttl: float = RESPONSE_CACHE_TTL, enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evicted": 0, "bypassed": 0}
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.counters["evicted"] += 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached value, or None if absent or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, ValueError):
+            stored = None
+        if stored and stored.get("expires_at", 0) > now:
+            self._remember(key, stored["expires_at"], stored["value"])
+            with self._lock:
+                self.counters["disk_hits"] += 1
+            return stored["value"]
+        if stored:
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Store a value in both tiers"""
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, value)
+
+        # Temp file + rename: other workers never read a partial entry
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": expires_at, "value": value}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.counters["stores"] += 1
+            self._writes += 1
+            purge = self._writes % PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """get() with the disk tier read off the event loop"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return entry[1]
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Dict[str, Any]):
+        await asyncio.to_thread(self.set, key, value)
+
+    def bypass(self):
+        """Count a request that skipped the cache"""
+        with self._lock:
+            self.counters["bypassed"] += 1
+
+    def purge_expired(self) -> int:
+        """Delete expired entries from the disk tier"""
+        now = time.time()
+        removed = 0
+        if not self.cache_dir.exists():
+            return 0
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    expired = json.load(f).get("expires_at", 0) <= now
+            except (FileNotFoundError, ValueError):
+                expired = True
+            if expired:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            memory_entries = len(self._memory)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {
+            "enabled": self.enabled,
+            **counters,
+            "hits": hits,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": memory_entries,
+            "ttl": self.ttl
+        }
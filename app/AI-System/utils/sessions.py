@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Conversation Sessions
+Server-side chat history, so clients send only the new turn instead of the
+whole conversation. Sessions live in a bounded in-memory LRU with an idle
+TTL; with SESSION_SPILL enabled, sessions pushed out of memory are written
+to disk and loaded back on their next turn.
+
+Sessions belong to the worker process that created them, so the store is
+disabled when API_WORKERS > 1 (a session would 404 on every other worker).
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(6 * 3600)))
+SESSION_SPILL = os.getenv("SESSION_SPILL", "false").lower() in ("1", "true", "yes")
+SESSION_DIR = os.getenv("SESSION_DIR", str(Path(__file__).parent.parent / "storage" / "cache" / "sessions"))
+# Oldest turns are dropped beyond this many messages (the history manager trims further per request)
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "200"))
+API_WORKERS = max(1, int(os.getenv("API_WORKERS", "1")))
+
+# Expired spilled sessions are swept every this many spills
+PURGE_EVERY = 200
+
+
+class Session:
+    """One conversation: its system prompt and messages (role/content dicts, oldest first)"""
+
+    __slots__ = ("id", "system_prompt", "messages", "created", "updated", "closed")
+
+    def __init__(self, session_id: str, system_prompt: Optional[str] = None,
+                 messages: Optional[List[Dict[str, str]]] = None,
+                 created: Optional[float] = None, updated: Optional[float] = None):
+        self.id = session_id
+        self.system_prompt = system_prompt
+        self.messages = messages or []
+        self.created = created or time.time()
+        self.updated = updated or self.created
+        # Set once the session is deleted or expired, so a late turn does not revive it
+        self.closed = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "system_prompt": self.system_prompt,
+            "messages": self.messages,
+            "created": self.created,
+            "updated": self.updated
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Session":
+        return cls(data["id"], data.get("system_prompt"), data.get("messages"), data.get("created"), data.get("updated"))
+
+
+class SessionStore:
+    """LRU of sessions with idle expiry and optional disk spill"""
+
+    def __init__(self, max_sessions: int = SESSION_MAX, ttl: float = SESSION_TTL,
+                 spill: bool = SESSION_SPILL, spill_dir: str = SESSION_DIR,
+                 max_messages: int = SESSION_MAX_MESSAGES, enabled: bool = API_WORKERS == 1):
+        self.enabled = enabled
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.spill = spill
+        self.spill_dir = Path(spill_dir)
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._spills = 0
+        self.counters = {"created": 0, "hits": 0, "misses": 0, "expired": 0, "evicted": 0, "spilled": 0, "restored": 0}
+
+    def _path(self, session_id: str) -> Path:
+        return self.spill_dir / f"{session_id}.json"
+
+    def _write(self, session: Session):
+        # Temp file + rename: a reader never sees a partial session
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(session.id)
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(session.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _insert(self, session: Session):
+        """Add to the LRU, pushing the least recently used sessions out (to disk when spilling)"""
+        evicted = []
+        with self._lock:
+            self._sessions[session.id] = session
+            self._sessions.move_to_end(session.id)
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._sessions.popitem(last=False)[1])
+        for old in evicted:
+            self.counters["evicted"] += 1
+            if self.spill and old.updated + self.ttl > time.time():
+                self._write(old)
+                self.counters["spilled"] += 1
+                self._spills += 1
+                if self._spills % PURGE_EVERY == 0:
+                    self.purge_expired()
+
+    def _cap(self, session: Session):
+        """Drop the oldest messages beyond max_messages, keeping the history starting on a user turn"""
+        if self.max_messages and len(session.messages) > self.max_messages:
+            start = len(session.messages) - self.max_messages
+            while start < len(session.messages) - 1 and session.messages[start]["role"] != "user":
+                start += 1
+            del session.messages[:start]
+
+    def create(self, system_prompt: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None) -> Session:
+        session = Session(uuid.uuid4().hex, system_prompt, list(messages or []))
+        self._cap(session)
+        self._insert(session)
+        self.counters["created"] += 1
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """Live session (refreshing its LRU position), None if unknown or expired
+
+        May read a spilled session from disk; call it off the event loop when
+        spilling is enabled.
+        """
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                if session.updated + self.ttl > now:
+                    self._sessions.move_to_end(session_id)
+                    self.counters["hits"] += 1
+                    return session
+                del self._sessions[session_id]
+                session.closed = True
+                self.counters["expired"] += 1
+                return None
+
+        if self.spill and session_id.isalnum():
+            path = self._path(session_id)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    session = Session.from_dict(json.load(f))
+            except (FileNotFoundError, ValueError):
+                session = None
+            if session is not None:
+                path.unlink(missing_ok=True)
+                if session.updated + self.ttl > now:
+                    self._insert(session)
+                    self.counters["restored"] += 1
+                    return session
+                self.counters["expired"] += 1
+                return None
+        self.counters["misses"] += 1
+        return None
+
+    async def acreate(self, system_prompt: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None) -> Session:
+        """create() off the event loop when it may spill to disk"""
+        if self.spill:
+            return await asyncio.to_thread(self.create, system_prompt, messages)
+        return self.create(system_prompt, messages)
+
+    async def aget(self, session_id: str) -> Optional[Session]:
+        """get() off the event loop when it may read from disk"""
+        if self.spill:
+            return await asyncio.to_thread(self.get, session_id)
+        return self.get(session_id)
+
+    def append(self, session: Session, *messages: Dict[str, str]) -> Optional[Session]:
+        """Add messages to a session (one turn: the user message and the reply)
+
+        A session pushed out of memory while the turn ran is reloaded (from
+        the spill directory) or put back, so the turn is not lost. Returns
+        the session the turn went into, None if it was deleted or expired.
+        May read from disk; call it off the event loop when spilling is enabled.
+        """
+        with self._lock:
+            current = self._sessions.get(session.id)
+        if current is None and self.spill:
+            current = self.get(session.id)
+        if current is None:
+            # Without spill an evicted session exists only in this request
+            if session.closed or self.spill or session.updated + self.ttl <= time.time():
+                return None
+            current = session
+            self._insert(current)
+        with self._lock:
+            current.messages.extend(messages)
+            current.updated = time.time()
+            self._cap(current)
+        return current
+
+    async def aappend(self, session: Session, *messages: Dict[str, str]) -> Optional[Session]:
+        """append() off the event loop when it may read from disk"""
+        if self.spill:
+            return await asyncio.to_thread(self.append, session, *messages)
+        return self.append(session, *messages)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        removed = session is not None
+        if session is not None:
+            session.closed = True
+        if self.spill and session_id.isalnum():
+            path = self._path(session_id)
+            if path.exists():
+                path.unlink(missing_ok=True)
+                removed = True
+        return removed
+
+    def purge_expired(self) -> int:
+        """Drop expired sessions from memory and from the spill directory"""
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, s in self._sessions.items() if s.updated + self.ttl <= now]
+            for sid in expired:
+                self._sessions.pop(sid).closed = True
+        removed = len(expired)
+        if self.spill and self.spill_dir.exists():
+            for path in self.spill_dir.glob("*.json"):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        stale = json.load(f).get("updated", 0) + self.ttl <= now
+                except (FileNotFoundError, ValueError):
+                    stale = True
+                if stale:
+                    path.unlink(missing_ok=True)
+                    removed += 1
+        self.counters["expired"] += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "ttl": self.ttl,
+            "max_messages": self.max_messages,
+            "spill": self.spill,
+            **self.counters
+        }
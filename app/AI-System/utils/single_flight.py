@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Single-Flight Request Coalescing
+Identical requests arriving while one is already in flight wait for that
+call's result instead of starting their own upstream call
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key onto one task"""
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.requests = 0
+        self.upstream_calls = 0
+
+    async def do(self, key: Hashable, make_call: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of `make_call()`, shared with every concurrent caller using the same key
+
+        The call runs as its own task, so one caller disconnecting (and being
+        cancelled) does not cancel it for the others. Errors reach every caller.
+        """
+        self.requests += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            self.upstream_calls += 1
+            task = asyncio.ensure_future(make_call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every waiter went away
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        collapsed = self.requests - self.upstream_calls
+        return {
+            "requests": self.requests,
+            "upstream_calls": self.upstream_calls,
+            "collapsed": collapsed,
+            "collapse_ratio": round(collapsed / self.requests, 3) if self.requests else 0.0,
+            "in_flight": len(self._in_flight)
+        }
@@ -5,264 +5,458 @@ Handles saving, organizing, and retrieving generated images, videos, and audio
 """
 
 import os
-import uuid
 import json
+import uuid
 import hashlib
+import asyncio
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple
 import shutil
-import requests
-from PIL import Image
-import io
+
+from .catalog import CatalogBackend, SQLiteCatalog, CONTENT_KINDS, legacy_thumbnail, migrate_json_metadata
+from .thumbnails import ThumbnailPipeline, THUMBNAIL_SIZES, THUMBNAIL_FORMATS, DEFAULT_THUMBNAIL
+from .change_feed import ChangeFeed
+from .file_lock import FileLock
+from .metrics import STORAGE_OPERATION_DURATION
+
+if TYPE_CHECKING:
+    # httpx and aiofiles are imported on first download, not at startup
+    import httpx
+
+# Download settings
+DOWNLOAD_TIMEOUT = float(os.getenv("STORAGE_DOWNLOAD_TIMEOUT", "30"))
+DOWNLOAD_MAX_CONNECTIONS = int(os.getenv("STORAGE_DOWNLOAD_MAX_CONNECTIONS", "20"))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+BLOB_LAYOUT_VERSION = "2"
+CLEANUP_BATCH_SIZE = 1000
+CHANGE_LOG_RETENTION = 10000
+
+DEFAULT_STORAGE_PATH = Path(__file__).parent.parent / "storage"
 
 class StorageManager:
-    """Manages storage of AI-generated content"""
+    """Manages storage of AI-generated content
+
+    Safe to use from several API worker processes at once: all state lives in
+    the shared catalog, files are written under temp names and renamed into
+    place, and one-off maintenance (migrations, reconcile, cleanup) runs under
+    a cross-process lock.
+    """
     
-    def __init__(self, base_path: str = None):
-        self.base_path = Path(base_path) if base_path else Path(__file__).parent.parent / "storage"
+    def __init__(self, base_path: str = None, catalog: CatalogBackend = None):
+        self.base_path = Path(base_path) if base_path else DEFAULT_STORAGE_PATH
         self.images_path = self.base_path / "images"
         self.videos_path = self.base_path / "videos"
         self.audio_path = self.base_path / "audio"
+        self.temp_path = self.base_path / "tmp"
+        self.kind_paths = {"images": self.images_path, "videos": self.videos_path, "audio": self.audio_path}
         self.metadata_file = self.base_path / "metadata.json"
+        self.lock_path = self.base_path / ".maintenance.lock"
         
         # Create directories
         self._ensure_directories()
         
-        # Load metadata
-        self.metadata = self._load_metadata()
+        self.catalog = catalog or SQLiteCatalog(self.base_path / "catalog.db")
+        self.cleanup_progress: Dict[str, Any] = {"state": "idle"}
+        self._http_client: Optional["httpx.AsyncClient"] = None
+        self._http_client_loop = None
+        self.thumbnails = ThumbnailPipeline(self.catalog, self.images_path / "thumbnails")
+        self.changes = ChangeFeed(self.catalog)
+        
+        # Every worker process runs this; the lock lets the first one do the
+        # one-off work while the others wait and then find it done
+        with self._maintenance_lock():
+            # Import the legacy JSON once
+            if self.metadata_file.exists():
+                migrate_json_metadata(self.metadata_file, self.catalog)
+            
+            # Move files saved before content addressing into the blob store
+            if self.catalog.get_meta("blob_layout") != BLOB_LAYOUT_VERSION:
+                self.migrate_to_blobs()
+            
+            # Seed the usage counters the first time
+            if self.catalog.get_meta("usage_reconciled_at") is None:
+                self._reconcile_usage()
+    
+    def _maintenance_lock(self, blocking: bool = True) -> FileLock:
+        """Cross-process lock for work that must not run in two workers at once"""
+        return FileLock(str(self.lock_path), blocking=blocking)
     
     def _ensure_directories(self):
         """Create storage directories if they don't exist"""
-        for path in [self.images_path, self.videos_path, self.audio_path]:
+        for path in [self.images_path, self.videos_path, self.audio_path, self.temp_path]:
             path.mkdir(parents=True, exist_ok=True)
     
-    def _load_metadata(self) -> Dict:
-        """Load metadata from file"""
-        if self.metadata_file.exists():
+    @staticmethod
+    def _partition_path(kind_path: Path, created_at: str) -> Path:
+        """Date partition of a content type: <kind>/YYYY/MM/DD"""
+        return kind_path / created_at[0:4] / created_at[5:7] / created_at[8:10]
+    
+    def _blob_path(self, kind_path: Path, sha256: str, extension: str, created_at: str) -> Path:
+        """Content-addressed location inside a date partition: <kind>/YYYY/MM/DD/ab/abcd....<ext>"""
+        return self._partition_path(kind_path, created_at) / sha256[:2] / f"{sha256}.{extension}"
+    
+    @staticmethod
+    def _partition_day(kind_path: Path, path: Path) -> Optional[str]:
+        """YYYY-MM-DD of the partition holding a file (None outside the partition layout)"""
+        try:
+            parts = Path(path).relative_to(kind_path).parts
+        except ValueError:
+            return None
+        if len(parts) < 4 or not (len(parts[0]) == 4 and parts[0].isdigit() and parts[1].isdigit() and parts[2].isdigit()):
+            return None
+        return f"{parts[0]}-{parts[1]}-{parts[2]}"
+    
+    def new_temp_path(self) -> Path:
+        """Scratch file on the same filesystem as the blob store"""
+        self.temp_path.mkdir(parents=True, exist_ok=True)
+        return self.temp_path / f"{uuid.uuid4().hex}.part"
+    
+    def _place_blob(self, kind_path: Path, sha256: str, stored: Path, created_at: str) -> Path:
+        """Keep a blob in the partition of its newest reference
+
+        Expiry drops whole partitions, which is only safe if no newer item
+        still points into an older partition.
+        """
+        current_day = self._partition_day(kind_path, stored)
+        if current_day is not None and current_day >= created_at[:10]:
+            return stored
+        target = self._blob_path(kind_path, sha256, stored.suffix.lstrip("."), created_at)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(stored, target)
+        self.catalog.move_blob(sha256, str(target), created_at)
+        return target
+    
+    def _store_blob(self, kind: str, kind_path: Path, temp_path: Path, sha256: str, extension: str,
+                    content_type: Optional[str], created_at: Optional[str] = None) -> Tuple[Path, bool]:
+        """Move a fully written temp file into the blob store (or drop it if the content exists)
+
+        Returns (blob path, created). The file move happens inside the catalog
+        transaction, so it is serialized with concurrent releases of the same blob.
+        """
+        created_at = created_at or datetime.now().isoformat()
+        target = self._blob_path(kind_path, sha256, extension, created_at)
+        with self.catalog.transaction():
+            stored, created = self.catalog.acquire_blob(
+                sha256, kind, str(target), temp_path.stat().st_size, content_type
+            )
+            stored = Path(stored)
+            if created or not stored.exists():
+                stored.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(temp_path, stored)
+            else:
+                temp_path.unlink()
+                stored = self._place_blob(kind_path, sha256, stored, created_at)
+        return stored, created
+    
+    def _current_path(self, record: Dict[str, Any]) -> Path:
+        """Where a record's file lives now (blobs can move between partitions)"""
+        if record.get("sha256"):
+            blob = self.catalog.get_blob(record["sha256"])
+            if blob:
+                return Path(blob["path"])
+        return Path(record.get("file_path") or "")
+    
+    def _release_blob(self, sha256: str):
+        """Drop a reference to a blob, deleting the file and its thumbnails with the last one"""
+        with self.catalog.transaction():
+            path = self.catalog.release_blob(sha256)
+            if path and Path(path).exists():
+                Path(path).unlink()
+        if path:
+            self.thumbnails.delete(sha256)
+    
+    def _get_http_client(self) -> "httpx.AsyncClient":
+        """Pooled async HTTP client bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._http_client is None or self._http_client_loop is not loop:
+            self._http_client = self._new_http_client()
+            self._http_client_loop = loop
+        return self._http_client
+    
+    @staticmethod
+    def _new_http_client() -> "httpx.AsyncClient":
+        import httpx
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(DOWNLOAD_TIMEOUT),
+            limits=httpx.Limits(max_connections=DOWNLOAD_MAX_CONNECTIONS, max_keepalive_connections=DOWNLOAD_MAX_CONNECTIONS),
+            follow_redirects=True
+        )
+    
+    async def aclose(self):
+        """Close the pooled HTTP client, change feed and thumbnail workers"""
+        await self.changes.stop()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+        self.thumbnails.shutdown()
+    
+    @staticmethod
+    def _extension_for(content_type: str) -> str:
+        """Map a response content type to a file extension"""
+        if 'jpeg' in content_type or 'jpg' in content_type:
+            return 'jpg'
+        elif 'png' in content_type:
+            return 'png'
+        elif 'webp' in content_type:
+            return 'webp'
+        return 'jpg'  # Default
+    
+    def _register_media(self, kind: str, temp_path: Path, sha256: str, prompt: str, extension: str,
+                        extra: Dict[str, Any], metadata: Dict[str, Any] = None) -> Tuple[Dict[str, Any], Path, bool]:
+        """Store a finished temp file in the blob store and add its catalog record
+
+        Returns (record, blob path, created). Identical bytes are stored once;
+        every save still gets its own catalog entry with its own prompt.
+        """
+        # The refcount and the catalog row commit (or roll back) together
+        with self.catalog.transaction():
+            file_path, created = self._store_blob(
+                kind, self.kind_paths[kind], temp_path, sha256, extension, extra.get("content_type")
+            )
             try:
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Error loading metadata: {e}")
+                record = {
+                    "id": str(uuid.uuid4()),
+                    "filename": file_path.name,
+                    "prompt": prompt,
+                    "sha256": sha256,
+                    "file_path": str(file_path),
+                    "file_size": file_path.stat().st_size,
+                    "created_at": datetime.now().isoformat(),
+                    "deduplicated": not created,
+                    **extra,
+                    **(metadata or {})
+                }
+                self.catalog.add(kind, record)
+            except Exception:
+                # The rollback forgets a new blob row, so its file goes too (still under the write lock)
+                if created:
+                    file_path.unlink(missing_ok=True)
+                raise
+        return record, file_path, created
+    
+    def _register_image(self, temp_path: Path, sha256: str, prompt: str, extension: str,
+                        extra: Dict[str, Any], metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Store a downloaded image, add it to the catalog and build the API result
+
+        Identical bytes are stored (and thumbnailed) once.
+        """
+        extra = {"thumbnail_path": str(self.thumbnails.derivative_path(sha256, *DEFAULT_THUMBNAIL)), **extra}
+        image_metadata, file_path, created = self._register_media(
+            "images", temp_path, sha256, prompt, extension, extra, metadata
+        )
+        
+        # Thumbnails render in the background; the thumbnail route renders on demand if asked first
+        if created:
+            self.thumbnails.enqueue(sha256, file_path)
         
         return {
-            "images": {},
-            "videos": {},
-            "audio": {},
-            "stats": {
-                "total_images": 0,
-                "total_videos": 0,
-                "total_audio": 0,
-                "created": datetime.now().isoformat()
-            }
+            "success": True,
+            "id": image_metadata["id"],
+            "filename": image_metadata["filename"],
+            "local_url": f"/storage/images/{image_metadata['filename']}",
+            "thumbnail_url": self.thumbnails.derivative_url(sha256),
+            "metadata": image_metadata
         }
     
-    def _save_metadata(self):
-        """Save metadata to file"""
+    @STORAGE_OPERATION_DURATION.labels("save").time()
+    def save_media_file(self, kind: str, temp_path: Path, prompt: str, extension: str,
+                        content_type: Optional[str] = None, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Move a finished video or audio file (written under temp_path) into the blob store and catalog
+
+        The temp file must be on the storage filesystem (see new_temp_path);
+        it is consumed either way. Raises on failure.
+        """
+        temp_path = Path(temp_path)
         try:
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error saving metadata: {e}")
-    
-    def _generate_filename(self, content_type: str, prompt: str, extension: str) -> str:
-        """Generate unique filename based on content and timestamp"""
-        # Create hash from prompt for consistency
-        prompt_hash = hashlib.md5(prompt.encode()).hexdigest()[:8]
-        
-        # Generate timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Generate unique ID
-        unique_id = str(uuid.uuid4())[:8]
-        
-        return f"{content_type}_{timestamp}_{prompt_hash}_{unique_id}.{extension}"
+            hasher = hashlib.sha256()
+            with open(temp_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+            record, _, _ = self._register_media(
+                kind, temp_path, hasher.hexdigest(), prompt, extension,
+                {"content_type": content_type, "extension": extension}, metadata
+            )
+        except Exception:
+            temp_path.unlink(missing_ok=True)
+            raise
+        return {
+            "success": True,
+            "id": record["id"],
+            "filename": record["filename"],
+            "local_url": f"/storage/{kind}/{record['filename']}",
+            "metadata": record
+        }
     
-    def save_image_from_url(self, url: str, prompt: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Download and save image from URL"""
+    @STORAGE_OPERATION_DURATION.labels("save").time()
+    async def asave_image_from_url(self, url: str, prompt: str, metadata: Dict[str, Any] = None,
+                                   client: "httpx.AsyncClient" = None) -> Dict[str, Any]:
+        """Download and save image from URL without blocking the event loop"""
+        import aiofiles
+        part_path = self.new_temp_path()
         try:
-            # Download image
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
+            client = client or self._get_http_client()
             
-            # Determine file extension
-            content_type = response.headers.get('content-type', '')
-            if 'jpeg' in content_type or 'jpg' in content_type:
-                extension = 'jpg'
-            elif 'png' in content_type:
-                extension = 'png'
-            elif 'webp' in content_type:
-                extension = 'webp'
-            else:
-                extension = 'jpg'  # Default
-            
-            # Generate filename
-            filename = self._generate_filename("image", prompt, extension)
-            file_path = self.images_path / filename
-            
-            # Save image
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
-            
-            # Create thumbnail
-            thumbnail_path = self._create_thumbnail(file_path)
-            
-            # Prepare metadata
-            image_metadata = {
-                "id": str(uuid.uuid4()),
-                "filename": filename,
-                "original_url": url,
-                "prompt": prompt,
-                "file_path": str(file_path),
-                "thumbnail_path": str(thumbnail_path) if thumbnail_path else None,
-                "file_size": file_path.stat().st_size,
-                "created_at": datetime.now().isoformat(),
-                "content_type": content_type,
-                "extension": extension,
-                **(metadata or {})
-            }
-            
-            # Add to metadata
-            self.metadata["images"][image_metadata["id"]] = image_metadata
-            self.metadata["stats"]["total_images"] += 1
-            self._save_metadata()
+            # Stream the download straight to disk, hashing as it arrives
+            hasher = hashlib.sha256()
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+                
+                content_type = response.headers.get('content-type', '')
+                extension = self._extension_for(content_type)
+                
+                async with aiofiles.open(part_path, 'wb') as f:
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        hasher.update(chunk)
+                        await f.write(chunk)
             
-            return {
-                "success": True,
-                "id": image_metadata["id"],
-                "filename": filename,
-                "local_url": f"/storage/images/{filename}",
-                "thumbnail_url": f"/storage/images/thumbnails/{Path(thumbnail_path).name}" if thumbnail_path else None,
-                "metadata": image_metadata
-            }
+            # Blob rename and catalog writes (BEGIN IMMEDIATE) block, so they run off the event loop
+            return await asyncio.to_thread(
+                self._register_image, part_path, hasher.hexdigest(), prompt, extension,
+                {"original_url": url, "content_type": content_type, "extension": extension},
+                metadata
+            )
             
         except Exception as e:
+            if part_path.exists():
+                part_path.unlink()
             return {
                 "success": False,
                 "error": str(e)
             }
     
+    def save_image_from_url(self, url: str, prompt: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Download and save image from URL (blocking wrapper around asave_image_from_url)"""
+        async def _save():
+            async with self._new_http_client() as client:
+                return await self.asave_image_from_url(url, prompt, metadata, client=client)
+        
+        return asyncio.run(_save())
+    
+    @STORAGE_OPERATION_DURATION.labels("save").time()
     def save_image_from_data(self, image_data: bytes, prompt: str, extension: str = "png", metadata: Dict[str, Any] = None) -> Dict[str, Any]:
         """Save image from binary data"""
+        part_path = self.new_temp_path()
         try:
-            # Generate filename
-            filename = self._generate_filename("image", prompt, extension)
-            file_path = self.images_path / filename
-            
             # Save image
-            with open(file_path, 'wb') as f:
+            with open(part_path, 'wb') as f:
                 f.write(image_data)
             
-            # Create thumbnail
-            thumbnail_path = self._create_thumbnail(file_path)
-            
-            # Prepare metadata
-            image_metadata = {
-                "id": str(uuid.uuid4()),
-                "filename": filename,
-                "prompt": prompt,
-                "file_path": str(file_path),
-                "thumbnail_path": str(thumbnail_path) if thumbnail_path else None,
-                "file_size": len(image_data),
-                "created_at": datetime.now().isoformat(),
-                "extension": extension,
-                **(metadata or {})
-            }
-            
-            # Add to metadata
-            self.metadata["images"][image_metadata["id"]] = image_metadata
-            self.metadata["stats"]["total_images"] += 1
-            self._save_metadata()
-            
-            return {
-                "success": True,
-                "id": image_metadata["id"],
-                "filename": filename,
-                "local_url": f"/storage/images/{filename}",
-                "thumbnail_url": f"/storage/images/thumbnails/{Path(thumbnail_path).name}" if thumbnail_path else None,
-                "metadata": image_metadata
-            }
+            sha256 = hashlib.sha256(image_data).hexdigest()
+            return self._register_image(part_path, sha256, prompt, extension, {"extension": extension}, metadata)
             
         except Exception as e:
+            if part_path.exists():
+                part_path.unlink()
             return {
                 "success": False,
                 "error": str(e)
             }
     
-    def _create_thumbnail(self, image_path: Path, size: tuple = (256, 256)) -> Optional[Path]:
-        """Create thumbnail for image"""
-        try:
-            # Create thumbnails directory
-            thumbnails_dir = self.images_path / "thumbnails"
-            thumbnails_dir.mkdir(exist_ok=True)
-            
-            # Open and resize image
-            with Image.open(image_path) as img:
-                # Convert to RGB if necessary
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    img = img.convert('RGB')
-                
-                # Create thumbnail
-                img.thumbnail(size, Image.Resampling.LANCZOS)
-                
-                # Save thumbnail
-                thumbnail_filename = f"thumb_{image_path.name}"
-                thumbnail_path = thumbnails_dir / thumbnail_filename
-                img.save(thumbnail_path, "JPEG", quality=85)
-                
-                return thumbnail_path
-                
-        except Exception as e:
-            print(f"Error creating thumbnail: {e}")
+    @staticmethod
+    def _safe_name(name: str) -> bool:
+        """A plain file name (no path components, no hidden files)"""
+        return bool(name) and "/" not in name and "\\" not in name and not name.startswith(".")
+    
+    async def get_thumbnail(self, size: int, name: str) -> Optional[Dict[str, Any]]:
+        """Thumbnail derivative behind a URL, rendering it first if it does not exist yet
+        
+        Returns {"path", "sha256", "variant", "immutable"} or None.
+        """
+        stem, _, fmt = name.rpartition(".")
+        if size not in THUMBNAIL_SIZES or fmt not in THUMBNAIL_FORMATS or not stem:
+            return None
+        
+        image_data = await asyncio.to_thread(self.catalog.find_by_stem, "images", stem)
+        if not image_data:
+            return None
+        
+        sha256 = image_data.get("sha256")
+        source_path = await asyncio.to_thread(self._current_path, image_data)
+        path = await self.thumbnails.ensure(sha256 or image_data["id"], source_path, size, fmt)
+        if not path:
             return None
+        return {"path": path, "sha256": sha256, "variant": f"{size}{fmt}", "immutable": stem == sha256}
+    
+    def resolve_legacy_thumbnail(self, name: str) -> Optional[Path]:
+        """Thumbnail file saved before multi-size derivatives (thumbnails/thumb_<name>)"""
+        if not self._safe_name(name):
+            return None
+        path = self.images_path / "thumbnails" / name
+        return path if path.is_file() else None
+    
+    def resolve_media(self, kind: str, name: str) -> Optional[Dict[str, Any]]:
+        """File behind a /storage/<kind>/<name> URL
+
+        Content-addressed names resolve through the blob table, names from
+        before content addressing through the alias table. Returns
+        {"path", "sha256", "content_type", "immutable"} or None.
+        """
+        if kind not in self.kind_paths or not self._safe_name(name):
+            return None
+        
+        sha256 = name.split(".", 1)[0]
+        blob = self.catalog.get_blob(sha256) if len(sha256) == 64 else None
+        immutable = blob is not None
+        if not blob:
+            alias = self.catalog.resolve_alias(kind, name)
+            blob = self.catalog.get_blob(alias) if alias else None
+        if blob:
+            path = Path(blob["path"])
+            if not path.exists():
+                return None
+            return {"path": path, "sha256": blob["sha256"], "content_type": blob["content_type"], "immutable": immutable}
+        
+        # Files that were never catalogued
+        path = self.kind_paths[kind] / name
+        if not path.is_file():
+            return None
+        return {"path": path, "sha256": None, "content_type": None, "immutable": False}
     
     def get_image_by_id(self, image_id: str) -> Optional[Dict[str, Any]]:
-        """Get image metadata by ID"""
-        return self.metadata["images"].get(image_id)
+        """Get image metadata by ID (with thumbnail derivative states)"""
+        image_data = self.catalog.get("images", image_id)
+        if image_data:
+            image_data["file_path"] = str(self._current_path(image_data))
+            image_data["derivatives"] = self.catalog.get_derivatives(image_data.get("sha256") or image_id)
+        return image_data
     
     def list_images(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        """List images with pagination"""
-        images = list(self.metadata["images"].values())
-        # Sort by creation date (newest first)
-        images.sort(key=lambda x: x["created_at"], reverse=True)
-        return images[offset:offset + limit]
+        """List images with pagination (newest first)"""
+        return self.catalog.list("images", limit=limit, offset=offset)
     
+    def list_images_page(self, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """List images with keyset pagination, returns (images, next_cursor)"""
+        return self.catalog.list_page("images", limit=limit, cursor=cursor)
+    
+    @STORAGE_OPERATION_DURATION.labels("search").time()
     def search_images(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
-        """Search images by prompt"""
-        results = []
-        query_lower = query.lower()
-        
-        for image_data in self.metadata["images"].values():
-            if query_lower in image_data["prompt"].lower():
-                results.append(image_data)
-        
-        # Sort by creation date (newest first)
-        results.sort(key=lambda x: x["created_at"], reverse=True)
-        return results[:limit]
+        """Search images by prompt (newest first)"""
+        return self.catalog.search("images", query, limit=limit)
     
     def delete_image(self, image_id: str) -> bool:
         """Delete image and its metadata"""
         try:
-            image_data = self.metadata["images"].get(image_id)
+            image_data = self.catalog.delete("images", image_id)
             if not image_data:
                 return False
             
-            # Delete files
-            file_path = Path(image_data["file_path"])
-            if file_path.exists():
-                file_path.unlink()
-            
-            # Delete thumbnail
-            if image_data.get("thumbnail_path"):
-                thumbnail_path = Path(image_data["thumbnail_path"])
-                if thumbnail_path.exists():
-                    thumbnail_path.unlink()
+            if image_data.get("sha256"):
+                # Shared blob: the file and thumbnails go with the last reference
+                self._release_blob(image_data["sha256"])
+            else:
+                # Delete files
+                file_path = Path(image_data["file_path"])
+                if file_path.exists():
+                    file_path.unlink()
+                self.thumbnails.delete(image_id)
             
-            # Remove from metadata
-            del self.metadata["images"][image_id]
-            self.metadata["stats"]["total_images"] -= 1
-            self._save_metadata()
+            # Thumbnail from before derivatives (kept by migrated records too)
+            legacy = legacy_thumbnail(image_data)
+            if legacy:
+                Path(legacy).unlink(missing_ok=True)
             
             return True
             
@@ -270,38 +464,271 @@ class StorageManager:
             print(f"Error deleting image: {e}")
             return False
     
-    def get_storage_stats(self) -> Dict[str, Any]:
-        """Get storage statistics"""
-        stats = self.metadata["stats"].copy()
+    def migrate_to_blobs(self) -> int:
+        """One-shot move of older files into the partitioned blob store
+
+        Files saved before content addressing are hashed and moved in, with
+        their old names kept resolving through the alias table; blobs from
+        the unpartitioned layout move to the partition of their newest item.
+        """
+        migrated = 0
+        for kind, kind_path in self.kind_paths.items():
+            cursor = None
+            while True:
+                # Newest first, so each blob is placed by its newest reference
+                records, cursor = self.catalog.list_page(kind, limit=500, cursor=cursor)
+                for record in records:
+                    if record.get("sha256"):
+                        blob = self.catalog.get_blob(record["sha256"])
+                        if blob and Path(blob["path"]).exists():
+                            with self.catalog.transaction():
+                                placed = self._place_blob(kind_path, record["sha256"], Path(blob["path"]), record["created_at"])
+                            migrated += placed != Path(blob["path"])
+                        continue
+                    
+                    file_path = Path(record.get("file_path") or "")
+                    if not file_path.is_file():
+                        continue
+                    
+                    hasher = hashlib.sha256()
+                    with open(file_path, 'rb') as f:
+                        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                            hasher.update(chunk)
+                    sha256 = hasher.hexdigest()
+                    extension = record.get("extension") or file_path.suffix.lstrip(".") or "bin"
+                    
+                    with self.catalog.transaction():
+                        # The legacy file itself is moved in (or dropped as a duplicate)
+                        blob_path, _ = self._store_blob(
+                            kind, kind_path, file_path, sha256, extension, record.get("content_type"), record["created_at"]
+                        )
+                        self.catalog.add_alias(kind, record["filename"], sha256)
+                        record.update({
+                            "sha256": sha256,
+                            "legacy_filename": record["filename"],
+                            "filename": blob_path.name,
+                            "file_path": str(blob_path)
+                        })
+                        self.catalog.add(kind, record)
+                    migrated += 1
+                if not cursor:
+                    break
+        
+        self.catalog.set_meta("blob_layout", BLOB_LAYOUT_VERSION)
+        if migrated:
+            print(f"📦 Moved {migrated} files into the partitioned blob store")
+        return migrated
+    
+    def get_storage_stats(self, reconcile: bool = False) -> Dict[str, Any]:
+        """Get storage statistics from the running usage counters
+
+        Pass reconcile=True to rebuild them from the files on disk first.
+        """
+        if reconcile:
+            self.reconcile_usage()
+        
+        stats = {
+            "total_images": self.catalog.count("images"),
+            "total_videos": self.catalog.count("videos"),
+            "total_audio": self.catalog.count("audio"),
+            "created": self.catalog.get_meta("created")
+        }
         
-        # Calculate disk usage
-        total_size = 0
-        for path in [self.images_path, self.videos_path, self.audio_path]:
-            if path.exists():
-                for file_path in path.rglob("*"):
-                    if file_path.is_file():
-                        total_size += file_path.stat().st_size
+        usage = self.catalog.get_usage()
+        total_size = sum(entry["bytes"] for entry in usage["by_type"].values())
         
         stats["total_disk_usage"] = total_size
         stats["total_disk_usage_mb"] = round(total_size / (1024 * 1024), 2)
+        stats["usage"] = usage
+        stats["last_reconciled"] = self.catalog.get_meta("usage_reconciled_at")
         
         return stats
     
-    def cleanup_old_files(self, days: int = 30) -> Dict[str, int]:
-        """Clean up files older than specified days"""
+    def reconcile_usage(self) -> Dict[str, int]:
+        """Rebuild the usage counters from every file the catalog tracks and its size on disk
+
+        Returns the byte drift per content type that the scan corrected.
+        """
+        with self._maintenance_lock():
+            return self._reconcile_usage()
+    
+    def _reconcile_usage(self) -> Dict[str, int]:
+        before = {kind: entry["bytes"] for kind, entry in self.catalog.get_usage(days=0)["by_type"].items()}
+        
+        # Sizes come from disk, days from the same catalog timestamps the
+        # running counters use (blob created_at, derivative updated_at).
+        # Files the catalog does not track (.gitkeep, strays) are never
+        # counted incrementally, so they are left out here too.
+        counters: Dict[Tuple[str, str], List[int]] = {}
+        for kind, path, timestamp in self.catalog.stored_files():
+            try:
+                size = os.stat(path).st_size
+            except FileNotFoundError:
+                continue
+            entry = counters.setdefault((kind, timestamp[:10]), [0, 0])
+            entry[0] += 1
+            entry[1] += size
+        
+        self.catalog.replace_usage(
+            (kind, day, files, size) for (kind, day), (files, size) in counters.items()
+        )
+        self.catalog.set_meta("usage_reconciled_at", datetime.now().isoformat())
+        
+        after = {kind: entry["bytes"] for kind, entry in self.catalog.get_usage(days=0)["by_type"].items()}
+        drift = {kind: after.get(kind, 0) - before.get(kind, 0) for kind in set(before) | set(after)}
+        return {kind: delta for kind, delta in drift.items() if delta}
+    
+    def _expired_partitions(self, cutoff_day: str) -> List[Path]:
+        """Date partition directories (any content type) older than a day"""
+        partitions = []
+        for kind_path in self.kind_paths.values():
+            for year in sorted(p for p in kind_path.iterdir() if p.is_dir() and len(p.name) == 4 and p.name.isdigit()):
+                for month in sorted(p for p in year.iterdir() if p.is_dir() and p.name.isdigit()):
+                    for day in sorted(p for p in month.iterdir() if p.is_dir() and p.name.isdigit()):
+                        if f"{year.name}-{month.name}-{day.name}" < cutoff_day:
+                            partitions.append(day)
+        return partitions
+    
+    def trim_change_log(self) -> int:
+        """Drop change log entries older than the retention window"""
+        return self.catalog.trim_changes(CHANGE_LOG_RETENTION)
+    
+    def changes_since(self, seq: int, limit: int = 500) -> List[Dict[str, Any]]:
+        """Catalog changes after a sequence number (for clients catching up)"""
+        return self.catalog.changes_since(seq, limit=limit)
+    
+    def get_cleanup_progress(self) -> Dict[str, Any]:
+        """Progress of the current or last cleanup run, whichever worker runs it"""
+        if self.cleanup_progress.get("state") == "running":
+            return dict(self.cleanup_progress)
+        stored = self.catalog.get_meta("cleanup_progress")
+        return json.loads(stored) if stored else dict(self.cleanup_progress)
+    
+    def _save_cleanup_progress(self):
+        self.catalog.set_meta("cleanup_progress", json.dumps(self.cleanup_progress))
+    
+    def _drain_cleanup(self, dropped: List[Path]) -> int:
+        """Delete files queued by expiry runs, returns how many were removed"""
+        dropped_prefixes = tuple(str(p) + os.sep for p in dropped)
+        removed = 0
+        while True:
+            paths = self.catalog.pending_cleanup(limit=CLEANUP_BATCH_SIZE)
+            if not paths:
+                return removed
+            for path in paths:
+                # Files inside dropped partitions are already gone
+                if path.startswith(dropped_prefixes):
+                    continue
+                try:
+                    os.unlink(path)
+                    removed += 1
+                    self.cleanup_progress["files_deleted"] += 1
+                except FileNotFoundError:
+                    pass
+            self.catalog.complete_cleanup(paths)
+    
+    def cleanup_old_files(self, days: int = 30) -> Dict[str, Any]:
+        """Clean up files (all content types) older than specified days
+
+        All expired catalog entries are removed in one batched transaction;
+        whole date partitions are then dropped from disk. Files still queued
+        from an interrupted run are finished first, so cleanup is resumable.
+        Only one worker process cleans up at a time; a request arriving while
+        another run is in progress gets that run's progress back.
+        """
+        lock = self._maintenance_lock(blocking=False)
+        if not lock.acquire():
+            progress = self.get_cleanup_progress()
+            if progress.get("state") == "running":
+                return progress
+            # Held for a migration or reconcile: wait for it
+            lock = self._maintenance_lock()
+            lock.acquire()
+        try:
+            return self._cleanup_old_files(days)
+        finally:
+            lock.release()
+    
+    def _cleanup_old_files(self, days: int) -> Dict[str, Any]:
         from datetime import timedelta
         
-        cutoff_date = datetime.now() - timedelta(days=days)
-        deleted_count = {"images": 0, "videos": 0, "audio": 0}
+        cutoff = datetime.now() - timedelta(days=days)
+        self.cleanup_progress = {
+            "state": "running",
+            "cutoff": cutoff.isoformat(),
+            "started_at": datetime.now().isoformat(),
+            "deleted": {"images": 0, "videos": 0, "audio": 0},
+            "partitions_dropped": 0,
+            "files_deleted": 0
+        }
+        self._save_cleanup_progress()
         
-        # Clean up images
-        for image_id, image_data in list(self.metadata["images"].items()):
-            created_at = datetime.fromisoformat(image_data["created_at"])
-            if created_at < cutoff_date:
-                if self.delete_image(image_id):
-                    deleted_count["images"] += 1
+        try:
+            # Finish an interrupted run
+            resumed = bool(self.catalog.pending_cleanup(limit=1))
+            self._drain_cleanup([])
+            
+            # One catalog transaction for every expired entry
+            summary = self.catalog.expire_before(
+                cutoff.isoformat(), batch_size=CLEANUP_BATCH_SIZE,
+                on_progress=lambda deleted: self.cleanup_progress.update(deleted=deleted)
+            )
+            self.cleanup_progress["deleted"] = summary["deleted"]
+            self._save_cleanup_progress()
+            
+            # Drop whole partitions that nothing references any more
+            dropped = []
+            for partition in self._expired_partitions(cutoff.strftime("%Y-%m-%d")):
+                if self.catalog.count_blobs_under(str(partition) + os.sep):
+                    print(f"⚠️  Keeping partition {partition}: still referenced")
+                    continue
+                shutil.rmtree(partition, ignore_errors=True)
+                dropped.append(partition)
+                self.cleanup_progress["partitions_dropped"] += 1
+            
+            self._drain_cleanup(dropped)
+            
+            self.cleanup_progress.update(
+                state="completed",
+                finished_at=datetime.now().isoformat(),
+                blobs_released=summary["blobs_released"],
+                resumed=resumed
+            )
+            self.trim_change_log()
+        except Exception as e:
+            self.cleanup_progress.update(state="failed", error=str(e))
+            raise
+        finally:
+            self._save_cleanup_progress()
         
-        return deleted_count
+        return dict(self.cleanup_progress)
+    
+    def warm_catalog(self) -> Dict[str, int]:
+        """Touch the catalog's hot paths (counts, first gallery page) so early requests find them cached"""
+        counts = {kind: self.catalog.count(kind) for kind in CONTENT_KINDS}
+        self.catalog.list_page("images", limit=50)
+        return counts
+    
+# Global storage manager instance, built on first use: opening the catalog
+# and running the one-off migrations is too slow for import time
+_storage_manager: Optional[StorageManager] = None
+_storage_manager_lock = threading.Lock()
+
+def get_storage_manager() -> StorageManager:
+    """The shared StorageManager, created on first call"""
+    global _storage_manager
+    if _storage_manager is None:
+        with _storage_manager_lock:
+            if _storage_manager is None:
+                _storage_manager = StorageManager()
+    return _storage_manager
+
+def storage_manager_ready() -> bool:
+    """Whether the shared StorageManager has been created yet"""
+    return _storage_manager is not None
 
-# Global storage manager instance
-storage_manager = StorageManager()
\ No newline at end of file
+def __getattr__(name: str):
+    # `from utils.storage_manager import storage_manager` still works (and builds it)
+    if name == "storage_manager":
+        return get_storage_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Text Generation Streams
+Token-delta streams from Gemini and Ollama, and their Server-Sent-Events
+framing for /api/generate-text/stream
+
+Every provider stream yields {"type": "delta", "text": ...} items and ends
+with one {"type": "usage", ...} item.
+"""
+
+import json
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+
+class OllamaAPIError(Exception):
+    """Ollama answered with an error (status_code None for an error inside a stream)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def server_fault(self) -> bool:
+        """5xx and in-stream errors count against the server; 4xx mean the request was wrong"""
+        return self.status_code is None or self.status_code >= 500
+
+
+def sse_event(event: str, data: Dict[str, Any], event_id: Optional[str] = None) -> str:
+    """One Server-Sent-Events frame"""
+    frame = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return f"id: {event_id}\n{frame}" if event_id is not None else frame
+
+
+def _chunk_text(chunk) -> str:
+    """Text of a Gemini stream chunk (blocked or empty chunks have none)"""
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+def _gemini_usage(response) -> Dict[str, Any]:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return {"type": "usage"}
+    return {
+        "type": "usage",
+        "prompt_tokens": getattr(usage, "prompt_token_count", 0),
+        "completion_tokens": getattr(usage, "candidates_token_count", 0),
+        "tokens": getattr(usage, "total_token_count", 0)
+    }
+
+
+async def gemini_text_stream(model, contents, generation_config, runner) -> AsyncIterator[Dict[str, Any]]:
+    """Stream a Gemini completion (stream=True)
+
+    Uses the SDK's async streaming when available; otherwise the blocking
+    stream iterator is advanced chunk by chunk in the provider thread pool.
+    """
+    if hasattr(model, "generate_content_async"):
+        response = await model.generate_content_async(contents, generation_config=generation_config, stream=True)
+        async for chunk in response:
+            text = _chunk_text(chunk)
+            if text:
+                yield {"type": "delta", "text": text}
+    else:
+        response = await runner.offload(
+            lambda: model.generate_content(contents, generation_config=generation_config, stream=True)
+        )
+        chunks = iter(response)
+        while True:
+            chunk = await runner.offload(next, chunks, None)
+            if chunk is None:
+                break
+            text = _chunk_text(chunk)
+            if text:
+                yield {"type": "delta", "text": text}
+    yield _gemini_usage(response)
+
+
+async def ollama_text_stream(client: "httpx.AsyncClient", base_url: str, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Stream an Ollama chat completion (NDJSON, one object per line)
+
+    Leaving the loop early closes the HTTP response, which makes Ollama stop
+    generating.
+    """
+    async with client.stream("POST", f"{base_url}/api/chat", json={**payload, "stream": True}) as response:
+        if response.status_code != 200:
+            body = await response.aread()
+            raise OllamaAPIError(f"Ollama API Error: {response.status_code} - {body.decode(errors='replace')}", response.status_code)
+
+        async for line in response.aiter_lines():
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            if data.get("error"):
+                raise OllamaAPIError(f"Ollama API Error: {data['error']}")
+            text = data.get("message", {}).get("content")
+            if text:
+                yield {"type": "delta", "text": text}
+            if data.get("done"):
+                prompt_tokens = data.get("prompt_eval_count", 0)
+                completion_tokens = data.get("eval_count", 0)
+                yield {
+                    "type": "usage",
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "tokens": prompt_tokens + completion_tokens
+                }
+                return
+
+
+async def mock_text_stream(text: str) -> AsyncIterator[Dict[str, Any]]:
+    """Stream a canned reply word by word"""
+    words = text.split(" ")
+    for i, word in enumerate(words):
+        yield {"type": "delta", "text": word if i == len(words) - 1 else word + " "}
+    yield {"type": "usage", "tokens": len(words)}
+
+
+async def sse_text_events(events: AsyncIterator[Dict[str, Any]], model_name: str) -> AsyncIterator[str]:
+    """Frame a provider stream as SSE: start, delta..., usage, done (or error)
+
+    Frames are produced only as fast as the client reads them, so a slow
+    client slows the upstream read instead of buffering the completion.
+    """
+    yield sse_event("start", {"model": model_name})
+    usage: Dict[str, Any] = {}
+    chars = 0
+    index = 0
+    try:
+        async for event in events:
+            if event["type"] == "delta":
+                chars += len(event["text"])
+                yield sse_event("delta", {"text": event["text"]}, event_id=str(index))
+                index += 1
+            elif event["type"] == "usage":
+                usage = {k: v for k, v in event.items() if k != "type"}
+    except Exception as e:
+        print(f"❌ Text Stream Error: {e}")
+        yield sse_event("error", {"error": str(e)})
+        return
+
+    yield sse_event("usage", {**usage, "characters": chars, "chunks": index, "model": model_name})
+    yield sse_event("done", {})
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Thumbnail Pipeline
+Renders gallery derivatives (several sizes, JPEG and WebP) in a process pool,
+off the upload path, and lazily on first request. Derivatives are keyed by
+their source blob, so duplicate uploads share one set of thumbnails
+"""
+
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
+from pathlib import Path
+from typing import Optional, Dict, Tuple
+import threading
+
+from .catalog import CatalogBackend
+from .metrics import STORAGE_OPERATION_DURATION
+
+THUMBNAIL_SIZES = (128, 256, 512)
+THUMBNAIL_FORMATS = {"jpg": "JPEG", "webp": "WEBP"}
+DEFAULT_THUMBNAIL = (256, "jpg")
+
+# Each API worker process gets its own pool, so split the CPUs between them
+API_WORKERS = max(1, int(os.getenv("API_WORKERS", "1")))
+THUMBNAIL_WORKERS = int(os.getenv("STORAGE_THUMBNAIL_WORKERS", str(max(1, (os.cpu_count() or 1) // API_WORKERS))))
+
+THUMBNAIL_DURATION = STORAGE_OPERATION_DURATION.labels("thumbnail")
+
+
+def render_thumbnail(source_path: str, target_path: str, size: int, fmt: str) -> int:
+    """Render one derivative (runs inside a worker process), returns its size in bytes"""
+    # Imported here: only the worker processes need Pillow
+    from PIL import Image
+
+    with Image.open(source_path) as img:
+        # Let the JPEG decoder downscale while decoding (DCT scaling)
+        img.draft("RGB", (size, size))
+
+        # Convert to RGB if necessary
+        if img.mode not in ("RGB", "RGBA") or (img.mode == "RGBA" and fmt == "jpg"):
+            img = img.convert("RGB")
+
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+        # Write under a temp name so readers never see a partial file; the
+        # name is per process since two API workers may render the same target
+        target = Path(target_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        img.save(tmp_path, THUMBNAIL_FORMATS[fmt], quality=85)
+        os.replace(tmp_path, target)
+        return target.stat().st_size
+
+
+class ThumbnailPipeline:
+    """Queues thumbnail derivatives to a process pool and tracks them in the catalog"""
+
+    def __init__(self, catalog: CatalogBackend, thumbnails_dir: Path, max_workers: int = THUMBNAIL_WORKERS):
+        self.catalog = catalog
+        self.thumbnails_dir = Path(thumbnails_dir)
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight: Dict[Tuple[str, int, str], Future] = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Start worker processes on first use"""
+        if self._executor is None:
+            # spawn keeps workers independent of the server's threads and
+            # open SQLite handles, and matches Windows behaviour
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def derivative_path(self, stem: str, size: int, fmt: str) -> Path:
+        """Where a derivative lives on disk"""
+        return self.thumbnails_dir / str(size) / f"{stem}.{fmt}"
+
+    @staticmethod
+    def derivative_url(stem: str, size: int = DEFAULT_THUMBNAIL[0], fmt: str = DEFAULT_THUMBNAIL[1]) -> str:
+        """Public URL of a derivative (served, and generated if missing, by the thumbnail route)"""
+        return f"/storage/images/thumbnails/{size}/{stem}.{fmt}"
+
+    def submit(self, source_id: str, source_path: Path, size: int, fmt: str) -> Future:
+        """Schedule one derivative, reusing an in-flight job for the same target"""
+        key = (source_id, size, fmt)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+
+            target = self.derivative_path(Path(source_path).stem, size, fmt)
+            self.catalog.set_derivative(source_id, size, fmt, "pending", str(target))
+            started = time.perf_counter()
+            future = self._get_executor().submit(render_thumbnail, str(source_path), str(target), size, fmt)
+            self._in_flight[key] = future
+
+        def _done(done: Future):
+            # Queue wait included: it is what a request waiting on ensure() sees
+            THUMBNAIL_DURATION.observe(time.perf_counter() - started)
+            with self._lock:
+                self._in_flight.pop(key, None)
+            try:
+                file_size = done.result()
+                self.catalog.set_derivative(source_id, size, fmt, "ready", str(target), file_size)
+            except Exception as e:
+                print(f"Error creating thumbnail {target.name} ({size}): {e}")
+                self.catalog.set_derivative(source_id, size, fmt, "failed", str(target))
+
+        future.add_done_callback(_done)
+        return future
+
+    def enqueue(self, source_id: str, source_path: Path):
+        """Queue every size/format of a freshly stored image"""
+        for size in THUMBNAIL_SIZES:
+            for fmt in THUMBNAIL_FORMATS:
+                self.submit(source_id, source_path, size, fmt)
+
+    async def ensure(self, source_id: str, source_path: Path, size: int, fmt: str) -> Optional[Path]:
+        """Path of a derivative, rendering it now if it does not exist yet"""
+        target = self.derivative_path(Path(source_path).stem, size, fmt)
+        if target.exists():
+            return target
+        if not Path(source_path).exists():
+            return None
+
+        try:
+            # submit() records the pending state in a catalog transaction, so it runs off the event loop
+            future = await asyncio.to_thread(self.submit, source_id, source_path, size, fmt)
+            await asyncio.wrap_future(future)
+        except Exception:
+            return None
+        return target if target.exists() else None
+
+    def delete(self, source_id: str):
+        """Remove every derivative of a source image"""
+        for path in self.catalog.delete_derivatives(source_id):
+            derivative = Path(path)
+            if derivative.exists():
+                derivative.unlink()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None